@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Benchmarks of the log pipeline on synthetic logs (see util/synthetic.py) of 10K, 1M and 10M steps:
+SimLogParser parse and aggregate (serial and with -workers), cached load, "cli.py stats" scan, exports, heatmap grid,
+derived telemetry and TargetCreator.get_target_points, plus the wall clock of a whole "cli.py stats -json" run
+against its budget.
+Logs are generated once and kept in BENCH_DIR (with a parse cache of their own, the user cache is never touched).
+Results are written as JSON so runs can be compared: -compare prints the ratio of every timing to an older result.
+Examples:
+    python benchmark.py -h  # show help menu
+    python benchmark.py -sizes 10k 1m -out bench.json
+    python benchmark.py -sizes 10k 1m -workers 4 -compare bench.json -out bench-new.json
+    python benchmark.py -export csv xlsx -repeat 3
+"""
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import warnings
+from argparse import ArgumentParser, ArgumentTypeError, RawTextHelpFormatter
+
+from util import cache
+from util.synthetic import generate_log
+from data.registry import DEFAULT_TRACK, TRACKS
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.environ.get('DEEPRACER_BENCH_DIR', os.path.join(cache.CACHE_DIR, 'bench'))
+SIZES = ('10k', '1m', '10m')
+SUFFIXES = {'k': 1000, 'm': 1000 ** 2}
+BENCH_FORMATS = ('csv', 'parquet', 'feather', 'npz')  # xlsx is left out by default: it writes a few K rows/s
+HEATMAP_STATS = ('mean', 'p90')
+STARTUP_STEPS = 10000  # size of the log of the "cli.py stats" startup check
+STARTUP_RUNS = 5  # best of that many runs is compared to cli.STATS_STARTUP_BUDGET
+
+
+def parse_size(text):
+    """
+    :param text: [string] Number of steps, optionally suffixed by k or m (e.g. '10k', '2.5m').
+    :return: [int] Number of steps.
+    """
+    scale = SUFFIXES.get(text[-1:].lower(), 1)
+    try:
+        steps = int(float(text[:-1] if scale > 1 else text) * scale)
+    except ValueError:
+        raise ArgumentTypeError(f"invalid size: '{text}' (e.g. 10000, 10k or 1m)") from None
+    if steps <= 0:
+        raise ArgumentTypeError(f"invalid size: '{text}' (must be > 0)")
+    return steps
+
+
+def synthetic_log(steps, track=DEFAULT_TRACK, seed=0):
+    """
+    :param steps: [int] Minimum number of steps of the log.
+    :return: [tuple] (log file, seconds it took to generate it or None if it was already in BENCH_DIR).
+    """
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DIR, f'synthetic-{track}-{steps}-{seed}.log')
+    if os.path.isfile(path):
+        return path, None
+    tmp = f'{path}.{os.getpid()}.tmp'
+    start = time.perf_counter()
+    generate_log(tmp, track, steps=steps, seed=seed)
+    os.replace(tmp, path)
+    return path, time.perf_counter() - start
+
+
+def _quiet():
+    """
+    :return: Context manager swallowing everything printed (parser summaries, export messages).
+    """
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+class Benchmark:
+    def __init__(self, track=DEFAULT_TRACK, workers=1, formats=BENCH_FORMATS, repeat=1, seed=0):
+        """
+        :param track: [string] Track driven by the synthetic logs (see data.registry.TRACKS).
+        :param workers: [int] If > 1, parsing is also timed with that many processes.
+        :param formats: list[string] Export formats timed (formats whose package isn't installed are skipped).
+        :param repeat: [int] Every timing is the best of that many runs.
+        :param seed: [int] Random seed of the synthetic logs.
+        """
+        self.track = track
+        self.workers = workers
+        self.formats = formats
+        self.repeat = repeat
+        self.seed = seed
+        self.results = []
+
+    def record(self, name, size, seconds, steps=None, **extra):
+        """
+        Add one timing to self.results (and print it).
+        """
+        result = {'name': name, 'size': size, 'steps': steps, 'seconds': seconds,
+                  'steps_per_s': steps / seconds if steps and seconds else None, **extra}
+        self.results.append(result)
+        rate = f"{result['steps_per_s']:>14,.0f} steps/s" if result['steps_per_s'] else ''
+        print(f'{name:<18}{size or "":>6}{seconds:>10.4f}s {rate}', flush=True)
+        return result
+
+    def best(self, fn, *args, **kwargs):
+        """
+        :return: [tuple] (best seconds of self.repeat calls of fn, result of last call).
+        """
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            timings.append(time.perf_counter() - start)
+        return min(timings), result
+
+    def run_size(self, size, steps):
+        """
+        Time every stage on a synthetic log of (at least) steps steps.
+        :param size: [string] Label of the size (e.g. '1m').
+        """
+        from simlogparser import SimLogParser
+        from util.export import export
+        from util.grid import HeatmapGrid
+        from util.summary import summarize_log
+        from util.telemetry import derive_frame
+
+        class TimedParser(SimLogParser):
+            # SimLogParser timing its own stages (time spent in each is kept in self.timings)
+            def __init__(self, *args, **kwargs):
+                self.timings = {}
+                super().__init__(*args, **kwargs)
+
+            def _parse(self):
+                start = time.perf_counter()
+                super()._parse()
+                self.timings['parse'] = time.perf_counter() - start
+
+            def _aggregate(self):
+                start = time.perf_counter()
+                super()._aggregate()
+                self.timings['aggregate'] = time.perf_counter() - start
+
+        log, generated = synthetic_log(steps, self.track, self.seed)
+        if generated is not None:
+            self.record('generate', size, generated, steps)
+        timings = {'parse': [], 'aggregate': []}
+        for _ in range(self.repeat):
+            with _quiet():
+                parser = TimedParser(log, use_cache=False, track=self.track)
+            for stage in timings:
+                timings[stage].append(parser.timings[stage])
+        rows = parser.num_rows  # only "lap_complete" rows are kept
+        self.record('parse', size, min(timings['parse']), steps, bytes=os.path.getsize(log))
+        self.record('aggregate', size, min(timings['aggregate']), rows, episodes=len(parser.episode_bounds))
+        if self.workers > 1:
+            with _quiet():
+                seconds, _ = self.best(SimLogParser, log, use_cache=False, workers=self.workers, track=self.track)
+            self.record(f'parse_workers{self.workers}', size, seconds, steps)
+        seconds, _ = self.best(summarize_log, log)
+        self.record('stats', size, seconds, steps)
+        cache.store(cache.fingerprint(log, extra=f'{self.track}:{parser.engine.digest}'), parser.data,
+                    [start for start, _ in parser.episode_bounds], parser.offtracks)
+        with _quiet():
+            seconds, _ = self.best(SimLogParser, log, track=self.track)
+        self.record('cache_load', size, seconds, rows)
+
+        data = parser.data
+        for fmt in self.formats:
+            try:
+                with _quiet():
+                    seconds, _ = self.best(export, data, log, fmt)
+            except ImportError as e:
+                print(f'export_{fmt:<11}{size:>6}   skipped ({str(e).splitlines()[0]})')
+                continue
+            self.record(f'export_{fmt}', size, seconds, rows)
+
+        pts = parser.plot_pts
+        seconds, grid = self.best(HeatmapGrid, pts.x, pts.y, pts.reward)
+        self.record('heatmap_grid', size, seconds, rows)
+        for stat in HEATMAP_STATS:
+            # stats are memoized per grid
+            seconds, _ = self.best(lambda: (grid._stats.clear(), grid.stat(stat)))
+            self.record(f'heatmap_{stat}', size, seconds, rows)
+        seconds, _ = self.best(derive_frame, data, [start for start, _ in parser.episode_bounds])
+        self.record('telemetry', size, seconds, rows)
+
+    def run_targets(self):
+        """
+        Time TargetCreator.get_target_points (independent of any log: one target per waypoint of the track).
+        """
+        import tempfile
+        import matplotlib
+        matplotlib.use('Agg')  # TargetCreator shows its plot when created
+        import matplotlib.pyplot as plt
+        from targets_creator import TargetCreator
+        with tempfile.TemporaryDirectory() as tmp, warnings.catch_warnings(), _quiet():
+            warnings.simplefilter('ignore')  # Agg can't show figures
+            creator = TargetCreator(targets_log=os.path.join(tmp, 'targets.py'), track=self.track)
+        plt.close('all')
+
+        def get_target_points():
+            creator.target_points = []
+            creator.get_target_points()
+
+        seconds, _ = self.best(get_target_points)
+        self.record('target_points', None, seconds, waypoints=len(creator.waypoints))
+
+    def run_startup(self):
+        """
+        Time whole "cli.py stats LOG -json" runs (interpreter start included) against cli.STATS_STARTUP_BUDGET.
+        """
+        from cli import STATS_STARTUP_BUDGET
+        log, _ = synthetic_log(STARTUP_STEPS, self.track, self.seed)
+        command = [sys.executable, os.path.join(REPO_DIR, 'cli.py'), 'stats', log, '-json']
+        timings = []
+        for _ in range(STARTUP_RUNS):
+            start = time.perf_counter()
+            subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - start)
+        result = self.record('stats_startup', None, min(timings), STARTUP_STEPS, budget=STATS_STARTUP_BUDGET,
+                             ok=min(timings) <= STATS_STARTUP_BUDGET)
+        if not result['ok']:
+            print(f'stats_startup is over its budget of {STATS_STARTUP_BUDGET}s')
+
+    def run(self, sizes):
+        """
+        :param sizes: list[string] Size labels (see parse_size()).
+        :return: list[dict] self.results.
+        """
+        self.run_startup()
+        self.run_targets()
+        for size in sizes:
+            self.run_size(size, parse_size(size))
+        return self.results
+
+    def meta(self):
+        """
+        :return: [dict] Environment and settings of the run, saved with the results.
+        """
+        import numpy
+        import pandas
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                    text=True).stdout.strip() or None
+        except OSError:
+            commit = None
+        return {'date': datetime.datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+                'python': platform.python_version(), 'numpy': numpy.__version__, 'pandas': pandas.__version__,
+                'platform': platform.platform(), 'cpus': os.cpu_count(), 'track': self.track,
+                'workers': self.workers, 'repeat': self.repeat, 'seed': self.seed}
+
+
+def compare(results, old_results):
+    """
+    Print every timing next to the same timing (name and size) of an older run.
+    :param results: list[dict] New results (see Benchmark.record()).
+    :param old_results: list[dict] Older results.
+    """
+    old = {(result['name'], result['size']): result['seconds'] for result in old_results}
+    print(f'\n{"":<18}{"size":>6}{"old":>11}{"new":>11}{"new/old":>9}')
+    for result in results:
+        before = old.get((result['name'], result['size']))
+        if before:
+            print(f'{result["name"]:<18}{result["size"] or "":>6}{before:>10.4f}s{result["seconds"]:>10.4f}s'
+                  f'{result["seconds"] / before:>9.2f}')
+
+
+def main(argv=None, prog=None):
+    """
+    :param argv: list[string] Command line arguments (default: sys.argv[1:]).
+    :param prog: [string] Program name shown in help (default: script name, cli.py passes its subcommand).
+    """
+    parser = ArgumentParser(prog=prog, description=__doc__, formatter_class=RawTextHelpFormatter)
+    parser.add_argument('-sizes', nargs='+', default=SIZES,
+                        help="Number of steps of the synthetic logs, k/m suffixes allowed (default: 10k 1m 10m).")
+    parser.add_argument('-track', choices=TRACKS, default=DEFAULT_TRACK,
+                        help="Track driven by the synthetic logs (default: %(default)s).")
+    parser.add_argument('-workers', type=int, default=1,
+                        help="If > 1, parsing is also timed with that many processes.")
+    parser.add_argument('-export', nargs='*', default=BENCH_FORMATS, metavar='FORMAT',
+                        help=f"Export formats timed (default: {' '.join(BENCH_FORMATS)}).")
+    parser.add_argument('-repeat', type=int, default=1,
+                        help="Every timing is the best of that many runs (default: 1).")
+    parser.add_argument('-seed', type=int, default=0, help="Random seed of the synthetic logs (default: 0).")
+    parser.add_argument('-out', default=None,
+                        help="JSON file results are written to (default: bench-<date>.json in the bench directory).")
+    parser.add_argument('-compare', default=None, metavar='JSON',
+                        help="Results of an older run to compare with.")
+    args = parser.parse_args(argv)
+    for size in args.sizes:
+        try:
+            parse_size(size)
+        except ArgumentTypeError as e:
+            parser.error(f'argument -sizes: {e}')
+    from util.export import EXPORTERS
+    if set(args.export) - set(EXPORTERS):
+        parser.error(f"argument -export: invalid choice: {sorted(set(args.export) - set(EXPORTERS))} "
+                     f"(choose from {tuple(EXPORTERS)})")
+    old = None
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)['results']
+
+    cache.CACHE_DIR = os.path.join(BENCH_DIR, 'cache')  # cache entries of synthetic logs are kept apart
+    bench = Benchmark(args.track, args.workers, args.export, max(1, args.repeat), args.seed)
+    results = bench.run(args.sizes)
+    out = args.out or os.path.join(BENCH_DIR, f'bench-{datetime.datetime.now():%Y%m%d-%H%M%S}.json')
+    with open(out, 'w') as f:
+        json.dump({'meta': bench.meta(), 'results': results}, f, indent=1)
+    print(f'Wrote {len(results)} results to {out}')
+    if old is not None:
+        compare(results, old)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Single entry point for all tools. Each subcommand imports only what it needs: "stats" reads the log with the plain
+Python scanner (no numpy, pandas nor matplotlib), so it starts in about the time of the interpreter itself and fits
+in loops over hundreds of logs. "export" loads pandas (and openpyxl for xlsx), "plot" and "targets" load matplotlib,
+"catalog" and "replay" load pandas, "bench" everything it times.
+Examples:
+    python cli.py -h  # show help menu
+    python cli.py stats awslog-sim.log  # same report as simlogparser.py -stats_only
+    python cli.py stats awslog-sim.log -json  # one JSON object (summary and elapsed seconds) on stdout
+    python cli.py stats big-sim.log -workers 4 -profile  # plus time per stage (profile-trace.json)
+    python cli.py export awslog-sim.log -format parquet  # 'lap_complete' rows written next to log
+    python cli.py plot awslog-sim.log -heatmap speed  # any log_plotter.py arguments
+    python cli.py targets -raceline  # any targets_creator.py arguments
+    python cli.py catalog ingest logs/*.log  # any run_catalog.py arguments
+    python cli.py replay awslog-sim.log my_reward.py -profile  # any reward_replay.py arguments
+    python cli.py fetch sim.log -stream ${STREAM} -start 1h  # any fetch_logs.py arguments
+    python cli.py bench -sizes 10k 1m  # any benchmark.py arguments
+"""
+import json
+import os
+import sys
+import time
+from argparse import ArgumentParser, RawTextHelpFormatter
+
+from util.misc import valid_aws_log_file
+from util.profiler import add_profile_argument, profiling, span
+
+# wall clock seconds of a whole "python cli.py stats LOG -json" run on a log of a few episodes: interpreter start and
+# imports dominate it (scanning adds about 10ms per MB of log). Checked by the benchmarks.
+STATS_STARTUP_BUDGET = 0.15
+# subcommands handing their arguments over to a tool's own parser: name -> module with main(argv, prog)
+TOOLS = {'plot': 'log_plotter', 'targets': 'targets_creator', 'catalog': 'run_catalog', 'replay': 'reward_replay',
+         'fetch': 'fetch_logs', 'bench': 'benchmark'}
+
+
+def stats(args):
+    from util.summary import format_summary, summarize_log
+    start = time.perf_counter()
+    with span('stats', workers=args.workers) as s:
+        summary = summarize_log(args.log, workers=args.workers)
+        s.add('bytes', os.path.getsize(args.log))
+        s.add('episodes', summary.num_laps + summary.num_offtracks)
+    if args.json:
+        print(json.dumps({'log': args.log, **summary.as_dict(), 'elapsed': time.perf_counter() - start}))
+    else:
+        print(format_summary(summary, detailed=True))
+
+
+def export(args, parser):
+    from util.export import EXPORT_FORMATS  # loads numpy, pandas is loaded by the parser below
+    if args.format not in EXPORT_FORMATS[1:]:
+        parser.error(f"argument -format: invalid choice: '{args.format}' (choose from {EXPORT_FORMATS[1:]})")
+    from simlogparser import SimLogParser
+    # parser prints the summary and the exporter the written file (an unchanged cached log keeps its export)
+    SimLogParser(args.log, workers=args.workers, use_cache=not args.no_cache, export_format=args.format,
+                 track=args.track)
+
+
+def main(argv=None):
+    """
+    :param argv: list[string] Command line arguments (default: sys.argv[1:]).
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in TOOLS:
+        from importlib import import_module
+        return import_module(TOOLS[argv[0]]).main(argv[1:], prog=f'cli.py {argv[0]}')
+    parser = ArgumentParser(description=__doc__, formatter_class=RawTextHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True,
+                                       metavar='{stats,export,plot,targets,catalog,replay,fetch,bench}')
+    stats_parser = subparsers.add_parser('stats', help="Lap statistics of a log (fast, no numpy/pandas).")
+    stats_parser.add_argument('log', type=valid_aws_log_file,
+                              help="AWS Log file containing 'SIM_TRACE_LOG' and 'Reset'")
+    stats_parser.add_argument('-json', '--json', action='store_true', default=False,
+                              help="If provided, prints one JSON object instead of the report.")
+    stats_parser.add_argument('-workers', type=int, default=1,
+                              help="Number of processes used to scan log (log is split at episode boundaries).")
+    add_profile_argument(stats_parser)
+    export_parser = subparsers.add_parser('export', help="Write all 'lap_complete' rows of a log to a file.")
+    export_parser.add_argument('log', type=valid_aws_log_file,
+                               help="AWS Log file containing 'SIM_TRACE_LOG' and 'Reset'")
+    export_parser.add_argument('-format', required=True,
+                               help="One of: xlsx, csv, parquet, feather, npz (see util/export.py).")
+    export_parser.add_argument('-workers', type=int, default=1,
+                               help="Number of processes used to parse log (log is split at episode boundaries).")
+    if argv and argv[0] == 'export':
+        # data.registry loads numpy: only imported when exporting, so "stats" keeps its startup budget
+        from data.registry import DEFAULT_TRACK, TRACKS
+        export_parser.add_argument('-track', choices=TRACKS, default=DEFAULT_TRACK,
+                                   help="Track the log was recorded on (default: %(default)s).")
+    export_parser.add_argument('-no_cache', action='store_true', default=False,
+                               help="If provided, log is always parsed and the parsed result is not cached.")
+    add_profile_argument(export_parser)
+    # only listed for help, their arguments are parsed by the tools themselves (see TOOLS)
+    subparsers.add_parser('plot', help="Plots of log_plotter.py (python cli.py plot -h for its arguments).")
+    subparsers.add_parser('targets', help="Targets creator of targets_creator.py (python cli.py targets -h).")
+    subparsers.add_parser('catalog', help="Cross-run SQLite catalog of run_catalog.py (python cli.py catalog -h).")
+    subparsers.add_parser('replay', help="Replay a reward function over a log with reward_replay.py "
+                                         "(python cli.py replay -h).")
+    subparsers.add_parser('fetch', help="Fetch logs from CloudWatch with fetch_logs.py (python cli.py fetch -h).")
+    subparsers.add_parser('bench', help="Benchmarks on synthetic logs of benchmark.py (python cli.py bench -h).")
+    args = parser.parse_args(argv)
+    with profiling(args.profile):
+        if args.command == 'stats':
+            stats(args)
+        else:
+            export(args, export_parser)
+
+
+if __name__ == '__main__':
+    main()
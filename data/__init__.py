@@ -0,0 +1 @@
+# tracks are bundles in data/tracks/, listed and loaded by data.registry (TRACKS, load_track)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Track registry: every track is a compact binary bundle (data/tracks/<name>.npz) holding its centerline, precomputed
+geometry (arc length, headings, curvature), width, background image and image extent, loaded lazily by name.
+Opening a bundle only reads its index; each array is read on first use, so the number of tracks never shows up in
+import time. Bundles are built from the track modules in data/ (which stay the editable source):
+    python -m data.registry  # rebuild bundles of all track modules
+    python -m data.registry reinvent2019  # rebuild one bundle
+"""
+import importlib
+import io
+import os
+import sys
+from functools import cached_property, lru_cache
+import numpy as np
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+TRACKS_DIR = os.path.join(DATA_DIR, 'tracks')
+DEFAULT_TRACK = 'reinvent2018'
+DEFAULT_EXTENT = (0.0, 8.0, 0.0, 5.2)  # x_min, x_max, y_min, y_max of track images (meters)
+EXTENT_MARGIN = 1.0  # meters around waypoints shown for tracks without image (and without an extent)
+NOT_TRACKS = ('__init__', 'colors', 'registry')  # modules of data/ that aren't tracks (nor *_targets)
+
+
+def available_tracks():
+    """
+    :return: tuple[string] Names of all track bundles.
+    """
+    if not os.path.isdir(TRACKS_DIR):
+        return ()
+    return tuple(sorted(name[:-4] for name in os.listdir(TRACKS_DIR) if name.endswith('.npz')))
+
+
+TRACKS = available_tracks()
+
+
+class Track:
+    """
+    One track bundle. Waypoints are given as a list of (x, y) tuples like the track modules define them, everything
+    else as arrays. Fields are read from the bundle on first access only.
+    """
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self._npz, self._pid = None, None
+
+    @property
+    def _bundle(self):
+        """
+        [NpzFile] Lazy, arrays are only read when accessed. Opened again in a forked process (e.g. a render worker):
+        reading the parent's file handle would move its offset under concurrent readers.
+        """
+        if self._pid != os.getpid():
+            self._npz, self._pid = np.load(self.path), os.getpid()
+        return self._npz
+
+    def __repr__(self):
+        return f'Track({self.name!r})'
+
+    @cached_property
+    def xy(self):
+        """
+        [ndarray] (n, 2) centerline waypoints in driving order (lap is closed).
+        """
+        return self._bundle['waypoints']
+
+    @cached_property
+    def waypoints(self):
+        return [tuple(point) for point in self.xy.tolist()]
+
+    @cached_property
+    def arc_length(self):
+        """
+        [ndarray] (n + 1) meters from waypoints[0] to each waypoint, last one is the lap length.
+        """
+        return self._bundle['arc_length']
+
+    @property
+    def length(self):
+        return float(self.arc_length[-1])
+
+    @cached_property
+    def headings(self):
+        """
+        [ndarray] Heading (degrees) of segment waypoints[i] -> waypoints[i + 1].
+        """
+        return self._bundle['headings']
+
+    @cached_property
+    def curvature(self):
+        """
+        [ndarray] Signed curvature (1/meters, > 0 turning left) at each waypoint.
+        """
+        return self._bundle['curvature']
+
+    @cached_property
+    def track_width(self):
+        return float(self._bundle['track_width'])
+
+    @cached_property
+    def extent(self):
+        return tuple(self._bundle['extent'].tolist())
+
+    @cached_property
+    def image(self):
+        """
+        [ndarray] Background image (RGB(A) floats like plt.imread), None if track has none.
+        """
+        png = self._bundle['image']
+        if not png.size:
+            return None
+        import matplotlib.image as mpimg  # only readers of the image pay for it
+        return mpimg.imread(io.BytesIO(png.tobytes()), format='png')
+
+    @cached_property
+    def target_points(self):
+        """
+        list[tuple] Target point of each waypoint (see targets_creator.py), None if track has none.
+        """
+        if 'target_points' not in self._bundle.files:
+            return None
+        return [tuple(point) for point in self._bundle['target_points'].tolist()]
+
+    @cached_property
+    def targets_refs(self):
+        """
+        [RangeTable] Angle type and number of points of each waypoint (see targets_creator.py), None if track
+        has none.
+        """
+        if 'angle_types' not in self._bundle.files:
+            return None
+        from util.misc import RangeTable
+        from util.targets import merge_refs
+        refs = list(zip(self._bundle['angle_types'].tolist(), self._bundle['num_points'].tolist()))
+        return RangeTable(merge_refs(refs), size=len(refs))
+
+
+@lru_cache(maxsize=None)
+def load_track(name):
+    """
+    :param name: [string] Track name (e.g. 'reinvent2018').
+    :return: [Track] Loaded once per process.
+    """
+    path = os.path.join(TRACKS_DIR, f'{name}.npz')
+    if not os.path.isfile(path):
+        raise ValueError(f"Unknown track '{name}'. Must be one of these: {available_tracks()} "
+                         f"(build its bundle with: python -m data.registry {name})")
+    return Track(name, path)
+
+
+def track_modules():
+    """
+    :return: tuple[string] Names of track modules in data/ (bundle sources).
+    """
+    names = (name[:-3] for name in os.listdir(DATA_DIR) if name.endswith('.py'))
+    return tuple(sorted(name for name in names if name not in NOT_TRACKS and not name.endswith('_targets')))
+
+
+def _fresh_module(name):
+    # re-executed if already imported, so a bundle rebuilt right after its source was rewritten isn't stale
+    return importlib.reload(sys.modules[name]) if name in sys.modules else importlib.import_module(name)
+
+
+def build_track(name):
+    """
+    Write bundle of a track from its module data/<name>.py (plus data/<name>_targets.py and data/<name>.png if they
+    exist). Target points and targets_refs (angle_types/num_points tables) come from data/<name>_targets.py when it
+    has them, from the module otherwise.
+    :param name: [string] Track module name.
+    :return: [string] Bundle path.
+    """
+    from util.raceline import curvature
+    module = _fresh_module(f'data.{name}')
+    xy = np.asarray(module.waypoints, dtype=np.float64)
+    vectors = np.roll(xy, -1, axis=0) - xy
+    bundle = {'waypoints': xy,
+              'arc_length': np.concatenate(([0.0], np.cumsum(np.hypot(vectors[:, 0], vectors[:, 1])))),
+              'headings': np.degrees(np.arctan2(vectors[:, 1], vectors[:, 0])),
+              'curvature': curvature(xy[:, 0], xy[:, 1]),
+              'track_width': np.float64(module.track_width)}
+    image = os.path.join(DATA_DIR, f'{name}.png')
+    with open(image, 'rb') if os.path.isfile(image) else io.BytesIO() as png:
+        bundle['image'] = np.frombuffer(png.read(), dtype=np.uint8)  # kept PNG encoded (compact)
+    if hasattr(module, 'extent'):
+        extent = module.extent
+    elif bundle['image'].size:
+        extent = DEFAULT_EXTENT
+    else:
+        (x_min, y_min), (x_max, y_max) = xy.min(axis=0) - EXTENT_MARGIN, xy.max(axis=0) + EXTENT_MARGIN
+        extent = (x_min, x_max, y_min, y_max)
+    bundle['extent'] = np.asarray(extent, dtype=np.float64)
+    # target points and the refs they were generated from are taken from the same file, so an optimized
+    # <name>_targets.py never ends up next to the module's (older) targets_refs
+    targets = None
+    if os.path.isfile(os.path.join(DATA_DIR, f'{name}_targets.py')):
+        targets = _fresh_module(f'data.{name}_targets')
+    target_points = getattr(targets, 'target_points', getattr(module, 'target_points', None))
+    if target_points is not None:
+        bundle['target_points'] = np.asarray(target_points, dtype=np.float64)
+    if hasattr(targets, 'angle_types') and hasattr(targets, 'num_points'):
+        angle_types, num_points = targets.angle_types, targets.num_points
+    elif getattr(module, 'targets_refs', None) is not None:
+        angle_types = [module.targets_refs[idx][0] for idx in range(len(xy))]
+        num_points = [module.targets_refs[idx][1] for idx in range(len(xy))]
+    else:
+        angle_types = num_points = None
+    if angle_types is not None:
+        if len(angle_types) != len(xy) or len(num_points) != len(xy):
+            raise ValueError(f"Track '{name}' has {len(xy)} waypoints but {len(angle_types)} angle_types and "
+                             f"{len(num_points)} num_points")
+        bundle['angle_types'] = np.array(angle_types)
+        bundle['num_points'] = np.array(num_points, dtype=np.int64)
+    os.makedirs(TRACKS_DIR, exist_ok=True)
+    path = os.path.join(TRACKS_DIR, f'{name}.npz')
+    with open(f'{path}.tmp', 'wb') as out:
+        np.savez_compressed(out, **bundle)
+    os.replace(f'{path}.tmp', path)
+    load_track.cache_clear()
+    return path
+
+
+if __name__ == '__main__':
+    for track in sys.argv[1:] or track_modules():
+        print(f'Wrote {build_track(track)}')
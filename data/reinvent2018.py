@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 import os
 
-track = os.path.join(os.getcwd(), 'data', 'reinvent2018.png')
+from util.misc import RangeTable
+
+track = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reinvent2018.png')
+track_width = 1.0668  # meters (passed to reward functions as params['track_width'])
 
 target_points = [(6.461017873707842, 0.6880578326692007), (6.513886439910145, 0.6917869902861352),
                  (6.7062222853811955, 0.7038161614821337), (6.8417877118114365, 0.7243997550836263),
@@ -40,17 +43,6 @@ target_points = [(6.461017873707842, 0.6880578326692007), (6.513886439910145, 0.
                  (5.7800020669292005, 0.684218528412216), (6.289747858140073, 0.6921400142174)]
 
 
-class RangeDict(dict):
-    def __getitem__(self, item):
-        if not isinstance(item, range):
-            for key in self:
-                if item in key:
-                    return self[key]
-            raise KeyError(item)
-        else:
-            return super().__getitem__(item)
-
-
 waypoints = [(2.909995283569139, 0.6831924746239328), (3.3199952311658905, 0.6833390533713652),
              (3.41999521838461, 0.6833748042853732), (3.6300023417267235, 0.6834498837610459),
              (4.189995119968753, 0.6836500863232341), (4.500002230529587, 0.6837609167129147),
@@ -88,7 +80,7 @@ waypoints = [(2.909995283569139, 0.6831924746239328), (3.3199952311658905, 0.683
              (2.0400025449490777, 0.6828814442283201), (2.7500024542019887, 0.6831352757177762)]
 
 
-targets_refs = RangeDict({
+targets_refs = RangeTable({
     range(0, 22+1): ('avg', 12),
     range(23, 24+1): ('end', 13),
     range(25, 28+1): ('wtd_avg', 13),
@@ -107,4 +99,4 @@ targets_refs = RangeDict({
     range(50, 59+1): ('avg', 4),
     range(60, 61+1): ('wtd_avg', 9),
     range(62, 69+1): ('end', 12)
-})
+}, size=len(waypoints))
@@ -71,3 +71,126 @@ target_points = ((6.461017873707842, 0.6880578326692007),
  (5.420002112941809, 0.6840898251217875),
  (5.7800020669292005, 0.684218528412216),
  (6.289747858140073, 0.6921400142174))
+
+# dense lookup tables, one entry per waypoint index (e.g. target_xs[closest_waypoint])
+angle_types = ('avg', 'avg', 'avg', 'avg', 'avg', 'avg', 'avg', 'avg', 'avg', 'avg', 'avg',
+ 'avg', 'avg', 'avg', 'avg', 'avg', 'avg', 'avg', 'avg', 'avg', 'avg', 'avg',
+ 'avg', 'end', 'end', 'wtd_avg', 'wtd_avg', 'wtd_avg', 'wtd_avg', 'avg', 'end',
+ 'end', 'end', 'wtd_avg', 'wtd_avg', 'wtd_avg', 'avg', 'avg', 'avg', 'avg',
+ 'avg', 'avg', 'avg', 'avg', 'avg', 'avg', 'avg', 'avg', 'end', 'avg', 'avg',
+ 'avg', 'avg', 'avg', 'avg', 'avg', 'avg', 'avg', 'avg', 'avg', 'wtd_avg',
+ 'wtd_avg', 'end', 'end', 'end', 'end', 'end', 'end', 'end', 'end')
+num_points = (12, 12, 12, 12, 12, 12, 12, 12, 12, 12, 12, 12, 12, 12, 12, 12, 12, 12, 12, 12,
+ 12, 12, 12, 13, 13, 13, 13, 13, 13, 13, 16, 16, 15, 15, 15, 15, 15, 15, 15, 15,
+ 15, 15, 15, 14, 12, 11, 9, 8, 5, 6, 4, 4, 4, 4, 4, 4, 4, 4, 4, 4, 9, 9, 12, 12,
+ 12, 12, 12, 12, 12, 12)
+target_xs = (6.461017873707842, 6.513886439910145, 6.7062222853811955, 6.8417877118114365,
+ 7.006286573591471, 7.151475820681036, 7.2214064017967035, 7.4680469146403015,
+ 7.528010351788048, 7.528699863639062, 7.689691981759969, 7.728888069470197,
+ 7.692518602130955, 7.549869254110648, 7.360110488915774, 7.103613724760411,
+ 6.784508899007659, 6.496110449079708, 6.085768651954058, 5.5260599813661315,
+ 5.33654704033823, 5.163236667744558, 4.626543018483973, 4.092728535429521,
+ 4.001121969780925, 3.6665939940763446, 3.5707663664692615, 3.433488173803766,
+ 3.1396441492948304, 2.890125470779159, 2.8110045575773057, 2.5003276964136627,
+ 2.5003276964136627, 2.41583928426673, 2.204359067157784, 1.9468757993904031,
+ 1.7144196614082232, 1.5586180971261494, 1.1209191146490558, 0.9339249465944586,
+ 0.6664027012058624, 0.3639885210834488, 0.26810231700495724,
+ 0.24455771783760571, 0.26979304514547486, 0.2534210665736296,
+ 0.2607343572973675, 0.21591246434980294, 0.7316196323127645,
+ 0.24017037950053255, 0.6334741151623569, 0.6116914571884705,
+ 0.8767142517759999, 0.9126237137711688, 0.9380374746317695, 1.0212099341560652,
+ 1.0430635528690952, 1.0936256517149217, 1.2088473861872933, 1.2363710112296433,
+ 1.7904703275551124, 2.419351943156177, 3.6300023417267235, 4.189995119968753,
+ 4.500002230529587, 4.549995073956144, 5.320002125723089, 5.420002112941809,
+ 5.7800020669292005, 6.289747858140073)
+target_ys = (0.6880578326692007, 0.6917869902861352, 0.7038161614821337, 0.7243997550836263,
+ 0.7588117589051223, 0.8122097996316212, 0.8751065652956163, 1.0037185508282642,
+ 1.146150858759214, 1.2748812463906218, 1.5345926580097675, 1.8892638886926827,
+ 2.228561087145163, 2.4384057538460246, 2.763170903359196, 2.9653756744292155,
+ 3.1711012517827197, 3.2346328046339803, 3.489472238868241, 3.4660003015732457,
+ 3.3366623017827903, 3.207524167660189, 3.1282963599586404, 3.3703748558215287,
+ 3.482763638518189, 3.4090644155940097, 3.587777262672379, 3.791733942750928,
+ 4.096426738718087, 3.7836970294088266, 4.499832029419236, 4.498718163592657,
+ 4.498718163592657, 4.7282659049826625, 4.787654571338813, 4.815257834492364,
+ 5.327292903753738, 5.258828069196492, 5.251590107522399, 5.0617122121487235,
+ 4.788610860372954, 4.340023544041322, 4.040801759705744, 3.888204037448009,
+ 3.8810593942904537, 3.7805895401723992, 3.871452639704585, 3.743970932934269,
+ 3.819658838269335, 3.3547472166425614, 3.617867807094588, 2.7967209786723224,
+ 2.6705225050239383, 2.5150506992691817, 2.4195933679559642, 2.0181787127447155,
+ 1.9127067467720553, 1.668679245468863, 1.1674873418524767, 1.117224217460086,
+ 0.5170919210197327, 0.26963284584109304, 0.6834498837610459,
+ 0.6836500863232341, 0.6837609167129147, 0.6837787896136626, 0.6840540742077795,
+ 0.6840898251217875, 0.684218528412216, 0.6921400142174)
+target_headings = (0.076001185774406, 0.13663801694536876, 0.34647339107023417,
+ 0.6869042830057309, 1.278683961962924, 2.4856846861020814, 4.021925604166069,
+ 6.257006230405558, 11.820382759483987, 15.65121706099607, 24.00313982330592,
+ 39.7547910493456, 50.91399137078142, 58.89551035296452, 71.53095642742163,
+ 82.68898948275876, 95.46602487952552, 106.66115958919656, 115.88234401550812,
+ 135.8416983375775, 141.8059960325593, 147.38996093777243, 161.54844094699817,
+ 161.9526569617858, 162.9653530892958, 166.62623533417403, 162.01691126433732,
+ 157.69977167733532, 152.79859672140475, 159.96334354285176, 144.0284333049414,
+ 145.77836601738392, 145.33909034899358, 142.3007035926782, 141.28469214445286,
+ 144.5096362130378, 140.55179834057324, 143.97726071455384, 150.67800940556978,
+ 156.62557699153348, 165.39345687756128, 179.86761131009482, -173.2709165313411,
+ -169.12491568013806, -167.33609838692612, -164.27687076585318,
+ -166.15820418854426, -161.71697771106065, -156.12548812143189,
+ -147.1687701252041, -142.17359967104346, -109.83697080450051,
+ -97.80010480274814, -82.10108830930005, -78.2940491355044, -78.2940491355044,
+ -78.2940491355044, -78.29404913550447, -77.79584676569073, -76.56850397460391,
+ -61.82919469202931, -46.54138334972789, -11.410101791372055,
+ -8.381212499607225, -6.097285277638297, -5.407791704430209, -3.286954736369838,
+ -2.303546500123194, -1.808379257264901, 0.12482539689513542)
+raceline_xs = (2.910088868675802, 3.3094702347947944, 3.409314404823482, 3.609001378951945,
+ 4.2080517840217295, 4.50757131994365, 4.50757131994365, 5.30626788400106,
+ 5.4061022003514205, 5.807497268464838, 6.30956525646811, 6.506004557304064,
+ 6.506004557304064, 6.68445942530389, 6.846579521839616, 6.988755899554206,
+ 7.1066176134053265, 7.153518719148756, 7.264290081696821, 7.264290081696821,
+ 7.256450228125171, 7.0698139062043985, 7.0086971061438055, 6.696423660466841,
+ 6.519063468868335, 6.12843043591423, 5.9295769489269885, 5.729916959848603,
+ 5.6300976231822375, 5.230727430433641, 5.031895020638698, 5.031895020638698,
+ 4.935813567720905, 4.566977191054779, 4.2522977155537856, 4.047868738031759,
+ 3.9842231483019366, 3.7374063903146353, 3.674958326129965, 3.5457414528375675,
+ 3.2586775004652795, 3.183931154555795, 3.1029962670015605, 2.930079324724819,
+ 2.8361865175632075, 2.8361865175632075, 2.5405819496758575, 2.23881915119466,
+ 1.939349038715657, 1.7350621879717065, 1.1603876909094923, 1.0826924800906743,
+ 0.7455894545872236, 0.677793713236587, 0.6541402495183412, 0.6644511666819247,
+ 0.6777798980708661, 0.6941401719103301, 0.7901712562775267, 0.8218951657478967,
+ 0.9365392959907832, 1.1921175808641795, 1.2534687153957238, 1.3172794284317104,
+ 1.3172794284317104, 1.3861085939286752, 1.4587217943690471, 1.5347070474925666,
+ 2.003843071530057, 2.710395294269039)
+raceline_ys = (0.42142267852726367, 0.3615551948512105, 0.34986516577863336,
+ 0.3303057896385787, 0.301045969957755, 0.3022663185081538, 0.3022663185081538,
+ 0.36761241538618505, 0.3834844146990145, 0.4673508380803102,
+ 0.6240139637069344, 0.7052037887779457, 0.7052037887779457, 0.7994272819627999,
+ 0.9121854865581456, 1.0450009290561748, 1.2000882403791087, 1.283717685580581,
+ 1.7653773562404436, 1.7653773562404436, 1.8613065132628175, 2.318004134411998,
+ 2.39237278315512, 2.627391082598459, 2.697365543848194, 2.761298230756426,
+ 2.7669870518196036, 2.7637822117874262, 2.760921200534235, 2.7604413759184077,
+ 2.778401418151209, 2.778401418151209, 2.7948520776697077, 2.9262291610895406,
+ 3.1668344713632397, 3.3871087954650307, 3.4640360076448107, 3.778074491889004,
+ 3.8559777908261594, 4.00758613152493, 4.277890687046949, 4.329624260395711,
+ 4.377259783088897, 4.457496311749097, 4.490844586359273, 4.490844586359273,
+ 4.563731209357236, 4.596953191016461, 4.590888227010551, 4.564951109898288,
+ 4.3643478624703285, 4.307172088785949, 3.8163223398991866, 3.5207985968888686,
+ 2.695918750894682, 2.596094569252184, 2.496895673777622, 2.3983249089367806,
+ 2.0103800452264573, 1.9149926005411428, 1.6291702424478924, 1.173426947063087,
+ 1.0888488419404931, 1.0128149217238596, 1.0128149217238596, 0.942626074608262,
+ 0.8807555052177105, 0.8287864809432894, 0.637149496049743, 0.4594438972189305)
+target_speeds = (2.786153013926167, 3.0447871854194575, 3.104930987490537, 3.2206152578715215,
+ 3.5372751023968823, 3.6808043138765307, 3.6808043138765307, 3.3026245782000245,
+ 3.2327066105043047, 2.9120881551064293, 2.4080967777126476, 2.2067696986146657,
+ 2.2067696986146657, 2.0535482931244124, 1.910232053386823, 1.8209835936208725,
+ 1.7178254957471801, 1.7178254957471801, 1.6042868589550936, 1.6042868589550936,
+ 1.60428686074308, 1.6726340180683685, 1.6726340180683685, 1.783906344600609,
+ 1.8259396568749335, 2.0796450204444534, 2.2364813212623798, 2.3998266654163096,
+ 2.4811811825335903, 2.2537138073559215, 2.077770942335537, 2.077770942335537,
+ 2.0113863895137047, 1.8063720518095827, 2.0130332599449017, 2.2489889841444173,
+ 2.3288106967091466, 2.600993051744864, 2.4915828282718424, 2.2768969143585958,
+ 1.9429892813942091, 1.9429892813942091, 1.9429892813942091, 2.036309687724063,
+ 2.082948088992331, 2.082948088992331, 2.2682019603315733, 2.43548232025741,
+ 2.3789224866380594, 2.1660026410635127, 1.5968736495489724, 1.5968736513493023,
+ 1.8618118808453583, 1.9823158751611638, 2.602786545627848, 2.6586703004262167,
+ 2.7103991225065576, 2.7581643537882328, 2.8411780885278866, 2.7765082935470726,
+ 2.5098424049117396, 1.9394359625788535, 1.8351868533066815, 1.731236220941139,
+ 1.731236220941139, 1.630433446045943, 1.630433446045943, 1.630433446045943,
+ 2.0398282633603606, 2.64396076247021)
@@ -78,3 +78,6 @@ reinvent_waypoints2019 = [(0.3078780025243759, 2.830607533454895), (0.3236568570
                           (0.3495015874505043, 3.431317448616028), (0.3208933472633362, 3.2829004526138306),
                           (0.30512550473213196, 3.1325994729995728), (0.3009575456380844, 2.981549024581909),
                           (0.3078780025243759, 2.830607533454895)]
+
+waypoints = reinvent_waypoints2019
+track_width = 1.0668  # meters (passed to reward functions as params['track_width'])
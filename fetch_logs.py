@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Fetch SIM logs from CloudWatch Logs (or any server speaking its FilterLogEvents JSON API) without awslogs.
+The time range is split into windows fetched concurrently (one thread per request in flight), each window paging
+through nextToken. Only "Reset" and SIM_TRACE_LOG events are asked for (and kept, should a server ignore the filter
+pattern). Windows are appended to the log in time order as soon as all earlier windows are done, so a follower
+(-follow, or SimLogParser(follow=True)) can parse the log while it is still being fetched.
+Progress is checkpointed after every page (LOG.fetch.json): an interrupted fetch started again for the same log,
+group and streams resumes where it stopped (same time range), without duplicated or lost events.
+Lines are written like awslogs does ("group stream message"). A log ending with .gz, .bz2 or .zst is compressed
+(.zst needs the zstandard package and gets one frame per window, so it can be parsed in parallel).
+Examples:
+    python fetch_logs.py -h  # show help menu
+    python fetch_logs.py sim-24may.log -stream ${STREAM} -start 1h -aws_profile adfs
+    python fetch_logs.py sim-24may.log.gz -stream ${STREAM} -start 2020-05-24T14:00 -end 2020-05-24T18:00 -workers 8
+    python fetch_logs.py sim-24may.log -stream ${STREAM} -start 3h -follow  # print stats as windows arrive
+    python fetch_logs.py sim.log -stream test -start 1h -endpoint http://localhost:8080/  # local stub server
+    python fetch_logs.py sim.log -stream ${STREAM} -start 1h -profile  # time per window and merge
+"""
+import bz2
+import datetime
+import gzip
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import urllib.error
+import urllib.request
+from argparse import ArgumentParser, RawTextHelpFormatter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from util.aws import load_credentials, sign
+from util.profiler import add_profile_argument, profiling, span
+
+LOG_GROUP = '/aws/robomaker/SimulationJobs'
+FILTER_PATTERN = '?Reset ?SIM_TRACE_LOG'
+KEEP = ('Reset', 'SIM_TRACE_LOG')  # events kept (same as FILTER_PATTERN)
+TARGET = 'Logs_20140328.FilterLogEvents'
+PAGE_LIMIT = 10000  # most events CloudWatch returns per page
+WINDOWS_PER_WORKER = 4  # more windows than workers: finer resume and earlier streaming of the first windows
+MAX_RETRIES = 8  # per request, on throttling, server errors and dropped connections
+RETRY_DELAY = 0.5  # seconds before first retry, doubled every retry
+
+
+def _zstd_open(path, mode):
+    import zstandard  # optional, only needed for .zst logs
+    return zstandard.open(path, mode)
+
+
+# appending to these adds a new member/stream/frame, still one valid file (zstd frames are parsed in parallel)
+COMPRESSORS = {'.gz': gzip.open, '.bz2': bz2.open, '.zst': _zstd_open}
+
+_AGO = re.compile(r'^(\d+)\s*([smhdw])$')
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def parse_time(value, now=None):
+    """
+    :param value: [string] '30m', '2h', '1d' (that long ago), epoch milliseconds, or an ISO date/time (UTC unless
+                  it has an offset).
+    :param now: [float] Current epoch seconds (default: time.time()).
+    :return: [int] Epoch milliseconds.
+    """
+    value = value.strip()
+    ago = _AGO.match(value)
+    if ago:
+        return int(((now or time.time()) - int(ago[1]) * _UNITS[ago[2]]) * 1000)
+    if value.isdigit():
+        return int(value)
+    try:
+        moment = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid time '{value}'. Use e.g. '30m', '2h', '1d', epoch milliseconds or "
+                         f"'2020-05-24T14:25'") from None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+def split_windows(start, end, count):
+    """
+    :return: list[tuple] count (or fewer) consecutive (start, end) millisecond windows covering [start, end).
+    """
+    edges = sorted({start + (end - start) * idx // count for idx in range(count + 1)})
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def format_event(group, event):
+    """
+    :param event: [dict] FilterLogEvents event.
+    :return: [string] Line written to log (like awslogs prints it), None if event is filtered out.
+    """
+    message = event['message'].rstrip('\r\n')
+    if not any(word in message for word in KEEP):
+        return None
+    return f"{group} {event.get('logStreamName', '')} {message}\n"
+
+
+class LogFetcher:
+    def __init__(self, output, streams, start, end, group=LOG_GROUP, workers=4, windows=None, endpoint=None,
+                 credentials=None, filter_pattern=FILTER_PATTERN, page_limit=PAGE_LIMIT, on_merge=None):
+        """
+        :param output: [string] Log written (.gz, .bz2 or .zst to compress it). Its checkpoint is
+                       output + '.fetch.json'.
+        :param streams: list[string] Log stream names (all streams of group if empty).
+        :param start: [int] Epoch milliseconds of first event (included).
+        :param end: [int] Epoch milliseconds of end of range (excluded).
+        :param group: [string] Log group.
+        :param workers: [int] Number of requests in flight.
+        :param windows: [int] Number of time windows (default: WINDOWS_PER_WORKER per worker).
+        :param endpoint: [string] API URL (default: CloudWatch Logs of credentials region).
+        :param credentials: [Credentials] Signing keys (see util.aws). If None, requests are sent unsigned.
+        :param filter_pattern: [string] CloudWatch filter pattern.
+        :param page_limit: [int] Events per page.
+        :param on_merge: [function] on_merge(output) called after every window appended to output.
+        """
+        self.output = output
+        self.checkpoint = f'{output}.fetch.json'
+        self.group = group
+        self.workers = max(1, workers)
+        self.credentials = credentials
+        region = credentials.region if credentials else 'us-east-1'
+        self.endpoint = endpoint or f'https://logs.{region}.amazonaws.com/'
+        self.page_limit = page_limit
+        self.on_merge = on_merge
+        self.request = {'logGroupName': group, 'filterPattern': filter_pattern}
+        if streams:
+            self.request['logStreamNames'] = list(streams)
+        self.windows = split_windows(start, end, windows or self.workers * WINDOWS_PER_WORKER)
+        self.lock = threading.Lock()
+        self.state = None
+        self.num_events, self.num_requests = 0, 0
+
+    def _new_state(self):
+        return {'request': self.request, 'windows': [{'start': start, 'end': end, 'token': None, 'size': 0,
+                                                      'done': False} for start, end in self.windows],
+                'merged': 0, 'output_size': 0}
+
+    def _load_state(self):
+        """
+        :return: [dict] Checkpointed progress of this fetch (new if none). Files are truncated back to it, dropping
+                 whatever was written after the last checkpoint.
+        """
+        if not os.path.isfile(self.checkpoint):
+            for path in [self.output] + [self._part(idx) for idx in range(len(self.windows))]:
+                if os.path.exists(path):
+                    os.remove(path)
+            return self._new_state()
+        with open(self.checkpoint) as f:
+            state = json.load(f)
+        # time range of checkpoint is kept, so a relative -start (e.g. '1h') resumes the same range
+        if state['request'] != self.request:
+            raise ValueError(f"Checkpoint '{self.checkpoint}' is of a fetch with other arguments. Fetch with the "
+                             f"same arguments to resume it, or delete it to start over.")
+        with open(self.output, 'ab') as f:
+            f.truncate(state['output_size'])
+        for idx, window in enumerate(state['windows'][state['merged']:], state['merged']):
+            with open(self._part(idx), 'ab') as f:
+                f.truncate(window['size'])
+        return state
+
+    def _save_state(self):
+        # called with self.lock held
+        with open(f'{self.checkpoint}.tmp', 'w') as f:
+            json.dump(self.state, f)
+        os.replace(f'{self.checkpoint}.tmp', self.checkpoint)
+
+    def _part(self, idx):
+        return f'{self.output}.part{idx}'
+
+    def _post(self, body):
+        """
+        :param body: [dict] FilterLogEvents request.
+        :return: [dict] Response, retried with exponential backoff on throttling and server errors.
+        """
+        data = json.dumps(body).encode()
+        for attempt in range(MAX_RETRIES + 1):
+            headers = {'Content-Type': 'application/x-amz-json-1.1', 'X-Amz-Target': TARGET}
+            if self.credentials:
+                sign('POST', self.endpoint, headers, data, self.credentials, 'logs')
+            try:
+                with urllib.request.urlopen(urllib.request.Request(self.endpoint, data, headers), timeout=60) as resp:
+                    return json.load(resp)
+            except urllib.error.HTTPError as err:
+                detail = err.read().decode(errors='replace')
+                retry = err.code >= 500 or err.code == 429 or 'Throttling' in detail
+                if not retry or attempt == MAX_RETRIES:
+                    raise RuntimeError(f'{self.endpoint} answered {err.code}: {detail}') from None
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                if attempt == MAX_RETRIES:
+                    raise
+            time.sleep(RETRY_DELAY * 2 ** attempt)
+
+    def _fetch_window(self, idx):
+        window = self.state['windows'][idx]
+        # endTime is inclusive in the API, windows are not
+        body = {**self.request, 'startTime': window['start'], 'endTime': window['end'] - 1, 'limit': self.page_limit}
+        with span('fetch_window', window=idx) as s, open(self._part(idx), 'ab') as part:
+            while not window['done']:
+                if window['token']:
+                    body['nextToken'] = window['token']
+                page = self._post(body)
+                lines = [line for line in (format_event(self.group, event) for event in page.get('events', ()))
+                         if line is not None]
+                data = ''.join(lines).encode()
+                part.write(data)
+                part.flush()
+                token = page.get('nextToken')
+                s.add('requests')
+                s.add('events', len(lines))
+                s.add('bytes', len(data))
+                with self.lock:
+                    self.num_requests += 1
+                    self.num_events += len(lines)
+                    # the API returns the token it was given once a range is exhausted
+                    window['token'], window['size'] = token, part.tell()
+                    window['done'] = not token or token == body.get('nextToken')
+                    self._save_state()
+        return idx
+
+    def _merge_ready(self):
+        """
+        Append every finished window that directly follows the log written so far.
+        """
+        with self.lock:
+            merged = self.state['merged']
+            windows = self.state['windows']
+            while merged < len(windows) and windows[merged]['done']:
+                opener = COMPRESSORS.get(os.path.splitext(self.output)[1], open)
+                with span('merge', window=merged) as s, open(self._part(merged), 'rb') as part, \
+                        opener(self.output, 'ab') as out:
+                    shutil.copyfileobj(part, out)
+                    s.add('bytes', part.tell())
+                merged += 1
+                self.state['merged'], self.state['output_size'] = merged, os.path.getsize(self.output)
+                self._save_state()
+                os.remove(self._part(merged - 1))
+                if self.on_merge:
+                    self.on_merge(self.output)
+
+    def run(self):
+        """
+        Fetch all windows (resuming a checkpointed fetch of the same output), then delete the checkpoint.
+        :return: [int] Number of events written by this run.
+        """
+        self.state = self._load_state()
+        self._merge_ready()
+        pending = [idx for idx, window in enumerate(self.state['windows']) if not window['done']]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self._fetch_window, idx) for idx in pending]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+                    self._merge_ready()
+            except BaseException:  # e.g. Ctrl-C: windows not started yet are dropped, pages written are checkpointed
+                for future in futures:
+                    future.cancel()
+                raise
+        os.remove(self.checkpoint)
+        return self.num_events
+
+
+def main(argv=None, prog=None):
+    """
+    :param argv: list[string] Command line arguments (default: sys.argv[1:]).
+    :param prog: [string] Program name shown in help (default: script name, cli.py passes its subcommand).
+    """
+    parser = ArgumentParser(prog=prog, description=__doc__, formatter_class=RawTextHelpFormatter)
+    parser.add_argument('log', help="Log file written (.gz, .bz2 or .zst to compress it).")
+    parser.add_argument('-stream', nargs='+', default=[], help="Log stream names (default: all of group).")
+    parser.add_argument('-group', default=LOG_GROUP, help="Log group (default: %(default)s).")
+    parser.add_argument('-start', required=True, help="Start of range: '30m', '2h', '1d' ago, epoch ms or ISO time.")
+    parser.add_argument('-end', default=None, help="End of range, same formats as -start (default: now).")
+    parser.add_argument('-workers', type=int, default=4, help="Number of requests in flight (default: 4).")
+    parser.add_argument('-windows', type=int, default=None,
+                        help=f"Number of time windows (default: {WINDOWS_PER_WORKER} per worker).")
+    parser.add_argument('-aws_profile', default=None,
+                        help="Profile of ~/.aws/credentials (default: environment).")
+    parser.add_argument('-region', default=None, help="AWS region (default: from environment or profile).")
+    parser.add_argument('-endpoint', default=None, help="API URL (default: CloudWatch Logs of region).")
+    parser.add_argument('-follow', action='store_true', default=False,
+                        help="If provided, stats of the log are printed every time a window is appended.")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    if args.follow and os.path.splitext(args.log)[1] in COMPRESSORS:
+        parser.error('argument -follow: only a plain (not compressed) log can be followed')
+    credentials = load_credentials(args.aws_profile)
+    if credentials and args.region:
+        credentials = credentials._replace(region=args.region)
+    on_merge = None
+    if args.follow:
+        follower = []
+
+        def on_merge(output):
+            # imported here so plain fetches never load pandas
+            from simlogparser import SimLogParser
+            if not follower:
+                follower.append(SimLogParser(output, follow=True, stats_only=True))
+            elif follower[0].refresh():
+                print(follower[0])
+    now = time.time()
+    try:
+        start, end = parse_time(args.start, now), parse_time(args.end, now) if args.end else int(now * 1000)
+    except ValueError as err:
+        parser.error(str(err))
+    fetcher = LogFetcher(args.log, args.stream, start, end, group=args.group,
+                         workers=args.workers, windows=args.windows, endpoint=args.endpoint,
+                         credentials=credentials, on_merge=on_merge)
+    timer = time.perf_counter()
+    with profiling(args.profile):
+        events = fetcher.run()
+    print(f'Fetched {events} events in {fetcher.num_requests} requests ({time.perf_counter() - timer:.2f}s) '
+          f'to {args.log}')
+
+
+if __name__ == '__main__':
+    main()
@@ -7,19 +7,29 @@ Examples:
     python log_plotter.py 'roger-sim-24may.log' -groupsize 10
     python log_plotter.py 'roger-sim-24may.log' -heatmap reward
     python log_plotter.py 'roger-sim-24may.log' -heatmap speed
+    python log_plotter.py 'roger-sim-24may.log' -heatmap speed -heatmap_stat p90 -bins 80  # 90th pct per 10cm cell
+    python log_plotter.py 'roger-sim-24may.log' -render_dir frames -workers 8  # headless PNGs of every view
+    python log_plotter.py 'roger-sim-24may.log' -raceline  # overlay optimized racing line colored by target speed
+    python log_plotter.py 'reinvent2019-sim.log' -track reinvent2019
 """
+import os
+import time
 from argparse import ArgumentParser, ArgumentTypeError, RawTextHelpFormatter
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
 import numpy as np
 
-from data.reinvent2018 import track, waypoints
+from data.registry import DEFAULT_TRACK, TRACKS, load_track
 from simlogparser import SimLogParser
 from data.colors import cmap
+from util.export import EXPORT_FORMATS
+from util.grid import DEFAULT_BINS, HEATMAP_STATS, HeatmapGrid
 from util.misc import valid_aws_log_file
-
-# this file is generated by another script
-from data.reinvent2018_targets import target_points
+from util.profiler import PROFILER, add_profile_argument, profiling, span
+from util.raceline import racing_line
 
 PLOT_LINES = False
 SPEED1 = 4.0
@@ -27,14 +37,173 @@ SPEED2 = 3.5
 SPEED3 = 3.0
 SPEED4 = 1.5
 SPEED5 = 1.33
+SPEED_COLORS = ((SPEED1, 'blue'), (SPEED2, 'limegreen'), (SPEED3, 'yellow'), (SPEED4, 'orange'), (SPEED5, 'red'))
 
 Plots = namedtuple('Plots', 'nfp, idx, last_point_line, avg_angle_line, wtd_avg_angle_line, angle_type, num_points')
 
-all_xs, all_ys = zip(*waypoints)
+
+def speed_colors(speeds):
+    """
+    Get marker color of every speed (black if speed isn't one of SPEED1..SPEED5).
+    :param speeds: [ndarray] Speeds.
+    :return: [ndarray] Color names.
+    """
+    return np.select([speeds == speed for speed, _ in SPEED_COLORS], [color for _, color in SPEED_COLORS], 'black')
+
+
+class TrackView:
+    """
+    Drawing code of the points/headings view and of the heatmap, shared by LogPlotter (on screen) and FrameRenderer
+    (render workers). Built from plain data only (arrays, dicts, numbers), so it is picklable before anything is drawn.
+    """
+
+    def __init__(self, extent, waypoints_xy, targets_xy, plot_pts, episode_data, heatmap='', groupsize=-1,
+                 bins=DEFAULT_BINS, heatmap_stat='mean', raceline=None):
+        """
+        :param extent: [tuple] (xmin, xmax, ymin, ymax) of the track.
+        :param waypoints_xy: [ndarray] (n, 2) waypoints of the track.
+        :param targets_xy: [ndarray] (n, 2) target point of each waypoint.
+        :param plot_pts: [PlotPts] Plotted columns of the log (see SimLogParser.plot_pts).
+        :param episode_data: [dict] Episode number -> summary text of episode.
+        :param heatmap: [string] Heatmap drawn by draw_heatmap(): 'reward' or 'speed' (any case).
+        :param groupsize: [int] Number of points per view, -1 for one whole episode per view.
+        :param bins: [int] Number of heatmap cells along x.
+        :param heatmap_stat: [string] Heatmap value of each cell: one of util.grid.HEATMAP_STATS.
+        :param raceline: [RacingLine] Racing line drawn on top of the track, None for none.
+        """
+        self.extent = extent
+        self.waypoints_xy = waypoints_xy
+        self.targets_xy = targets_xy
+        self.plot_pts = plot_pts
+        self.episode_data = episode_data
+        self.heatmap = heatmap
+        self.groupsize = groupsize
+        self.bins = bins
+        self.heatmap_stat = heatmap_stat
+        self.raceline = raceline
+        self.track_img = None  # set by whoever draws (read once, not on every key press)
+        self.grid = None  # HeatmapGrid of current heatmap
+        self.grid_key = None
+        self.heatmap_img = None
+        self.animated_artists = []
+
+    def init_lines(self, ax, animated=True):
+        """
+        Create the few artists of the points/headings view once; update_lines only updates their data.
+        :param ax: [Axes] Axes with track image.
+        :param animated: [bool] If True, changing artists are left out of full redraws and blitted on key press.
+        """
+        ax.autoscale(False)
+        # This is closest_waypoint[1] of every point (black stars)
+        self.target_rays = LineCollection([], colors='c', linestyles='--', linewidths=1, animated=animated)
+        ax.add_collection(self.target_rays)
+        self.target_rays.set_visible(PLOT_LINES)
+        self.speed_pts = ax.scatter([], [], s=12 ** 2, marker='o', animated=animated)
+        self.waypoint_pts, = ax.plot([], [], 'k*', markersize=5, animated=animated)
+        self.episode_text = ax.text(2.5, 1.3, '', fontsize=12, animated=animated)
+        ax.text(1.5, 2.6, f'Nearest Waypoint(black star)', fontsize=12)
+        ax.text(1.5, 2.5, f'Log position of Car (square)', fontsize=12)
+        ax.text(1.5, 2.4, f'circle (fast to slow): '
+                          f'blue({SPEED1}), '
+                          f'green({SPEED2}), '
+                          f'yellow({SPEED3}), '
+                          f'orange({SPEED4}), '
+                          f'red({SPEED5})', fontsize=12)
+        explain = '(displaying entire episode)' if self.groupsize == -1 else ''
+        ax.text(1.5, 2.3, f'Groupsize: {self.groupsize} {explain}', fontsize=12)
+        self.first_pt_texts = [ax.text(1.5, y, '', fontsize=12, animated=animated) for y in (2.2, 2.1, 2.0)]
+        ax.text(2.0, 1.6, 'Click right/left arrow to cycle through next point(s).', fontsize=12)
+        self.animated_artists = [self.target_rays, self.speed_pts, self.waypoint_pts, self.episode_text,
+                                 *self.first_pt_texts] if animated else []
+
+    def update_lines(self, rows):
+        """
+        Point the view's artists at a new set of points.
+        :param rows: [slice] Rows of plot_pts to show (or index array).
+        """
+        plot_pts = self.plot_pts
+        xys = np.column_stack((plot_pts.x[rows], plot_pts.y[rows]))
+        nearest_waypoint_idxs = plot_pts.closest_waypoint_index[rows]
+        if PLOT_LINES:
+            self.target_rays.set_segments(np.stack((xys, self.targets_xy[nearest_waypoint_idxs]), axis=1))
+        self.speed_pts.set_offsets(xys)
+        self.speed_pts.set_color(speed_colors(plot_pts.speed[rows]))
+        self.waypoint_pts.set_data(*self.waypoints_xy[nearest_waypoint_idxs].T)
+
+        ep_start, stp_start, wpi_start = None, None, None
+        if len(xys):
+            ep_start, stp_start, wpi_start = plot_pts.episode[rows][0], plot_pts.step[rows][0], nearest_waypoint_idxs[0]
+        self.episode_text.set_text(self.episode_data.get(ep_start, ''))
+        for text, label, value in zip(self.first_pt_texts, ('episode', 'step', 'nearest waypoint index'),
+                                      (ep_start, stp_start, wpi_start)):
+            text.set_text(f'First point {label}: {value}')
+
+    def _heatmap_grid(self):
+        """
+        :return: [HeatmapGrid] Grid of current heatmap values, only recomputed if heatmap or number of points changed.
+        """
+        metric = self.heatmap.lower()
+        if metric not in ('reward', 'speed'):
+            raise ValueError(
+                f"Invalid constant value. self.heatmap='{self.heatmap}'. Value must be '', 'Reward', or 'Speed'")
+        pts = self.plot_pts
+        if self.grid is None or self.grid_key != (metric, len(pts.x)):
+            with span('heatmap_grid') as s:
+                s.add('rows', len(pts.x))
+                self.grid = HeatmapGrid(pts.x, pts.y, getattr(pts, metric), bins=self.bins, extent=self.extent)
+            self.grid_key = metric, len(pts.x)
+        return self.grid
+
+    def draw_heatmap(self, idx, ax):
+        grid = self._heatmap_grid()
+        self.heatmap_img = ax.imshow(grid.stat(self.heatmap_stat), extent=grid.extent, origin='lower',
+                                     cmap=cmap[idx], interpolation='nearest', alpha=0.85)
+        ax.figure.colorbar(self.heatmap_img, ax=ax, shrink=0.6,
+                           label=f'{self.heatmap_stat} {self.heatmap.lower()} per cell')
+        self.cmap_text = ax.text(2.5, 3.2, f'cmap: {cmap[idx]}', fontsize=16)
+        ax.text(2.5, 3.0, f'{self.heatmap} HEATMAP', fontsize=16)
+        ax.text(2.0, 2.0, 'Click right/left arrow to cycle through color maps.', fontsize=12)
+        ax.plot(*self.waypoints_xy.T, 'k*')
+
+    def show_track(self, ax):
+        """
+        Draw track image (just the track extent if track has no image) and racing line (if any).
+        """
+        if self.track_img is not None:
+            ax.imshow(self.track_img, extent=self.extent)
+        else:
+            ax.set_xlim(*self.extent[:2])
+            ax.set_ylim(*self.extent[2:])
+            ax.set_aspect('equal')
+        self._draw_raceline(ax)
+
+    def _draw_raceline(self, ax):
+        """
+        Draw racing line (if any) as segments colored by target speed (static, so never redrawn per key press).
+        """
+        if self.raceline is None:
+            return
+        line = self.raceline
+        xys = np.column_stack((line.x, line.y))
+        segments = np.stack((xys, np.roll(xys, -1, axis=0)), axis=1)
+        racing_line_ = LineCollection(segments, cmap='cool', linewidths=3, zorder=3)
+        racing_line_.set_array(line.speed)
+        ax.add_collection(racing_line_)
+        ax.text(1.5, 2.8, f'Racing line (lap {line.lap_time:.2f}s): target speed {line.speed.min():.2f} (pink) to '
+                          f'{line.speed.max():.2f} m/s (cyan)', fontsize=12)
+
+    def set_heatmap_cmap(self, idx):
+        """
+        Cycle color map of the heatmap drawn by draw_heatmap (only re-colors it, grid stats are not recomputed).
+        """
+        self.heatmap_img.set_cmap(cmap[idx])
+        self.cmap_text.set_text(f'cmap: {cmap[idx]}')
 
 
 class LogPlotter:
-    def __init__(self, log, heatmap='', groupsize=-1):
+    def __init__(self, log, heatmap='', groupsize=-1, use_cache=True, rebuild_cache=False, follow=0,
+                 export_format='none', render_dir=None, workers=1, bins=DEFAULT_BINS, heatmap_stat='mean',
+                 raceline=False, track=DEFAULT_TRACK):
         """
         :param log: [string] Name of log file to pull data from.  Will use actual position with car for given episode.
         :param heatmap: [string] Options: '', 'Reward', 'Speed'
@@ -42,106 +211,110 @@ class LogPlotter:
                         but if not Null, the it will override self.*_angles below.
         :param groupsize: [int] Number of points per click when plotting lines.  Ignored if heatmap != ''
                           If -1, this will display all points from one episode at a time (per click).
+        :param use_cache: [bool] If True, parsed log is loaded from / saved to the on-disk cache.
+        :param rebuild_cache: [bool] If True, ignores any cached parse of log and re-parses it.
+        :param follow: [float] If > 0, log is followed while it grows (e.g. during training): every follow seconds
+                       only newly appended bytes are parsed and the lap time plot is updated in place.
+        :param export_format: [string] If not 'none', parsed log is also exported in this format (see util.export)
+                              by a background thread, so plots show up without waiting for it.
+        :param render_dir: [string] If given, nothing is shown: every episode (or group) view and every cmap of the
+                           heatmap(s) is rendered headless to a PNG file in this directory (see render()).
+        :param workers: [int] Number of processes used to parse the log and to render frames.
+        :param bins: [int] Number of heatmap cells along x (track is binned into square cells).
+        :param heatmap_stat: [string] Heatmap value of each cell: one of util.grid.HEATMAP_STATS.
+        :param raceline: [bool] If True, the optimized racing line of the track (see util.raceline) is drawn on top,
+                         colored by its target speed.
+        :param track: [string] Track the log was recorded on (see data.registry.TRACKS).
         """
         self.log = log
         self.heatmap = heatmap
         self.groupsize = groupsize
+        self.follow = follow
+        self.bins = bins
+        self.heatmap_stat = heatmap_stat
+        self.track = load_track(track)
+        self.extent = self.track.extent
+        self.waypoints_xy = self.track.xy
+        self.raceline = None
+        if raceline:
+            with span('raceline'):
+                self.raceline = racing_line(self.track.xy, self.track.track_width)
         self.curr_episode = None  # only used if groupsize is -1
 
         self.plots = []
+        self.background = None  # saved canvas for blitting points/headings view
         self.curr_pos = 0
         self.plot_dir_right = True
 
-        self.parsed_log = SimLogParser(log, verbose=True)
-        self.plot_pts = self.parsed_log.plot_pts
-        self.good_episode_list = tuple(self.parsed_log.good_episode_list)
+        self.parsed_log = SimLogParser(log, verbose=True, use_cache=use_cache, rebuild_cache=rebuild_cache,
+                                       follow=follow > 0, export_format=export_format, export_background=True,
+                                       workers=workers, track=track)
+        self.targets_xy = self.parsed_log.engine.targets  # target point of each waypoint
+        # episodes in log order
+        self.good_episode_list = tuple(self.parsed_log.episode_index)
         self.episode_data = self.parsed_log.episode_data
         self.lap_times = self.parsed_log.lap_times
+        self.lap_episodes = self.parsed_log.lap_episodes
         self.steps = self.parsed_log.steps
-        self.plot()
+        self.view = self._new_view()  # drawing code of the on screen figure
+        if render_dir:
+            self.render(render_dir, workers)
+        else:
+            self.plot()
+
+    @property
+    def plot_pts(self):
+        """
+        PlotPts of arrays (see SimLogParser.plot_pts), read from the parsed log so follow mode updates are seen.
+        """
+        return self.parsed_log.plot_pts
+
+    def _new_view(self):
+        """
+        :return: [TrackView] View of the current plot points, built from plain data (see TrackView).
+        """
+        return TrackView(self.extent, self.waypoints_xy, self.targets_xy, self.plot_pts, self.episode_data,
+                         heatmap=self.heatmap, groupsize=self.groupsize, bins=self.bins,
+                         heatmap_stat=self.heatmap_stat, raceline=self.raceline)
 
     def _draw_lines(self, idx):
-        plt.autoscale(False)
-        # plt.plot(all_xs, all_ys, 'bo')
-        # WARNING: This line must match what is PACKED UPSTREAM in SimLogParser (simlogparser.py)
-        ep_start, stp_start, wpi_start = None, None, None
         if self.groupsize == -1:
             # get one whole episode
             episode_key = self.good_episode_list[idx]
             assert isinstance(episode_key, int), f"Bad value for episode:{episode_key}"
-            plot_pts = ((episode, step, x, y, nearest_waypoint_idx, speed)
-                        for episode, step, x, y, nearest_waypoint_idx, speed, _
-                        in self.plot_pts if episode == episode_key)
-            plt.text(2.5, 1.3, self.episode_data[episode_key], fontsize=12)
+            rows = self.parsed_log.episode_rows(episode_key)
         else:
-            plot_pts = ((episode, step, x, y, nearest_waypoint_idx, speed)
-                        for (episode, step, x, y, nearest_waypoint_idx, speed, _)
-                        in self.plot_pts[idx:idx + self.groupsize])
+            rows = slice(idx, idx + self.groupsize)
             # FIXME: the index goes out of range and doesn't toggle left/right exactly correctly
             if self.plot_dir_right:
                 self.curr_pos += self.groupsize
             else:
                 self.curr_pos -= self.groupsize
-        for episode, step, x, y, nearest_waypoint_idx, speed in plot_pts:
-            if PLOT_LINES:
-                x2, y2 = target_points[nearest_waypoint_idx]
-                plt.plot((x, x2), (y, y2), 'c--', linewidth=1)
-            if speed == SPEED1:
-                plt.plot(x, y, 'o', markersize=12, color='blue')
-            elif speed == SPEED2:
-                plt.plot(x, y, 'o', markersize=12, color='limegreen')
-            elif speed == SPEED3:
-                plt.plot(x, y, 'o', markersize=12, color='yellow')
-            elif speed == SPEED4:
-                plt.plot(x, y, 'o', markersize=12, color='orange')
-            elif speed == SPEED5:
-                plt.plot(x, y, 'o', markersize=12, color='red')
-            else:
-                plt.plot(x, y, 'o', markersize=12, color='black')
-            # This is closest_waypoint[1]
-            nwp_x, nwp_y = waypoints[nearest_waypoint_idx]
-            plt.plot(nwp_x, nwp_y, 'k*', markersize=5)
-            if ep_start is None:
-                plt.text(2.5, 1.3, self.episode_data[episode], fontsize=12)
-                ep_start = episode
-                stp_start = step
-                wpi_start = nearest_waypoint_idx
-        plt.text(1.5, 2.6, f'Nearest Waypoint(black star)', fontsize=12)
-        plt.text(1.5, 2.5, f'Log position of Car (square)', fontsize=12)
-        plt.text(1.5, 2.4, f'circle (fast to slow): '
-                           f'blue({SPEED1}), '
-                           f'green({SPEED2}), '
-                           f'yellow({SPEED3}), '
-                           f'orange({SPEED4}), '
-                           f'red({SPEED5})', fontsize=12)
-        explain = '(displaying entire episode)' if self.groupsize == -1 else ''
-        plt.text(1.5, 2.3, f'Groupsize: {self.groupsize} {explain}', fontsize=12)
-
-        plt.text(1.5, 2.2, f'First point episode: {ep_start}', fontsize=12)
-        plt.text(1.5, 2.1, f'First point step: {stp_start}', fontsize=12)
-        plt.text(1.5, 2.0, f'First point nearest waypoint index: {wpi_start}', fontsize=12)
-
-        plt.text(2.0, 1.6, 'Click right/left arrow to cycle through next point(s).', fontsize=12)
-
-    def _draw_heatmap(self, idx):
-        # WARNING: This line must match what is PACKED UPSTREAM in SimLogParser (simlogparser.py)
-        _, _, xs, ys, _, d_speeds, d_rewards = zip(*self.plot_pts)
-        plt.text(2.5, 3.2, f'cmap: {cmap[idx]}', fontsize=16)
-        plt.text(2.5, 3.0, f'{self.heatmap} HEATMAP', fontsize=16)
-        plt.text(2.2, 2.8, '<--- Smallest to Biggest -->', fontsize=16)
-        if self.heatmap.lower() == 'reward':
-            plt.scatter([2.5, 2.6, 2.7, 2.8, 2.9, 3.0, 3.1, 3.2, 3.3, 3.4],
-                        [2.5, 2.5, 2.5, 2.5, 2.5, 2.5, 2.5, 2.5, 2.5, 2.5], s=24, c=range(0, 10), cmap=cmap[idx])
-            plt.scatter(xs, ys, s=1, c=d_rewards, cmap=cmap[idx])
-        elif self.heatmap.lower() == 'speed':
-            plt.scatter([2.9, 3.0, 3.1],
-                        [2.5, 2.5, 2.5], s=24, c=range(0, 3), cmap=cmap[idx])
-            plt.scatter(xs, ys, s=1, c=d_speeds, cmap=cmap[idx])
-        else:
-            raise ValueError(
-                f"Invalid constant value. self.heatmap='{self.heatmap}'. Value must be '', 'Reward', or 'Speed'")
-        plt.text(2.0, 2.0, 'Click right/left arrow to cycle through color maps.', fontsize=12)
-        plt.plot(all_xs, all_ys, 'k*')
+        self.view.update_lines(rows)
+
+    def _on_draw(self, event):
+        """
+        After every full redraw (first show, resize...), save background for blitting and draw changing artists.
+        """
+        self.background = event.canvas.copy_from_bbox(event.canvas.figure.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in self.view.animated_artists:
+            artist.axes.draw_artist(artist)
+
+    def _blit(self, fig):
+        """
+        Redraw only the changing artists on top of saved background (full redraw if backend can't blit).
+        """
+        canvas = fig.canvas
+        if self.background is None or not canvas.supports_blit:
+            canvas.draw()
+            return
+        canvas.restore_region(self.background)
+        self._draw_animated()
+        canvas.blit(fig.bbox)
+        canvas.flush_events()
 
     def key_event(self, e, items, ax, fig):
         if e.key == "right":
@@ -154,52 +327,206 @@ class LogPlotter:
             return
         self.curr_pos %= len(items)
 
-        ax.cla()
-        plt.imshow(plt.imread(track), extent=[0, 8, 0, 5.2])
-        if self.heatmap:
-            self._draw_heatmap(self.curr_pos)
+        with span('key_event', key=e.key) as s:
+            if self.heatmap:
+                self.view.set_heatmap_cmap(self.curr_pos)
+                fig.canvas.draw()
+            else:
+                self._draw_lines(self.curr_pos)
+                self._blit(fig)
+            if PROFILER.enabled:
+                # a full redraw draws every artist of the figure, blitting only the changing ones
+                s.add('artists', len(fig.findobj()) if self.heatmap or self.background is None or
+                      not fig.canvas.supports_blit else len(self.view.animated_artists))
+
+    def _lap_times_trend(self):
+        """
+        :return: [tuple] xs, ys of lap times trend line (empty if less than 2 laps).
+        """
+        if len(self.lap_times) < 2:
+            return [], []
+        z = np.polyfit(self.lap_episodes, self.lap_times, 1)
+        p = np.poly1d(z)
+        return self.lap_episodes, p(self.lap_episodes)
+
+    def _follow_log(self, lap_times_pts, trend_line, ax, fig):
+        """
+        Timer callback in follow mode: parse newly appended log data and update lap times plot in place.
+        """
+        if not self.parsed_log.refresh():
+            return
+        print(self.parsed_log)
+        self.good_episode_list = tuple(self.parsed_log.episode_index)
+        self.lap_times = self.parsed_log.lap_times
+        self.lap_episodes = self.parsed_log.lap_episodes
+        self.steps = self.parsed_log.steps
+        self.view.plot_pts = self.plot_pts  # new rows are only seen by views of the refreshed log
+        lap_times_pts.set_offsets(np.column_stack((self.lap_episodes, self.lap_times)))
+        trend_line.set_data(*self._lap_times_trend())
+        ax.relim()
+        ax.autoscale_view()
+        fig.canvas.draw_idle()
+
+    def _frames(self, render_dir):
+        """
+        :return: generator of (kind, what, path) of every frame rendered by render().
+        """
+        if self.groupsize == -1:
+            for episode in self.good_episode_list:
+                yield ('lines', self.parsed_log.episode_rows(episode),
+                       os.path.join(render_dir, f'episode_{episode:06d}.png'))
         else:
-            self._draw_lines(self.curr_pos)
-        fig.canvas.draw()
+            for start in range(0, len(self.plot_pts.x), self.groupsize):
+                yield 'lines', slice(start, start + self.groupsize), os.path.join(render_dir, f'group_{start:09d}.png')
+        for heatmap in (self.heatmap.lower(),) if self.heatmap else ('reward', 'speed'):
+            for idx, name in enumerate(cmap):
+                yield ('heatmap', (heatmap, idx),
+                       os.path.join(render_dir, f'heatmap_{heatmap}_{self.heatmap_stat}_{name}.png'))
+
+    def render(self, render_dir, workers=1):
+        """
+        Headless batch mode: render every episode (or group) view and every cmap of the heatmap(s) to PNG files
+        with Agg in a process pool. Frames already in render_dir are skipped, so an interrupted run can be resumed.
+        :param render_dir: [string] Output directory.
+        :param workers: [int] Number of rendering processes.
+        """
+        os.makedirs(render_dir, exist_ok=True)
+        frames = list(self._frames(render_dir))
+        todo = [frame for frame in frames if not os.path.isfile(frame[2])]
+        start = time.perf_counter()
+        renderer = FrameRenderer(self._new_view(), self.track.name)
+        with span('render', workers=workers) as s:
+            s.add('frames', len(todo))
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker,
+                                         initargs=(renderer,)) as pool:
+                    for _ in pool.map(_render_frame, todo, chunksize=max(1, len(todo) // (workers * 8))):
+                        pass
+            else:
+                _init_render_worker(renderer)
+                for frame in todo:
+                    _render_frame(frame)
+        print(f'Rendered {len(todo)} frames ({len(frames) - len(todo)} already done) to {render_dir} '
+              f'in {time.perf_counter() - start:.1f}s')
 
     def plot(self):
-        f1 = plt.figure(num=None, figsize=(20, 15), dpi=80, facecolor='w', edgecolor='k')
-        plt.imshow(plt.imread(track), extent=[0, 8, 0, 5.2])
-        ax1 = f1.add_subplot(111)
-        if self.heatmap:
-            self._draw_heatmap(0)
-            f1.canvas.mpl_connect('key_press_event', lambda event: self.key_event(event, cmap, ax1, f1))
-        else:
-            self._draw_lines(0)
-            f1.canvas.mpl_connect('key_press_event', lambda event: self.key_event(event, self.plot_pts, ax1, f1))
-
-        # plot lap times
-        f2 = plt.figure()
-        ax2 = f2.add_subplot(111)
-        ax2.set_title('Lap Times w/ Trend Line')
-        ax2.set_xlabel('Episode')
-
-        # ---------
-        # set right side axis
-        # ax2b = ax2.twinx()
-        # ax2b.set_ylabel('Steps')
-        # print(len(self.good_episode_list), len(self.steps))
-        # if len(self.good_episode_list) > len(self.steps):
-        #     self.good_episode_list = self.good_episode_list[(len(self.good_episode_list) - len(self.steps)):]
-        # ax2b.scatter(self.good_episode_list, self.steps)
-        # ax2b.tick_params(axis='y')
-        # ----------
-
-        ax2.set_ylabel('Time(s)')
-        ax2.scatter(self.good_episode_list, self.lap_times)
-        # plot lap times trend line
-        z = np.polyfit(self.good_episode_list, self.lap_times, 1)
-        p = np.poly1d(z)
-        ax2.plot(self.good_episode_list, p(self.good_episode_list), "r--")
+        with span('plot'):  # figures are only drawn on screen by plt.show()
+            f1 = plt.figure(num=None, figsize=(20, 15), dpi=80, facecolor='w', edgecolor='k')
+            ax1 = f1.add_subplot(111)
+            with span('track_image'):
+                self.view.track_img = self.track.image
+            self.view.show_track(ax1)
+            if self.heatmap:
+                self.view.draw_heatmap(0, ax1)
+                f1.canvas.mpl_connect('key_press_event', lambda event: self.key_event(event, cmap, ax1, f1))
+            else:
+                self.view.init_lines(ax1)
+                self._draw_lines(0)
+                f1.canvas.mpl_connect('draw_event', self._on_draw)
+                # one click per episode or per group of points (looked up per click, follow mode adds more)
+                f1.canvas.mpl_connect('key_press_event', lambda event: self.key_event(
+                    event, self.good_episode_list if self.groupsize == -1 else self.plot_pts.x, ax1, f1))
+
+            # plot lap times
+            f2 = plt.figure()
+            ax2 = f2.add_subplot(111)
+            ax2.set_title('Lap Times w/ Trend Line')
+            ax2.set_xlabel('Episode')
+
+            # ---------
+            # set right side axis
+            # ax2b = ax2.twinx()
+            # ax2b.set_ylabel('Steps')
+            # print(len(self.good_episode_list), len(self.steps))
+            # if len(self.good_episode_list) > len(self.steps):
+            #     self.good_episode_list = self.good_episode_list[(len(self.good_episode_list) - len(self.steps)):]
+            # ax2b.scatter(self.good_episode_list, self.steps)
+            # ax2b.tick_params(axis='y')
+            # ----------
+
+            ax2.set_ylabel('Time(s)')
+            lap_times_pts = ax2.scatter(self.lap_episodes, self.lap_times)
+            # plot lap times trend line
+            trend_line, = ax2.plot(*self._lap_times_trend(), "r--")
+        if self.follow > 0:
+            timer = f2.canvas.new_timer(interval=int(self.follow * 1000))
+            timer.add_callback(self._follow_log, lap_times_pts, trend_line, ax2, f2)
+            timer.start()
+            self.follow_timer = timer  # must be referenced or it gets garbage collected
 
         plt.show()
 
 
+class FrameRenderer:
+    """
+    Renders frames of a TrackView in a render worker: no parsed log, pyplot-free Agg figures.
+    """
+
+    def __init__(self, view, track_name):
+        """
+        :param view: [TrackView] View to render (nothing drawn yet).
+        :param track_name: [string] Track of the view: Track bundles aren't pickled, each worker loads its own image.
+        """
+        self.view = view
+        self.track_name = track_name
+        self.lines_fig = None  # points/headings figure is reused, only its artists change
+        self.heatmap_fig = None  # same for heatmap figure, only its cmap changes
+
+    def render_frame(self, kind, what, path):
+        """
+        :param kind: [string] 'lines' (points/headings view) or 'heatmap'.
+        :param what: Rows of plot_pts to show if kind is 'lines', else (heatmap, cmap index).
+        :param path: [string] Output PNG file (written atomically, so resume never sees partial frames).
+        """
+        if kind == 'lines':
+            if self.lines_fig is None:
+                self.lines_fig = self._new_figure()
+                self.view.init_lines(self.lines_fig.axes[0], animated=False)
+            self.view.update_lines(what)
+            fig = self.lines_fig
+        else:
+            heatmap, idx = what
+            if self.heatmap_fig is None or heatmap != self.view.heatmap:
+                self.view.heatmap = heatmap
+                self.heatmap_fig = self._new_figure()
+                self.view.draw_heatmap(idx, self.heatmap_fig.axes[0])
+            else:
+                self.view.set_heatmap_cmap(idx)
+            fig = self.heatmap_fig
+        with span('savefig', kind=kind) as s:
+            fig.savefig(f'{path}.tmp', format='png')
+            if PROFILER.enabled:
+                s.add('artists', len(fig.findobj()))
+        os.replace(f'{path}.tmp', path)
+
+    def _new_figure(self):
+        fig = Figure(figsize=(20, 15), dpi=80, facecolor='w', edgecolor='k')
+        ax = fig.add_subplot(111)
+        self.view.show_track(ax)
+        return fig
+
+
+_renderer = None  # FrameRenderer of a render worker process
+
+
+def _init_render_worker(renderer):
+    global _renderer
+    renderer.view.track_img = load_track(renderer.track_name).image
+    _renderer = renderer
+
+
+def _render_frame(frame):
+    _renderer.render_frame(*frame)
+
+
+def valid_heatmap_stat(stat):
+    try:
+        HeatmapGrid([], [], []).stat(stat)
+    except ValueError as e:
+        raise ArgumentTypeError(str(e))
+    return stat
+
+
 def valid_heatmap(heatmap):
     valid_heatmap_values = ('', 'speed', 'reward')
     if heatmap.lower() not in valid_heatmap_values:
@@ -207,8 +534,12 @@ def valid_heatmap(heatmap):
     return heatmap
 
 
-if __name__ == '__main__':
-    parser = ArgumentParser(description=__doc__, formatter_class=RawTextHelpFormatter)
+def main(argv=None, prog=None):
+    """
+    :param argv: list[string] Command line arguments (default: sys.argv[1:]).
+    :param prog: [string] Program name shown in help (default: script name, cli.py passes its subcommand).
+    """
+    parser = ArgumentParser(prog=prog, description=__doc__, formatter_class=RawTextHelpFormatter)
     parser.add_argument('log', type=valid_aws_log_file,
                         help="AWS Log file containing 'SIM_TRACE_LOG' and 'Reset'")
     group = parser.add_mutually_exclusive_group()
@@ -218,5 +549,38 @@ if __name__ == '__main__':
                             "episode at a time (per click).")
     group.add_argument('-heatmap', type=valid_heatmap, default='',
                        help="Valid options: '', 'Speed', 'Reward'. If '' (null) then points/headings will be plotted")
-    args = parser.parse_args()
-    LogPlotter(log=args.log, groupsize=args.groupsize, heatmap=args.heatmap)
+    parser.add_argument('-no_cache', action='store_true', default=False,
+                        help="If provided, log is always parsed and the parsed result is not cached.")
+    parser.add_argument('-rebuild_cache', action='store_true', default=False,
+                        help="If provided, ignores cached parse of this log and re-parses it (cache is refreshed).")
+    parser.add_argument('-export', choices=EXPORT_FORMATS, default='none',
+                        help="Format of file written next to log with all 'lap_complete' rows (default: none). "
+                             "Written in background, so plots show up right away.")
+    parser.add_argument('-bins', type=int, default=DEFAULT_BINS,
+                        help="Number of heatmap cells along x (cells are square). Default: %(default)s")
+    parser.add_argument('-heatmap_stat', type=valid_heatmap_stat, default='mean',
+                        help=f"Heatmap value of each cell, one of: {', '.join(HEATMAP_STATS)}. Default: %(default)s")
+    parser.add_argument('-render_dir', default=None,
+                        help="If provided, nothing is shown: every episode (or group) view and every cmap of the "
+                             "heatmap (reward and speed if no -heatmap) is rendered to a PNG in this directory. "
+                             "Frames already rendered are skipped (resume).")
+    parser.add_argument('-workers', type=int, default=1,
+                        help="Number of processes used to parse the log and to render frames.")
+    parser.add_argument('-track', choices=TRACKS, default=DEFAULT_TRACK,
+                        help="Track the log was recorded on (default: %(default)s).")
+    parser.add_argument('-raceline', action='store_true', default=False,
+                        help="If provided, the optimized racing line of the track is drawn, colored by target speed.")
+    parser.add_argument('-follow', type=float, default=0,
+                        help="If > 0, keeps following the (growing) log and updates lap times plot every FOLLOW "
+                             "seconds with newly appended episodes only.")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    with profiling(args.profile):
+        LogPlotter(log=args.log, groupsize=args.groupsize, heatmap=args.heatmap, use_cache=not args.no_cache,
+                   rebuild_cache=args.rebuild_cache, follow=args.follow, export_format=args.export,
+                   render_dir=args.render_dir, workers=args.workers, bins=args.bins, heatmap_stat=args.heatmap_stat,
+                   raceline=args.raceline, track=args.track)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Replay a reward function over a parsed AWS log (no training run needed).
+The standard DeepRacer params dict is rebuilt for every logged step of the "lap_complete" episodes and the reward
+function is evaluated on it. The logged (old) and replayed (new) reward of every episode are printed.
+A reward module must define reward_function(params). Pass -batch if it accepts a params dict of arrays
+(one entry per step) and returns an array of rewards.
+Examples:
+    python reward_replay.py -h  # show help menu
+    python reward_replay.py awslog-sim.log my_reward.py
+    python reward_replay.py awslog-sim.log my_reward.py -batch  # reward_function takes arrays
+    python reward_replay.py awslog-sim.log my_reward.py -out replay.csv  # also write per episode rewards
+    python reward_replay.py awslog-sim.log my_reward.py -profile  # time parse and replay
+"""
+import importlib.util
+import time
+from argparse import ArgumentParser, RawTextHelpFormatter
+import numpy as np
+import pandas as pd
+
+from simlogparser import SimLogParser
+from data.registry import DEFAULT_TRACK, TRACKS, load_track
+from util.geometry import TrackGeometry
+from util.misc import valid_aws_log_file
+from util.profiler import add_profile_argument, profiling, span
+
+# params taken as-is from a SimLogParser column
+PARAM_COLUMNS = {'x': 'x_coord', 'y': 'y_coord', 'heading': 'heading', 'steering_angle': 'steering',
+                 'speed': 'speed', 'progress': 'progress', 'steps': 'step', 'track_length': 'track_length',
+                 'all_wheels_on_track': 'all_wheels_on_track', 'closest_waypoint_index': 'closest_waypoint_index'}
+# object avoidance params: the logs are of time trials (no objects on track), the simulator passes these then
+OBJECT_PARAMS = {'closest_objects': [0, 0], 'objects_distance': [], 'objects_heading': [],
+                 'objects_left_of_center': [], 'objects_location': [], 'objects_speed': []}
+
+
+def load_reward_function(path, name='reward_function'):
+    """
+    :param path: [string] Python file defining the reward function.
+    :param name: [string] Name of reward function in that file.
+    :return: [function]
+    """
+    spec = importlib.util.spec_from_file_location('replayed_reward', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, name)
+
+
+class RewardReplay:
+    def __init__(self, parsed_log):
+        """
+        :param parsed_log: [SimLogParser] Parsed log (replays its "lap_complete" episodes).
+        """
+        self.parsed_log = parsed_log
+        track = load_track(parsed_log.track)
+        self.waypoints = list(track.waypoints)
+        self.track_width = track.track_width
+        self.params = self._build_params()
+        self.rewards, self.elapsed = None, 0.0
+
+    def _build_params(self):
+        """
+        :return: [dict] Params of every step as arrays (plus the per track constants).
+        """
+        data = self.parsed_log.data
+        params = {name: data[col].to_numpy() for name, col in PARAM_COLUMNS.items()}
+        # log only has the simulator's closest waypoint, so centerline values come from projecting the car on it
+        projection = TrackGeometry(self.waypoints).project(params['x'], params['y'])
+        segment = projection.segment
+        params['closest_waypoints'] = np.column_stack((segment, (segment + 1) % len(self.waypoints)))
+        params['distance_from_center'] = projection.distance
+        params['is_left_of_center'] = projection.offset > 0
+        params['is_offtrack'] = (data['status'] == 'off_track').to_numpy()
+        params['is_crashed'] = np.zeros(len(data), dtype=bool)
+        params['is_reversed'] = np.zeros(len(data), dtype=bool)
+        params['track_width'] = self.track_width
+        params['waypoints'] = self.waypoints
+        params.update(OBJECT_PARAMS)
+        return params
+
+    def iter_params(self):
+        """
+        :return: generator of the standard (scalar) params dict of every step. A new dict is made per step, just
+                 like the simulator does, so reward functions may keep or change it.
+        """
+        constants = {'track_width': self.track_width, 'waypoints': self.waypoints, **OBJECT_PARAMS}
+        names = [name for name, value in self.params.items() if name not in constants]
+        # plain Python values (not numpy scalars) like the simulator passes
+        columns = [self.params[name].tolist() for name in names]
+        for values in zip(*columns):
+            params = dict(zip(names, values))
+            params.update(constants)
+            yield params
+
+    def run(self, reward_function, batch=False):
+        """
+        Evaluate reward function on every step.
+        :param reward_function: [function] reward_function(params) -> reward.
+        :param batch: [bool] If True, reward_function is called once with params of all steps as arrays and must
+                      return an array of rewards.
+        :return: [DataFrame] Old (logged) and new (replayed) reward of every episode (see episode_rewards()).
+        """
+        start = time.perf_counter()
+        with span('replay', batch=batch) as s:
+            if batch:
+                rewards = np.broadcast_to(np.asarray(reward_function(self.params), dtype=np.float64),
+                                          (self.parsed_log.num_rows,))
+            else:
+                rewards = np.fromiter((reward_function(params) for params in self.iter_params()), dtype=np.float64,
+                                      count=self.parsed_log.num_rows)
+            s.add('rows', self.parsed_log.num_rows)
+            s.add('episodes', len(self.parsed_log.episode_bounds))
+        self.elapsed = time.perf_counter() - start
+        self.rewards = rewards
+        return self.episode_rewards()
+
+    def episode_rewards(self):
+        """
+        :return: [DataFrame] One row per episode: episode, steps, old/new reward sums and their difference.
+        """
+        starts = np.array([start for start, _ in self.parsed_log.episode_bounds], dtype=np.int64)
+        if not len(starts):
+            return pd.DataFrame(columns=['episode', 'steps', 'old_reward', 'new_reward', 'diff'])
+        data = self.parsed_log.data
+        old = np.add.reduceat(data['reward'].to_numpy(), starts)
+        new = np.add.reduceat(self.rewards, starts)
+        return pd.DataFrame({'episode': data['episode'].to_numpy()[starts],
+                             'steps': np.diff(np.append(starts, len(data))),
+                             'old_reward': old, 'new_reward': new, 'diff': new - old})
+
+    def __str__(self):
+        steps = self.parsed_log.num_rows
+        rate = steps / self.elapsed if self.elapsed else float('inf')
+        out = f'\nReplayed {steps} steps of {len(self.parsed_log.episode_bounds)} episodes ' \
+              f'in {self.elapsed:.2f}s ({rate:,.0f} steps/s)\n'
+        if self.rewards is not None and steps:
+            old = self.parsed_log.data['reward'].to_numpy()
+            out += f'\tAverage Reward per Step: old = {old.mean():.4f}, new = {self.rewards.mean():.4f}\n'
+            out += f'\tCorrelation of old and new reward = {np.corrcoef(old, self.rewards)[0, 1]:.4f}\n'
+        return out
+
+
+def main(argv=None, prog=None):
+    """
+    :param argv: list[string] Command line arguments (default: sys.argv[1:]).
+    :param prog: [string] Program name shown in help (default: script name, cli.py passes its subcommand).
+    """
+    parser = ArgumentParser(prog=prog, description=__doc__, formatter_class=RawTextHelpFormatter)
+    parser.add_argument('log', type=valid_aws_log_file,
+                        help="AWS Log file containing 'SIM_TRACE_LOG' and 'Reset'")
+    parser.add_argument('reward', help="Python file defining reward_function(params).")
+    parser.add_argument('-function', default='reward_function',
+                        help="Name of reward function in reward file (default: reward_function).")
+    parser.add_argument('-batch', action='store_true', default=False,
+                        help="If provided, reward function is called once with arrays of all steps in params "
+                             "and must return an array of rewards.")
+    parser.add_argument('-track', choices=TRACKS, default=DEFAULT_TRACK,
+                        help="Track the log was recorded on (default: reinvent2018).")
+    parser.add_argument('-out', default=None,
+                        help="If provided, old/new reward of every episode is written to this CSV file.")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    with profiling(args.profile):
+        replay = RewardReplay(SimLogParser(args.log, track=args.track))
+        episodes = replay.run(load_reward_function(args.reward, args.function), batch=args.batch)
+    with pd.option_context('display.max_rows', 20):
+        print(episodes)
+    print(replay)
+    if args.out:
+        episodes.to_csv(args.out, index=False)
+        print(f'Wrote rewards of {len(episodes)} episodes to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
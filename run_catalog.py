@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Catalog of many parsed logs (runs) in one local SQLite database, for comparing model variants without re-parsing.
+Every log is parsed once (with the parsed log cache) and stored as:
+    runs: one row per log (fingerprint, track, episode counts, best/mean/median/p90/p95 lap time, mean speed)
+    episodes: one row per episode ("off_track" ones too: steps, lap time, reward and mean speed of laps)
+    waypoints: per run and closest waypoint sums (steps, speed, reward) of all "lap_complete" steps
+    steps: every "lap_complete" step, indexed by run/episode and by waypoint/run
+Ingesting is bulk (batched inserts in one transaction) and idempotent: a log whose fingerprint is already cataloged
+is skipped (see util.cache.fingerprint). Summary tables answer the usual cross-run queries in milliseconds.
+Examples:
+    python run_catalog.py -h  # show help menu
+    python run_catalog.py ingest logs/*.log -workers 4
+    python run_catalog.py runs  # every run and its lap time stats
+    python run_catalog.py best  # best lap per run
+    python run_catalog.py waypoints  # mean speed and reward per waypoint across runs
+    python run_catalog.py improved -quantile p95  # runs whose 95th percentile lap time beat the run before them
+    python run_catalog.py sql "SELECT name, laps FROM runs ORDER BY laps DESC LIMIT 5"
+"""
+import os
+import sqlite3
+import time
+from argparse import ArgumentParser, RawTextHelpFormatter
+import numpy as np
+import pandas as pd
+
+from simlogparser import SimLogParser
+from data.registry import DEFAULT_TRACK, TRACKS
+from util.cache import CACHE_DIR, fingerprint
+from util.misc import valid_aws_log_file
+
+CATALOG_PATH = os.environ.get('DEEPRACER_CATALOG', os.path.join(CACHE_DIR, 'catalog.sqlite'))
+INSERT_BATCH = 50000  # rows per executemany() call while ingesting steps
+QUANTILES = ('p50', 'p90', 'p95')  # lap time percentiles kept per run
+
+# steps columns and the SimLogParser.data column each one is taken from
+STEP_COLUMNS = {'episode': 'episode', 'step': 'step', 'x': 'x_coord', 'y': 'y_coord', 'heading': 'heading',
+                'steering': 'steering', 'speed': 'speed', 'action': 'action_taken', 'reward': 'reward',
+                'progress': 'progress', 'waypoint': 'closest_waypoint_index', 'time': 'time'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY, name TEXT NOT NULL, log TEXT NOT NULL, fingerprint TEXT NOT NULL UNIQUE,
+    track TEXT NOT NULL, ingested REAL NOT NULL, episodes INTEGER, laps INTEGER, offtracks INTEGER,
+    best_lap REAL, best_episode INTEGER, mean_lap REAL, p50_lap REAL, p90_lap REAL, p95_lap REAL,
+    mean_speed REAL, steps INTEGER);
+CREATE TABLE IF NOT EXISTS episodes (
+    run_id INTEGER NOT NULL REFERENCES runs ON DELETE CASCADE, episode INTEGER NOT NULL, status TEXT NOT NULL,
+    steps INTEGER NOT NULL, lap_time REAL, reward REAL, mean_speed REAL);
+CREATE INDEX IF NOT EXISTS episodes_run ON episodes (run_id, episode);
+CREATE TABLE IF NOT EXISTS waypoints (
+    run_id INTEGER NOT NULL REFERENCES runs ON DELETE CASCADE, waypoint INTEGER NOT NULL, steps INTEGER NOT NULL,
+    speed REAL NOT NULL, reward REAL NOT NULL, PRIMARY KEY (run_id, waypoint)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS waypoints_waypoint ON waypoints (waypoint, run_id);
+CREATE TABLE IF NOT EXISTS steps (
+    run_id INTEGER NOT NULL REFERENCES runs ON DELETE CASCADE, episode INTEGER NOT NULL, step INTEGER NOT NULL,
+    x REAL, y REAL, heading REAL, steering REAL, speed REAL, action INTEGER, reward REAL, progress REAL,
+    waypoint INTEGER, time REAL);
+CREATE INDEX IF NOT EXISTS steps_episode ON steps (run_id, episode, step);
+CREATE INDEX IF NOT EXISTS steps_waypoint ON steps (waypoint, run_id);
+"""
+
+
+class RunCatalog:
+    def __init__(self, path=CATALOG_PATH):
+        """
+        :param path: [string] SQLite database file (created with its tables if missing).
+        """
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.execute('PRAGMA journal_mode = WAL')  # readers don't block an ingest (and vice versa)
+        self.db.execute('PRAGMA synchronous = NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def run_id(self, key):
+        """
+        :param key: [string] Log fingerprint or run name.
+        :return: [int] Run id, None if no such run (latest run of that name if several).
+        """
+        row = self.db.execute('SELECT run_id FROM runs WHERE fingerprint = ? OR name = ? ORDER BY run_id DESC',
+                              (key, key)).fetchone()
+        return row and row[0]
+
+    def _known_run_id(self, key):
+        """
+        :param key: [string] Log fingerprint or run name.
+        :return: [int] Run id (see run_id()). Raises ValueError if there is no such run.
+        """
+        run_id = self.run_id(key)
+        if run_id is None:
+            raise ValueError(f"Unknown run '{key}': no run has this name or fingerprint")
+        return run_id
+
+    def ingest(self, logfile, name=None, track=DEFAULT_TRACK, workers=1, replace=False):
+        """
+        Parse a log (cached parse is reused) and store it as one run, all in one transaction.
+        :param logfile: [string] AWS Log file containing 'SIM_TRACE_LOG' and 'Reset'.
+        :param name: [string] Run name (default: log file name without extension).
+        :param track: [string] Track the log was recorded on.
+        :param workers: [int] Number of processes used to parse the log.
+        :param replace: [bool] If True, a run of the same log fingerprint is deleted and ingested again.
+        :return: [tuple] (run id, True if ingested or False if the log was already cataloged).
+        """
+        key = fingerprint(logfile, track)
+        existing = self.run_id(key)
+        if existing is not None and not replace:
+            return existing, False
+        parsed = SimLogParser(logfile, workers=workers, track=track)
+        with self.db:  # one transaction: a failed ingest leaves no partial run behind
+            if existing is not None:
+                self.db.execute('DELETE FROM runs WHERE run_id = ?', (existing,))
+            run_id = self._insert_run(parsed, key, name or os.path.splitext(os.path.basename(logfile))[0])
+            self._insert_episodes(run_id, parsed)
+            self._insert_waypoints(run_id, parsed.data)
+            self._insert_steps(run_id, parsed.data)
+        return run_id, True
+
+    def _insert_run(self, parsed, key, name):
+        lap_times = np.asarray(parsed.lap_times, dtype=np.float64)
+        stats = {'best_lap': None, 'best_episode': None, 'mean_lap': None, **{f'{q}_lap': None for q in QUANTILES}}
+        if len(lap_times):
+            best = int(np.argmin(lap_times))
+            stats.update(best_lap=float(lap_times[best]), best_episode=int(parsed.lap_episodes[best]),
+                         mean_lap=float(lap_times.mean()))
+            stats.update({f'{q}_lap': float(np.percentile(lap_times, int(q[1:]))) for q in QUANTILES})
+        speed = parsed.data['speed'].to_numpy()
+        cursor = self.db.execute(
+            'INSERT INTO runs (name, log, fingerprint, track, ingested, episodes, laps, offtracks, best_lap, '
+            'best_episode, mean_lap, p50_lap, p90_lap, p95_lap, mean_speed, steps) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (name, os.path.abspath(parsed.logfile), key, parsed.track, time.time(),
+             len(lap_times) + len(parsed.offtracks), len(lap_times), len(parsed.offtracks), stats['best_lap'],
+             stats['best_episode'], stats['mean_lap'], *(stats[f'{q}_lap'] for q in QUANTILES),
+             float(speed.mean()) if len(speed) else None, len(speed)))
+        return cursor.lastrowid
+
+    def _insert_episodes(self, run_id, parsed):
+        data = parsed.data
+        starts = np.array([start for start, _ in parsed.episode_bounds], dtype=np.int64)
+        rows = [(run_id, episode, 'off_track', steps, None, None, None) for episode, steps in parsed.offtracks]
+        if len(starts):
+            counts = np.diff(np.append(starts, len(data)))
+            rewards = np.add.reduceat(data['reward'].to_numpy(), starts)
+            speeds = np.add.reduceat(data['speed'].to_numpy(), starts) / counts
+            rows += zip([run_id] * len(starts), data['episode'].to_numpy()[starts].tolist(),
+                        ['lap_complete'] * len(starts), data['step'].to_numpy()[starts + counts - 1].tolist(),
+                        np.asarray(parsed.lap_times, dtype=np.float64).tolist(), rewards.tolist(), speeds.tolist())
+        self.db.executemany('INSERT INTO episodes VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def _insert_waypoints(self, run_id, data):
+        waypoint = data['closest_waypoint_index'].to_numpy()
+        if not len(waypoint):
+            return
+        steps = np.bincount(waypoint)
+        speed = np.bincount(waypoint, weights=data['speed'].to_numpy())
+        reward = np.bincount(waypoint, weights=data['reward'].to_numpy())
+        seen = np.flatnonzero(steps)
+        self.db.executemany('INSERT INTO waypoints VALUES (?, ?, ?, ?, ?)',
+                            zip([run_id] * len(seen), seen.tolist(), steps[seen].tolist(), speed[seen].tolist(),
+                                reward[seen].tolist()))
+
+    def _insert_steps(self, run_id, data):
+        insert = f'INSERT INTO steps VALUES (?, {", ".join("?" * len(STEP_COLUMNS))})'
+        for start in range(0, len(data), INSERT_BATCH):
+            # plain Python values (tolist) bind much faster than numpy scalars
+            columns = [data[col].to_numpy()[start:start + INSERT_BATCH].tolist() for col in STEP_COLUMNS.values()]
+            self.db.executemany(insert, zip([run_id] * len(columns[0]), *columns))
+
+    def query(self, sql, params=()):
+        """
+        :param sql: [string] Any SELECT on the catalog tables.
+        :param params: [tuple] Bound parameters.
+        :return: [DataFrame] Result rows.
+        """
+        cursor = self.db.execute(sql, params)
+        return pd.DataFrame(cursor.fetchall(), columns=[col[0] for col in cursor.description])
+
+    def runs(self):
+        """
+        :return: [DataFrame] Every run in ingestion order.
+        """
+        return self.query('SELECT run_id, name, track, episodes, laps, offtracks, best_lap, mean_lap, p50_lap, '
+                          'p90_lap, p95_lap, mean_speed FROM runs ORDER BY run_id')
+
+    def best_laps(self):
+        """
+        :return: [DataFrame] Best lap (time, episode and its steps) of every run with laps, fastest first.
+        """
+        return self.query('SELECT r.run_id, r.name, r.best_episode AS episode, r.best_lap AS lap_time, e.steps, '
+                          'e.reward, e.mean_speed FROM runs r JOIN episodes e ON e.run_id = r.run_id AND '
+                          "e.episode = r.best_episode AND e.status = 'lap_complete' AND e.lap_time = r.best_lap "
+                          'ORDER BY r.best_lap')
+
+    def waypoint_speeds(self, track=DEFAULT_TRACK, runs=None):
+        """
+        :param track: [string] Track of the runs included (waypoints of different tracks don't compare).
+        :param runs: list[string] Names or fingerprints of runs to include (default: all runs of track). Runs of
+                     other tracks are left out. Raises ValueError if one of them isn't cataloged.
+        :return: [DataFrame] Mean speed and reward of "lap_complete" steps at every closest waypoint across runs.
+        """
+        where, params = 'WHERE run_id IN (SELECT run_id FROM runs WHERE track = ?) ', (track,)
+        if runs:
+            run_ids = tuple(self._known_run_id(run) for run in runs)
+            where = f'WHERE run_id IN (SELECT run_id FROM runs WHERE track = ? AND run_id IN ' \
+                    f'({", ".join("?" * len(run_ids))})) '
+            params += run_ids
+        return self.query('SELECT waypoint, SUM(steps) AS steps, SUM(speed) / SUM(steps) AS mean_speed, '
+                          'SUM(reward) / SUM(steps) AS mean_reward, COUNT(*) AS runs FROM waypoints '
+                          f'{where}GROUP BY waypoint ORDER BY waypoint', params)
+
+    def improved(self, quantile='p95', baseline=None):
+        """
+        :param quantile: [string] Lap time statistic compared, one of QUANTILES (or 'best', 'mean').
+        :param baseline: [string] Name or fingerprint of the run every run is compared to. If None, every run is
+                         compared to the run ingested before it on the same track. Raises ValueError if there is no
+                         such run.
+        :return: [DataFrame] Runs whose lap time statistic is lower (better) than their baseline's.
+        """
+        if quantile not in QUANTILES + ('best', 'mean'):
+            raise ValueError(f"Unknown quantile '{quantile}'. Must be one of these: {QUANTILES + ('best', 'mean')}")
+        column = f'{quantile}_lap'
+        if baseline is None:
+            return self.query(f'SELECT run_id, name, previous AS baseline, {column}, previous_lap AS baseline_lap, '
+                              f'{column} - previous_lap AS change FROM (SELECT run_id, name, {column}, '
+                              'LAG(name) OVER win AS previous, '
+                              f'LAG({column}) OVER win AS previous_lap FROM runs '
+                              'WINDOW win AS (PARTITION BY track ORDER BY run_id)) '
+                              f'WHERE {column} < previous_lap ORDER BY run_id')
+        base = self._known_run_id(baseline)
+        return self.query(f'SELECT r.run_id, r.name, b.name AS baseline, r.{column}, b.{column} AS baseline_lap, '
+                          f'r.{column} - b.{column} AS change FROM runs r, runs b WHERE b.run_id = ? AND '
+                          f'r.run_id != b.run_id AND r.{column} < b.{column} ORDER BY change', (base,))
+
+    def remove(self, run):
+        """
+        :param run: [string] Name or fingerprint of run to delete (with all its rows).
+        :return: [bool] True if a run was deleted.
+        """
+        run_id = self.run_id(run)
+        with self.db:
+            return run_id is not None and self.db.execute('DELETE FROM runs WHERE run_id = ?', (run_id,)).rowcount > 0
+
+
+def main(argv=None, prog=None):
+    """
+    :param argv: list[string] Command line arguments (default: sys.argv[1:]).
+    :param prog: [string] Program name shown in help (default: script name, cli.py passes its subcommand).
+    """
+    parser = ArgumentParser(prog=prog, description=__doc__, formatter_class=RawTextHelpFormatter)
+    parser.add_argument('-db', default=CATALOG_PATH,
+                        help="Catalog database (default: %(default)s, set DEEPRACER_CATALOG to change it).")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest = subparsers.add_parser('ingest', help="Parse logs and add them to the catalog (skips cataloged logs).")
+    ingest.add_argument('logs', nargs='+', type=valid_aws_log_file,
+                        help="AWS Log files containing 'SIM_TRACE_LOG' and 'Reset'")
+    ingest.add_argument('-track', choices=TRACKS, default=DEFAULT_TRACK,
+                        help="Track the logs were recorded on (default: %(default)s).")
+    ingest.add_argument('-workers', type=int, default=1, help="Number of processes used to parse each log.")
+    ingest.add_argument('-replace', action='store_true', default=False,
+                        help="If provided, logs already cataloged are ingested again.")
+    subparsers.add_parser('runs', help="Every run and its lap time stats.")
+    subparsers.add_parser('best', help="Best lap per run, fastest first.")
+    waypoints = subparsers.add_parser('waypoints', help="Mean speed and reward per waypoint across runs.")
+    waypoints.add_argument('-track', choices=TRACKS, default=DEFAULT_TRACK,
+                           help="Track of the runs included (default: %(default)s).")
+    waypoints.add_argument('-runs', nargs='+', default=None, help="Only these runs (names or fingerprints).")
+    improved = subparsers.add_parser('improved', help="Runs whose lap time statistic improved.")
+    improved.add_argument('-quantile', choices=QUANTILES + ('best', 'mean'), default='p95',
+                          help="Lap time statistic compared (default: %(default)s).")
+    improved.add_argument('-baseline', default=None,
+                          help="Run compared to (default: run ingested before each run on the same track).")
+    remove = subparsers.add_parser('remove', help="Delete runs (and all their rows).")
+    remove.add_argument('runs', nargs='+', help="Names or fingerprints of runs.")
+    sql = subparsers.add_parser('sql', help="Run any SELECT on tables runs, episodes, waypoints and steps.")
+    sql.add_argument('query')
+    args = parser.parse_args(argv)
+    with RunCatalog(args.db) as catalog:
+        start = time.perf_counter()
+        if args.command == 'ingest':
+            for log in args.logs:
+                run_id, ingested = catalog.ingest(log, track=args.track, workers=args.workers, replace=args.replace)
+                print(f"{'Ingested' if ingested else 'Already cataloged'} {log} (run {run_id})")
+        elif args.command == 'remove':
+            for run in args.runs:
+                print(f"{'Removed' if catalog.remove(run) else 'No run named'} {run}")
+        else:
+            try:
+                result = {'runs': catalog.runs, 'best': catalog.best_laps,
+                          'waypoints': lambda: catalog.waypoint_speeds(args.track, args.runs),
+                          'improved': lambda: catalog.improved(args.quantile, args.baseline),
+                          'sql': lambda: catalog.query(args.query)}[args.command]()
+            except ValueError as e:  # unknown run
+                parser.error(str(e))
+            with pd.option_context('display.max_rows', 200, 'display.width', 200):
+                print(result)
+        print(f'\n{args.command} took {(time.perf_counter() - start) * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,15 +2,28 @@
 """
 Extract/parse AWS Deepracer SIM logs
 """
-import re
+import io
+import os
+import time
 from collections import namedtuple
+from functools import partial
 import pandas as pd
 import numpy as np
 from pprint import pprint
 from argparse import ArgumentParser, RawTextHelpFormatter
 
+from util import cache
+from util.buffer import ColumnBuffer
+from util.export import EXPORT_FORMATS, export, export_path
+from util.compression import compression
 from util.misc import valid_aws_log_file
-from data.reinvent2018 import target_points
+from util.profiler import add_profile_argument, profiling, span
+from util.logreader import CHUNK_SIZE, EpisodeScanner, iter_episodes, parse_parallel
+from util.heading import HeadingEngine
+from util.stats import LogSummary
+from util.summary import format_summary, offtrack, summarize_episodes, summarize_log
+from util.telemetry import derive_frame
+from data.registry import DEFAULT_TRACK, TRACKS
 
 Row = namedtuple('logs', 'episode, step, x_coord, y_coord, heading, steering, speed, action_taken, reward, '
                          'job_completed, all_wheels_on_track, progress, closest_waypoint_index,'
@@ -20,108 +33,355 @@ numerics = ['episode', 'step', 'x_coord', 'y_coord', 'heading', 'steering', 'spe
             'progress', 'closest_waypoint_index', 'track_length', 'time']
 booleans = ['job_completed', 'all_wheels_on_track']
 strings = ['status']
-truth_map = {'True': True, 'False': False}
+integers = ['episode', 'step', 'action_taken', 'closest_waypoint_index']
+dtypes = {**{n: 'float64' for n in numerics}, **{n: 'int64' for n in integers}, **{b: 'bool' for b in booleans},
+          **{s: 'category' for s in strings}}
 
-PlotPts = namedtuple('PlotPts', 'x y speed reward')
+DECODE_BATCH = 1000000  # number of SIM_TRACE_LOG rows converted per vectorized decode
+
+# columnar store of plotted values, one array per field (one entry per "lap_complete" row)
+PlotPts = namedtuple('PlotPts', 'episode, step, x, y, closest_waypoint_index, speed, reward')
+
+
+def decode_rows(rows):
+    """
+    Decode raw SIM_TRACE_LOG payloads into typed columns in one vectorized pass.
+    :param rows: list[bytes] Raw comma separated payloads (text after 'SIM_TRACE_LOG:').
+    :return: [DataFrame] One column per Row field (floats, ints, bools and a categorical status).
+    """
+    with span('decode') as s:
+        s.add('rows', len(rows))
+        return pd.read_csv(io.BytesIO(b'\n'.join(rows)), header=None, names=Row._fields, dtype=dtypes, engine='c')
+
+
+def parse_episodes(episodes, engine, decode_batch=DECODE_BATCH):
+    """
+    Decode closed episodes into batches of "lap_complete" episodes.
+    :param episodes: iterable[Episode] Closed episodes (see util.logreader).
+    :param engine: [HeadingEngine] Heading engine of track the log was recorded on.
+    :param decode_batch: [int] Minimum number of rows collected (whole episodes only) before decoding them at once.
+    :return: [tuple] (batches, offtracks) where batches is a list of (DataFrame, episode start rows) and offtracks
+             a list of (episode, step) of every "off_track" episode.
+    """
+    batches, offtracks = [], []
+    rows, starts = [], []
+    for episode in episodes:
+        if episode.status == 'off_track':
+            offtracks.append(offtrack(episode))
+            continue
+        starts.append(len(rows))
+        rows += episode.rows
+        if len(rows) >= decode_batch:
+            batches.append((decode_rows(rows), starts))
+            rows, starts = [], []
+    if rows:
+        batches.append((decode_rows(rows), starts))
+    with span('heading') as s:
+        for df, _ in batches:
+            engine.apply(df)
+            s.add('rows', len(df))
+    return batches, offtracks
+
+
+def parse_range(logfile, engine, start=0, stop=None, chunk_size=CHUNK_SIZE, decode_batch=DECODE_BATCH, carry=None):
+    """
+    Parse one byte range of a log into decoded batches of "lap_complete" episodes.
+    Module level (not a method) so it can run in a worker process.
+    :param logfile: [string] AWS Log file containing 'SIM_TRACE_LOG' and 'Reset'.
+    :param engine: [HeadingEngine] Heading engine of track the log was recorded on.
+    :param start: [int] Byte offset of first line of range.
+    :param stop: [int] Byte offset of end of range. If None, parses to end of file.
+    :param chunk_size: [int] Number of bytes read from log per scan step.
+    :param decode_batch: [int] Minimum number of rows collected (whole episodes only) before decoding them at once.
+    :param carry: list[bytes] Rows of an episode left open by the previous range. None if no episode is open.
+    :return: [tuple] (batches, offtracks, carry) where batches is a list of (DataFrame, episode start rows),
+             offtracks is the (episode, step) of every "off_track" episode and carry is the rows of the episode
+             still open at end of range (None if no episode is open).
+    """
+    scanner = EpisodeScanner()
+    if carry is not None:
+        scanner.in_episode, scanner.rows = True, carry
+    episodes = iter_episodes(logfile, start, stop, chunk_size, scanner)
+    batches, offtracks = parse_episodes(episodes, engine, decode_batch)
+    return batches, offtracks, scanner.rows if scanner.in_episode else None
 
 
 class SimLogParser:
 
-    def __init__(self, logfile='aws.log', verbose=False):
+    def __init__(self, logfile='aws.log', verbose=False, chunk_size=CHUNK_SIZE, decode_batch=DECODE_BATCH, workers=1,
+                 use_cache=True, rebuild_cache=False, follow=False, export_format='none', export_background=False,
+                 track=DEFAULT_TRACK, stats_only=False):
+        """
+        :param logfile: [string] AWS Log file containing 'SIM_TRACE_LOG' and 'Reset'.
+        :param verbose: [bool] If True, prints summary of every "lap_complete" episode.
+        :param chunk_size: [int] Number of bytes read from log per scan step (log is streamed, never fully loaded).
+        :param decode_batch: [int] Minimum number of rows collected (whole episodes only) before decoding them at once.
+        :param workers: [int] Number of processes used to parse the log. If > 1, log is split at episode boundaries
+                        and ranges are parsed in parallel (results are identical to serial parsing). Logs can be
+                        gzip, bz2 or zstd compressed: multi-frame zstd logs are decoded in parallel too.
+        :param use_cache: [bool] If True, parsed log is loaded from / saved to the on-disk cache (util/cache.py).
+        :param rebuild_cache: [bool] If True, ignores any cached entry and re-parses the log (cache is refreshed).
+        :param follow: [bool] If True, log is treated as still growing: byte offset and half-finished episode are kept
+                       so refresh() only parses newly appended bytes. Cache and workers are not used. Log can't be
+                       compressed.
+        :param export_format: [string] Format of file written next to log with all "lap_complete" rows.
+                              One of util.export.EXPORT_FORMATS ('none', 'xlsx', 'csv', 'parquet', 'feather', 'npz').
+        :param export_background: [bool] If True, export is written by a background thread (see self.export_thread).
+        :param track: [string] Track the log was recorded on (see data.registry.TRACKS).
+        :param stats_only: [bool] If True, only the summary (self.summary, printed by str()) is computed: every
+                           episode is folded into running stats and then dropped, so memory doesn't grow with the
+                           log. No rows are kept (data, plot_pts, lap_times, etc. stay empty) and cache and export
+                           are not used.
+        """
+        if follow and compression(logfile):
+            raise ValueError(f"'{logfile}' is compressed: only a plain log can be followed")
         self.logfile = logfile
-        self.num_offtracks = 0
-        self.good_episodes, self.lap_times, self.steps, self.plot_pts = [], [], [], []
-        self.good_episode_list = set()
-        self.logfile = logfile
-        self.episode_data = {}
-        self._parse()
+        self.chunk_size = chunk_size
+        self.decode_batch = decode_batch
+        self.workers = 1 if follow else workers
+        self.follow = follow
+        self.track = track
+        self.stats_only = stats_only
+        self.engine = HeadingEngine.for_track(track)
+        self._reset()
+        use_cache = use_cache and not follow and not stats_only
+        # cached best_heading/direction_diff depend on the track's targets: rewritten targets invalidate the entry
+        cache_key = cache.fingerprint(logfile, extra=f'{track}:{self.engine.digest}') if use_cache else None
+        cached = None
+        if use_cache and not rebuild_cache:
+            with span('cache_load') as s:
+                cached = cache.load(cache_key)
+                s.add('hits', int(cached is not None))
+        if cached is None:
+            self._parse()
+            if use_cache:
+                with span('cache_store') as s:
+                    s.add('rows', self.num_rows)
+                    cache.store(cache_key, self.data, [start for start, _ in self.episode_bounds], self.offtracks)
+        else:
+            df, starts, offtracks = cached
+            self._add_offtracks(offtracks)
+            self._add_batch(df, starts)
         self._aggregate()
-        if len(self.good_episodes):
-            combined_episodes = pd.concat(self.good_episodes) if len(self.good_episodes) > 1 else self.good_episodes
-            combined_episodes = pd.DataFrame(combined_episodes)
-            combined_episodes.to_excel(f'{self.logfile.rstrip(".log")}.xlsx', index=False)
-        if verbose:
+        self.export_thread = None
+        # an unchanged (cached) log doesn't need its export rewritten
+        if export_format != 'none' and self.episode_bounds and \
+                (cached is None or not os.path.isfile(export_path(logfile, export_format))):
+            self.export_thread = export(self.data, logfile, export_format, background=export_background)
+        if verbose and not stats_only:
             pprint(self.episode_data)
         print(self)
 
+    def _reset(self):
+        self.summary = LogSummary()  # everything printed by str()
+        self.offtracks = []  # (episode, step) of every "off_track" episode
+        self.lap_times, self.steps = [], []
+        self.lap_episodes = []  # episode number of each entry in lap_times/steps
+        self.good_episode_list = set()
+        self.episode_index = {}  # episode number -> list of (start, stop) rows in data (usually just one)
+        self.episode_data = {}
+        self.frames, self.episode_bounds = [], []  # decoded batches and (start, stop) rows of each episode in data
+        # follow mode appends a batch per refresh: rows go to a growing buffer instead, so data isn't concatenated
+        # again from all batches after every refresh
+        self._buffer = ColumnBuffer() if self.follow else None
+        self.num_rows = 0
+        self._data, self._plot_pts, self._telemetry = None, None, None
+        self._num_aggregated = 0  # number of episode_bounds already folded into lap_times, steps, etc.
+        self._scanner, self._offset = EpisodeScanner(), 0  # follow mode state
+
     def _parse(self):
-        in_episode = False
-        with open(self.logfile) as f:
-            data = None
-            for line in f.readlines():
-                if not len(line.strip()):
-                    continue
-                if not in_episode:
-                    if re.search('Reset agent', line):
-                        in_episode = True
-                        data = []
-                else:
-                    obj = re.search(r'(?<=SIM_TRACE_LOG:)(.+)', line)
-                    if obj:
-                        if data is None:
-                            raise TypeError(f'DataFrame not initialized: len(good_episodes)={len(self.good_episodes)}')
-                        row = Row(*obj.group(0).split(','))
-                        if row.status == 'off_track':
-                            in_episode = False
-                            self.num_offtracks += 1
-                            continue
-                        data.append(row)
-                        if row.status == 'lap_complete':
-                            in_episode = False
-                            df = pd.DataFrame(data=data)
-                            df[numerics] = df[numerics].apply(pd.to_numeric)
-                            df.closest_waypoint_index = df.closest_waypoint_index.mod(70)
-                            for b in booleans:
-                                df[b] = df[b].map(truth_map)
-                            df[strings] = df[strings].astype(str)
-                            x2, y2 = zip(*np.array(target_points)[df.closest_waypoint_index])
-                            best_heading = np.degrees(np.arctan2(y2 - df['y_coord'], x2 - df['x_coord']))
-                            df['best_heading'] = best_heading
-                            df['direction_diff'] = abs(((best_heading - df['heading']) + 180) % 360 - 180)
-                            # if df['step'].iloc[-1] < 107:
-                            self.good_episodes.append(df)
+        if self.follow:
+            self.refresh()
+            return
+        with span('parse', workers=self.workers) as s:
+            s.add('bytes', os.path.getsize(self.logfile))
+            if self.stats_only:
+                self.summary.merge(summarize_log(self.logfile, self.workers, self.chunk_size))
+                s.add('episodes', self.summary.num_laps + self.summary.num_offtracks)
+                return
+            parse = partial(parse_range, engine=self.engine)
+            results = parse_parallel(self.logfile, parse, self.workers, chunk_size=self.chunk_size,
+                                     decode_batch=self.decode_batch) if self.workers > 1 else [
+                parse(self.logfile, chunk_size=self.chunk_size, decode_batch=self.decode_batch)]
+            for batches, offtracks, _ in results:
+                self._add_offtracks(offtracks)
+                for df, starts in batches:
+                    self._add_batch(df, starts)
+            s.add('rows', self.num_rows)
+            s.add('episodes', len(self.episode_bounds) + len(self.offtracks))
+
+    @property
+    def num_offtracks(self):
+        return self.summary.num_offtracks
+
+    def _add_offtracks(self, offtracks):
+        """
+        :param offtracks: list[tuple] (episode, step) of "off_track" episodes.
+        """
+        self.offtracks += offtracks
+        for episode, step in offtracks:
+            self.summary.add_offtrack(episode, step)
+
+    def _add_batch(self, df, starts):
+        """
+        Append decoded batch of whole episodes.
+        :param df: [DataFrame] Decoded rows of consecutive "lap_complete" episodes.
+        :param starts: list[int] Row index in df of the first row of each episode.
+        """
+        stops = starts[1:] + [len(df)]
+        if self._buffer is not None:
+            self._buffer.append(df)
+        else:
+            self.frames.append(df)
+        # episodes are only kept as row offsets: good_episodes slices them out of data when needed
+        self.episode_bounds += [(self.num_rows + start, self.num_rows + stop) for start, stop in zip(starts, stops)]
+        self.num_rows += len(df)
+        self._data, self._plot_pts, self._telemetry = None, None, None
+
+    @property
+    def data(self):
+        """
+        All "lap_complete" rows of the log in one DataFrame (episode rows are given by self.episode_bounds).
+        """
+        if self._data is None:
+            if self._buffer is not None and len(self._buffer):
+                self._data = self._buffer.frame()
+            elif len(self.frames) == 1:
+                self._data = self.frames[0]
+            elif self.frames:
+                self._data = pd.concat(self.frames, ignore_index=True)
+                self.frames = [self._data]  # batches aren't kept alive next to their concatenation
+            else:
+                self._data = pd.DataFrame(columns=Row._fields)
+        return self._data
+
+    @property
+    def good_episodes(self):
+        """
+        Rows of every "lap_complete" episode, in log order, as zero-copy slices of self.data.
+        """
+        data = self.data
+        return [data.iloc[start:stop] for start, stop in self.episode_bounds]
+
+    @property
+    def plot_pts(self):
+        """
+        Columns used by LogPlotter as a PlotPts of arrays (views on self.data, no copies).
+        Rows of one episode are found through self.episode_rows().
+        """
+        if self._plot_pts is None:
+            data = self.data
+            self._plot_pts = PlotPts(*(data[col].to_numpy() for col in ('episode', 'step', 'x_coord', 'y_coord',
+                                                                         'closest_waypoint_index', 'speed', 'reward')))
+        return self._plot_pts
+
+    @property
+    def telemetry(self):
+        """
+        Derived per step telemetry of self.data (dt, ground_speed, accel, heading_unwrapped, heading_rate,
+        steering_rate, curvature, see util.telemetry), same rows. Computed for all episodes at once on first use,
+        never across an episode boundary.
+        """
+        if self._telemetry is None:
+            with span('telemetry') as s:
+                self._telemetry = derive_frame(self.data, [start for start, _ in self.episode_bounds])
+                s.add('rows', len(self._telemetry))
+        return self._telemetry
+
+    def episode_rows(self, episode):
+        """
+        :param episode: [int] Episode number.
+        :return: [slice] Rows of episode in data / plot_pts (index array if episode number shows up more than once).
+        """
+        runs = self.episode_index[episode]
+        if len(runs) == 1:
+            return slice(*runs[0])
+        return np.concatenate([np.arange(start, stop) for start, stop in runs])
+
+    def refresh(self):
+        """
+        Follow mode: parse only bytes appended to the log since last call and update all results in place.
+        A half-written last line or unfinished episode is kept until the rest of it is appended.
+        If the log shrank (rotated/re-downloaded), it is parsed again from the start.
+        :return: [int] Number of new "lap_complete" episodes.
+        """
+        size = os.path.getsize(self.logfile)
+        if size < self._offset:
+            self._reset()
+        first = self.summary.num_laps
+        episodes = iter_episodes(self.logfile, self._offset, size, self.chunk_size, self._scanner, flush=False)
+        with span('refresh') as s:
+            s.add('bytes', size - self._offset)
+            if self.stats_only:
+                summarize_episodes(episodes, self.summary)
+            else:
+                rows = self.num_rows
+                batches, offtracks = parse_episodes(episodes, self.engine, self.decode_batch)
+                self._add_offtracks(offtracks)
+                for df, starts in batches:
+                    self._add_batch(df, starts)
+                s.add('rows', self.num_rows - rows)
+                self._aggregate()
+        self._offset = size
+        return self.summary.num_laps - first
 
     def _aggregate(self):
-        for ep in self.good_episodes:
-            lap_time = ep.time.iloc[-1] - ep.time.iloc[0]
-            ep_num = ep.episode.iloc[0]
-            if ep_num not in self.episode_data:
-                self.episode_data[ep_num] = f'total steps: {ep.step.iloc[-1]}, lap_time={lap_time:.3f}s'
-
-            # WARNING: This line must match what is UNPACKED DOWNSTREAM in LogPlotter (log_plotter.py)
-            self.plot_pts += zip(ep.episode, ep.step, ep.x_coord, ep.y_coord, ep.closest_waypoint_index, ep.speed,
-                                 ep.reward)
-            self.good_episode_list.update(tuple(ep.episode))
-            self.lap_times.append(lap_time)
-            self.steps.append(ep.step.iloc[-1])
+        # only episodes added since last call (follow mode appends episodes)
+        first = self._num_aggregated
+        self._num_aggregated = len(self.episode_bounds)
+        with span('aggregate') as s:
+            s.add('episodes', self._num_aggregated - first)
+            for ep_start, ep_stop in self.episode_bounds[first:]:
+                ep = self.data.iloc[ep_start:ep_stop]
+                lap_time = ep.time.iloc[-1] - ep.time.iloc[0]
+                ep_num = ep.episode.iloc[0]
+                if ep_num not in self.episode_data:
+                    self.episode_data[ep_num] = f'total steps: {ep.step.iloc[-1]}, lap_time={lap_time:.3f}s'
+
+                # an episode without a closing row is merged into the next one: index every run of episode numbers
+                ep_nums = ep.episode.to_numpy()
+                cuts = (np.flatnonzero(ep_nums[1:] != ep_nums[:-1]) + 1).tolist()
+                for start, stop in zip([0] + cuts, cuts + [len(ep_nums)]):
+                    self.episode_index.setdefault(int(ep_nums[start]), []).append((ep_start + start,
+                                                                                   ep_start + stop))
+                self.good_episode_list.update(ep_nums[[0] + cuts].tolist())
+                self.lap_times.append(lap_time)
+                self.lap_episodes.append(ep_num)
+                self.steps.append(ep.step.iloc[-1])
+                self.summary.add_lap(int(ep_num), float(lap_time), int(ep.step.iloc[-1]))
 
     def __str__(self):
-        out = f'\nAnalyzing {len(self.good_episodes) + self.num_offtracks} episodes...\n'
-        out += f'\tNumber of "lap_complete" episodes = {len(self.good_episodes)}\n'
-        out += f'\tNumber of "off_track" episodes = {self.num_offtracks} ... ignoring for analysis\n'
-        if len(self.lap_times):
-            min_time = min(self.lap_times)
-            min_time_idx = self.lap_times.index(min_time)
-            max_time = max(self.lap_times)
-            max_time_idx = self.lap_times.index(max_time)
-            min_step = min(self.steps)
-            min_step_idx = self.steps.index(min_step)
-            max_step = max(self.steps)
-            max_step_idx = self.steps.index(max_step)
-            out += f'\tAverage Lap Time = {np.mean(self.lap_times):.2f}s (StdDev: {np.std(self.lap_times):.4f})\n'
-            out += f'\tMin Lap Time(Steps) = {min_time:.2f}s({self.steps[min_time_idx]})\n'
-            out += f'\tMax Lap Time(Steps)= {max_time:.2f}s({self.steps[max_time_idx]})\n'
-            out += f'\tAverage # Steps = {np.mean(self.steps):.1f} (StdDev: {np.std(self.steps):.4f})\n'
-            out += f'\tMin Steps(Lap Time) = {min_step}({self.lap_times[min_step_idx]:.2f}s)\n'
-            out += f'\tMax Steps(Lap Time) = {max_step}({self.lap_times[max_step_idx]:.2f}s)\n'
-        else:
-            out += 'NO DATA COLLECTED !!!!\n'
-        return out
+        # extra stats lines only in stats mode: the full parse keeps its original report for scripts reading it
+        return format_summary(self.summary, detailed=self.stats_only)
 
 
 if __name__ == '__main__':
     parser = ArgumentParser(description=__doc__, formatter_class=RawTextHelpFormatter)
     parser.add_argument('log', type=valid_aws_log_file,
                         help="AWS Log file containing 'SIM_TRACE_LOG' and 'Reset'")
+    parser.add_argument('-track', choices=TRACKS, default=DEFAULT_TRACK,
+                        help="Track the log was recorded on (default: reinvent2018).")
+    parser.add_argument('-workers', type=int, default=1,
+                        help="Number of processes used to parse log (log is split at episode boundaries).")
+    parser.add_argument('-no_cache', action='store_true', default=False,
+                        help="If provided, log is always parsed and the parsed result is not cached.")
+    parser.add_argument('-rebuild_cache', action='store_true', default=False,
+                        help="If provided, ignores cached parse of this log and re-parses it (cache is refreshed).")
+    parser.add_argument('-export', choices=EXPORT_FORMATS, default='none',
+                        help="Format of file written next to log with all 'lap_complete' rows (default: none).")
+    parser.add_argument('-stats_only', action='store_true', default=False,
+                        help="If provided, only summary stats are computed in constant memory (no rows are kept, "
+                             "no cache, no export).")
+    parser.add_argument('-follow', type=float, default=0,
+                        help="If > 0, keeps following the (growing) log and prints updated stats every FOLLOW "
+                             "seconds when new episodes were appended. Ctrl-C to stop.")
+    add_profile_argument(parser)
     args = parser.parse_args()
-    SimLogParser(args.log, verbose=True)
+    with profiling(args.profile):
+        sim_log = SimLogParser(args.log, verbose=True, workers=args.workers, use_cache=not args.no_cache,
+                               rebuild_cache=args.rebuild_cache, follow=args.follow > 0, export_format=args.export,
+                               track=args.track, stats_only=args.stats_only)
+        while args.follow > 0:
+            time.sleep(args.follow)
+            if sim_log.refresh():
+                print(sim_log)
@@ -10,25 +10,32 @@ Examples:
     python targets_creator.py  # show best angle (previously selected)
     python targets_creator.py -show_all_angles
     python targets_creator.py -hide_angles
+    python targets_creator.py -optimize awslog-sim.log -workers 4  # search targets_refs on fastest laps of log
+    python targets_creator.py -raceline  # also show optimized racing line and its target speeds
+    python targets_creator.py -track reinvent2019 -optimize reinvent2019-sim.log  # track without targets_refs yet
 """
 import os
+import time
 from collections import namedtuple
 import math
 from argparse import ArgumentParser, RawTextHelpFormatter
 import matplotlib.pyplot as plt
+import numpy as np
 from pprint import pprint
 
-from data.reinvent2018 import track, waypoints, targets_refs
+from data.registry import DATA_DIR, DEFAULT_TRACK, TRACKS, build_track, load_track, track_modules
 from util.math import calc_distance, convert_degree_angle, average, weighted_avg
+from util.misc import RangeTable, valid_aws_log_file
+from util.profiler import PROFILER, add_profile_argument, profiling, span
+from util.raceline import racing_line, waypoint_points
+from util.targets import NUM_POINTS, SMOOTHNESS, TargetSearch, format_targets_refs, merge_refs
 
 Plots = namedtuple('Plots', 'nfp, idx, last_point_line, avg_angle_line, wtd_avg_angle_line, angle_type, num_points')
 
-all_xs, all_ys = zip(*waypoints)
-
 
 class TargetCreator:
-    def __init__(self, hide_angles=False, show_all_angles=False,
-                 targets_log=os.path.join('data', 'reinvent2018_targets.py')):
+    def __init__(self, hide_angles=False, show_all_angles=False, targets_log=None, optimize_log=None, fastest=10,
+                 num_points=NUM_POINTS, smoothness=SMOOTHNESS, workers=1, show_raceline=False, track=DEFAULT_TRACK):
         """
         :param hide_angles: [bool] If True, this will override self.show_all_angles!!
         :param show_all_angles: [bool] Displays all 3 angles used to decide which is best.
@@ -36,10 +43,36 @@ class TargetCreator:
                                 before first point (aka car), but if False, will only show angle type specified
                                 in targets_refs for that index.
         :param targets_log: [string] OUTPUT file for WRITING target_points: tuple of target points (one per waypoint)
+                            If None, data/<track>_targets.py (and the track's bundle is rebuilt with the new targets).
+        :param optimize_log: [string] If given, targets_refs is not taken from the track bundle but searched (see
+                             optimize()) on the fastest laps of this AWS log, printed, and used for plots and
+                             targets_log (its angle_types/num_points tables, which the rebuilt bundle reads back).
+        :param fastest: [int] Number of fastest "lap_complete" episodes of optimize_log used by the search.
+        :param num_points: [range] Candidate numbers of points searched for every waypoint.
+        :param smoothness: [float] Search penalty per degree the target direction jumps between waypoints.
+        :param workers: [int] Number of processes used to parse optimize_log and score candidates.
+        :param show_raceline: [bool] If True, the optimized racing line (see util.raceline) and its target speed at
+                              each waypoint are drawn too. Its per waypoint tables are written to targets_log
+                              either way.
+        :param track: [string] Track to create targets for (see data.registry.TRACKS).
         """
         self.hide_angles = hide_angles
         self.show_all_angles = show_all_angles
-        self.targets_log = targets_log
+        self.track = load_track(track)
+        self.waypoints = self.track.waypoints
+        self.all_xs, self.all_ys = zip(*self.waypoints)
+        self.rebuild_track = targets_log is None and track in track_modules()
+        self.targets_log = targets_log or os.path.join(DATA_DIR, f'{track}_targets.py')
+        self.targets_refs = self.track.targets_refs
+        self.show_raceline = show_raceline
+        with span('raceline'):
+            self.raceline = racing_line(self.track.xy, self.track.track_width)
+        self.raceline_idxs = waypoint_points(self.raceline, self.waypoints)  # racing line point of each waypoint
+        if optimize_log:
+            self.targets_refs = self.optimize(optimize_log, fastest, num_points, smoothness, workers)
+        elif self.targets_refs is None:
+            raise ValueError(f"Track '{track}' has no targets_refs yet. Search them on a log with optimize_log "
+                             f"(-optimize LOG)")
 
         self.plots = []
         self.target_points = []  # list for buildup, but written to file as tuple
@@ -60,16 +93,16 @@ class TargetCreator:
         target_points_ = []
         if x is None and y is None:
             # No plot_pts provided, so simulating car x, y as closest_waypoint[0]
-            prev_idx = (idx - 1) if idx > 0 else (len(waypoints)-1)
-            curr_x, curr_y = all_xs[prev_idx], all_ys[prev_idx]
+            prev_idx = (idx - 1) if idx > 0 else (len(self.waypoints)-1)
+            curr_x, curr_y = self.all_xs[prev_idx], self.all_ys[prev_idx]
         else:
             curr_x, curr_y = x, y
 
-        nfp = waypoints[idx:idx + num_points]
+        nfp = self.waypoints[idx:idx + num_points]
         len_nfp = len(nfp)
         if len_nfp < num_points:
             # lap restarting, so wrap around to get next few points
-            nfp += waypoints[:num_points - len_nfp]
+            nfp += self.waypoints[:num_points - len_nfp]
 
         # get x's and y's for next few points
         nfp_xs, nfp_ys = zip(*nfp)
@@ -113,19 +146,44 @@ class TargetCreator:
 
         return target_points_
 
+    def optimize(self, log, fastest=10, num_points=NUM_POINTS, smoothness=SMOOTHNESS, workers=1):
+        """
+        Search angle type and number of points of every waypoint whose targets best agree with the headings driven
+        in the fastest laps of a log, while keeping the target direction smooth (see util.targets).
+        :return: [RangeTable] Best targets_refs.
+        """
+        from simlogparser import SimLogParser  # only needed (and its startup paid) when optimizing
+        parsed_log = SimLogParser(log, workers=workers, track=self.track.name)
+        start = time.perf_counter()
+        laps = np.argsort(parsed_log.lap_times, kind='stable')[:fastest]
+        rows = np.concatenate([np.arange(*parsed_log.episode_bounds[lap]) for lap in laps]) if len(laps) else []
+        data = parsed_log.data
+        steps = tuple(data[col].to_numpy()[rows] for col in ('closest_waypoint_index', 'x_coord', 'y_coord', 'heading'))
+        search = TargetSearch(self.waypoints, num_points, smoothness)
+        with span('optimize') as s:
+            s.add('steps', len(rows))
+            s.add('candidates', len(search.candidates) * len(self.waypoints))
+            refs = search.best(search.costs(steps, workers))
+        print(f'Searched {len(search.candidates)} candidates for each of {len(self.waypoints)} waypoints against '
+              f'{len(rows)} steps of {len(laps)} fastest laps in {time.perf_counter() - start:.2f}s:')
+        print(format_targets_refs(refs))
+        return RangeTable(merge_refs(refs), size=len(self.waypoints))
+
     def get_target_points(self):
-        for idx, _ in enumerate(waypoints):
-            self.target_points += self._generate_targets(idx, *targets_refs[idx])
-        assert len(self.target_points) == len(waypoints), (f'Mismatch size: len(waypoints)={len(waypoints)}, '
-                                                           f'len(target_points)={len(self.target_points)}')
+        with span('get_target_points') as s:
+            s.add('waypoints', len(self.waypoints))
+            for idx, _ in enumerate(self.waypoints):
+                self.target_points += self._generate_targets(idx, *self.targets_refs[idx])
+        assert len(self.target_points) == len(self.waypoints), (f'Mismatch size: len(waypoints)={len(self.waypoints)}, '
+                                                                f'len(target_points)={len(self.target_points)}')
 
     def _draw_lines(self, idx):
-        plt.plot(all_xs, all_ys, 'bo')
+        plt.plot(self.all_xs, self.all_ys, 'bo')
 
         nfp_xs, nfp_ys = zip(*self.plots[idx].nfp)
         # simulating car x, y as closest_waypoint[0]
-        prev_idx = (idx - 1) if idx > 0 else (len(waypoints) - 1)
-        curr_x, curr_y = all_xs[prev_idx], all_ys[prev_idx]
+        prev_idx = (idx - 1) if idx > 0 else (len(self.waypoints) - 1)
+        curr_x, curr_y = self.all_xs[prev_idx], self.all_ys[prev_idx]
 
         # This is closest_waypoint[1]
         plt.plot(nfp_xs[0], nfp_ys[0], 'k*', markersize=12)
@@ -146,7 +204,15 @@ class TargetCreator:
 
         plt.plot(curr_x, curr_y, 'rs', markersize=12)
 
-        if not self.hide_angles:
+        if self.show_raceline:
+            line_idx = self.raceline_idxs[idx]
+            plt.plot(np.append(self.raceline.x, self.raceline.x[0]), np.append(self.raceline.y, self.raceline.y[0]),
+                     '-', color='darkorange', linewidth=2, label='Racing line')  # closed lap
+            plt.plot(self.raceline.x[line_idx], self.raceline.y[line_idx], 'D', color='darkorange', markersize=10)
+            plt.text(1.8, 2.2, f'Racing line speed (orange diamond)={self.raceline.speed[line_idx]:.2f} m/s, '
+                               f'lap={self.raceline.lap_time:.2f}s', fontsize=16)
+
+        if not self.hide_angles or self.show_raceline:
             plt.legend(loc="center")
         plt.text(1.4, 2.8, f'waypoint(black star):{idx}', fontsize=24)
         plt.text(1.4, 2.6, f'sim car(red square):{idx}', fontsize=24)
@@ -164,34 +230,105 @@ class TargetCreator:
             return
         self.curr_pos %= len(items)
 
-        ax.cla()
-        plt.imshow(plt.imread(track), extent=[0, 8, 0, 5.2])
-        self._draw_lines(self.curr_pos)
-        fig.canvas.draw()
+        with span('key_event', key=e.key) as s:
+            ax.cla()
+            self._show_track()
+            self._draw_lines(self.curr_pos)
+            fig.canvas.draw()
+            if PROFILER.enabled:
+                s.add('artists', len(fig.findobj()))  # every artist is redrawn
+
+    def _show_track(self):
+        if self.track.image is not None:
+            plt.imshow(self.track.image, extent=self.track.extent)
+        else:
+            plt.xlim(*self.track.extent[:2])
+            plt.ylim(*self.track.extent[2:])
 
     def plot(self):
-        fig = plt.figure(num=None, figsize=(20, 15), dpi=80, facecolor='w', edgecolor='k')
-        plt.imshow(plt.imread(track), extent=[0, 8, 0, 5.2])
-        ax = fig.add_subplot(111)
-        self._draw_lines(0)
-        fig.canvas.mpl_connect('key_press_event', lambda event: self.key_event(event, self.plots, ax, fig))
+        with span('plot'):  # figure is only drawn on screen by plt.show()
+            fig = plt.figure(num=None, figsize=(20, 15), dpi=80, facecolor='w', edgecolor='k')
+            with span('track_image'):
+                self._show_track()
+            ax = fig.add_subplot(111)
+            self._draw_lines(0)
+            fig.canvas.mpl_connect('key_press_event', lambda event: self.key_event(event, self.plots, ax, fig))
         plt.show()
 
+    def _target_headings(self):
+        """
+        :return: list[float] Heading (degrees) to target point of each waypoint from the simulated car position
+                 (waypoint before it, same as used to choose the target).
+        """
+        return [math.degrees(math.atan2(ty - self.all_ys[idx - 1], tx - self.all_xs[idx - 1]))
+                for idx, (tx, ty) in enumerate(self.target_points)]
+
     def write_targets_file(self):
-        with open(self.targets_log, 'w') as out:
-            out.write('#!/usr/bin/env python3\n')
-            out.write(f'# This file was generated by {os.path.basename(__file__)}\n\n')
-            out.write('target_points = ')
-            pprint(tuple(self.target_points), stream=out)
+        """
+        Write target_points plus dense per waypoint lookup tables, so e.g. a reward function only needs
+        plain indexing by closest waypoint (no range search or math per step). angle_types and num_points are the
+        targets_refs the target points were generated from: data.registry.build_track bundles them together.
+        """
+        with span('write_targets_file') as s:
+            s.add('waypoints', len(self.waypoints))
+            target_xs, target_ys = zip(*self.target_points)
+            tables = (('angle_types', tuple(self.targets_refs[idx][0] for idx, _ in enumerate(self.waypoints))),
+                      ('num_points', tuple(self.targets_refs[idx][1] for idx, _ in enumerate(self.waypoints))),
+                      ('target_xs', target_xs),
+                      ('target_ys', target_ys),
+                      ('target_headings', tuple(self._target_headings())),
+                      ('raceline_xs', tuple(self.raceline.x[self.raceline_idxs].tolist())),
+                      ('raceline_ys', tuple(self.raceline.y[self.raceline_idxs].tolist())),
+                      ('target_speeds', tuple(self.raceline.speed[self.raceline_idxs].tolist())))
+            with open(self.targets_log, 'w') as out:
+                out.write('#!/usr/bin/env python3\n')
+                out.write(f'# This file was generated by {os.path.basename(__file__)}\n\n')
+                out.write('target_points = ')
+                pprint(tuple(self.target_points), stream=out)
+                out.write('\n# dense lookup tables, one entry per waypoint index (e.g. target_xs[closest_waypoint])\n')
+                for name, values in tables:
+                    out.write(f'{name} = ')
+                    pprint(values, stream=out, compact=True)
+        if self.rebuild_track:
+            print(f'Rebuilt track bundle {build_track(self.track.name)}')
 
 
-if __name__ == '__main__':
-    parser = ArgumentParser(description=__doc__, formatter_class=RawTextHelpFormatter)
+def main(argv=None, prog=None):
+    """
+    :param argv: list[string] Command line arguments (default: sys.argv[1:]).
+    :param prog: [string] Program name shown in help (default: script name, cli.py passes its subcommand).
+    """
+    parser = ArgumentParser(prog=prog, description=__doc__, formatter_class=RawTextHelpFormatter)
     group = parser.add_mutually_exclusive_group()
     group.add_argument('-hide_angles', action='store_true', default=False,
                        help="If provided, will only show plot points.")
     group.add_argument('-show_all_angles', action='store_true', default=False,
                        help="If provided, will show all 3 angles. "
                             "If not, will only show best (previously selected) angle")
-    args = parser.parse_args()
-    TargetCreator(hide_angles=args.hide_angles, show_all_angles=args.show_all_angles)
+    parser.add_argument('-optimize', type=valid_aws_log_file, default=None, metavar='LOG',
+                        help="If provided, targets_refs is searched on the fastest laps of this AWS log (printed, "
+                             "shown and written to data/<track>_targets.py and the track bundle).")
+    parser.add_argument('-fastest', type=int, default=10,
+                        help="Number of fastest 'lap_complete' episodes used by -optimize (default: 10).")
+    parser.add_argument('-num_points', type=int, nargs=2, default=(NUM_POINTS.start, NUM_POINTS.stop - 1),
+                        metavar=('MIN', 'MAX'), help="Range of number of points searched by -optimize (default: "
+                                                     f"{NUM_POINTS.start} {NUM_POINTS.stop - 1}).")
+    parser.add_argument('-smoothness', type=float, default=SMOOTHNESS,
+                        help=f"Penalty per degree target direction jumps between waypoints (default: {SMOOTHNESS}).")
+    parser.add_argument('-workers', type=int, default=1,
+                        help="Number of processes used by -optimize.")
+    parser.add_argument('-track', choices=TRACKS, default=DEFAULT_TRACK,
+                        help="Track to create targets for (default: %(default)s).")
+    parser.add_argument('-raceline', action='store_true', default=False,
+                        help="If provided, will also show the optimized racing line and its target speeds.")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    with profiling(args.profile):
+        TargetCreator(hide_angles=args.hide_angles, show_all_angles=args.show_all_angles, optimize_log=args.optimize,
+                      fastest=args.fastest, num_points=range(max(4, args.num_points[0]), args.num_points[1] + 1),
+                      smoothness=args.smoothness, workers=args.workers, show_raceline=args.raceline,
+                      track=args.track)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# tools are top level modules of the repo (run as scripts), make them importable however pytest is started
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from cli import main
+from util.synthetic import generate_log
+
+CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cli.py')
+
+
+@pytest.fixture(scope='module')
+def log(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('cli') / 'synthetic-sim.log')
+    generate_log(path, episodes=5, seed=9)
+    return path
+
+
+def test_export_track_choices(log, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(['export', log, '-format', 'csv', '-track', 'reinvent2017'])
+    assert exit_info.value.code == 2
+    assert "argument -track: invalid choice: 'reinvent2017'" in capsys.readouterr().err
+
+
+def test_stats_without_numpy(log):
+    # "stats" must not pay for numpy (nor pandas) at startup
+    check = f'import sys; sys.argv = [{CLI!r}, "stats", {log!r}]; import runpy; runpy.run_path({CLI!r}, ' \
+            f'run_name="__main__"); print("numpy" in sys.modules)'
+    out = subprocess.run([sys.executable, '-c', check], cwd=os.path.dirname(CLI), capture_output=True, text=True,
+                         check=True).stdout
+    assert out.splitlines()[-1] == 'False' and 'lap_complete' in out
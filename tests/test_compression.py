@@ -0,0 +1,101 @@
+import bz2
+import contextlib
+import gzip
+import io
+import os
+
+import pytest
+
+from simlogparser import SimLogParser
+from util.compression import compression, zstd_frames
+from util.logreader import decoded_range, split_ranges
+from util.summary import format_summary, summarize_log
+from util.synthetic import generate_log
+
+zstandard = pytest.importorskip('zstandard')
+
+FRAME_SIZE = 20000  # decompressed bytes per zstd frame: frames cut lines and episodes anywhere
+SKIPPABLE = (0x184D2A50).to_bytes(4, 'little') + (3).to_bytes(4, 'little') + b'abc'
+
+
+def _zstd(content, frame_size=None):
+    compressor = zstandard.ZstdCompressor()
+    if frame_size is None:
+        return compressor.compress(content)
+    frames = [compressor.compress(content[start:start + frame_size]) for start in range(0, len(content), frame_size)]
+    return frames[0] + SKIPPABLE + b''.join(frames[1:])
+
+
+COMPRESSORS = {'gzip': gzip.compress, 'bz2': bz2.compress, 'zstd': _zstd,
+               'zstd_frames': lambda content: _zstd(content, FRAME_SIZE)}
+
+
+@pytest.fixture(scope='module')
+def plain(tmp_path_factory):
+    path = tmp_path_factory.mktemp('compression') / 'synthetic-sim.log'
+    generate_log(str(path), episodes=40, offtrack_ratio=0.3, seed=4)
+    return path
+
+
+@pytest.fixture(scope='module', params=list(COMPRESSORS))
+def compressed(request, plain):
+    # no extension: format is told by magic bytes
+    path = plain.with_name(f'{request.param}-sim')
+    path.write_bytes(COMPRESSORS[request.param](plain.read_bytes()))
+    return request.param, str(path)
+
+
+def _parse(logfile, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return SimLogParser(str(logfile), use_cache=False, **kwargs)
+
+
+def test_compression(plain, compressed):
+    name, logfile = compressed
+    assert compression(str(plain)) is None
+    assert compression(logfile) == name.split('_')[0]
+
+
+def test_zstd_frames(plain, tmp_path):
+    content = plain.read_bytes()
+    logfile = tmp_path / 'frames-sim.log.zst'
+    logfile.write_bytes(_zstd(content, FRAME_SIZE))
+    frames = zstd_frames(str(logfile))
+    assert len(frames) == -(-len(content) // FRAME_SIZE)
+    decompressor = zstandard.ZstdDecompressor()
+    data = logfile.read_bytes()
+    decoded = [decompressor.decompressobj().decompress(data[start:]) for start in frames]
+    assert b''.join(decoded) == content
+    logfile.write_bytes(data + b'not a frame')
+    with pytest.raises(ValueError, match='not a valid zstd file'):
+        zstd_frames(str(logfile))
+
+
+@pytest.mark.parametrize('parts', [1, 3, 8])
+def test_decoded_ranges(plain, compressed, parts):
+    # consecutive ranges decode every byte of the log exactly once
+    _, logfile = compressed
+    decoded = [b''.join(decoded_range(logfile, start, stop, chunk_size=4096))
+               for start, stop in split_ranges(logfile, parts)]
+    assert b''.join(decoded) == plain.read_bytes()
+    assert all(b'Reset agent' in chunk[:chunk.find(b'\n')] for chunk in decoded[1:] if chunk)  # start at an episode
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_parse_matches_plain(plain, compressed, workers):
+    _, logfile = compressed
+    parsed = _parse(plain)
+    decompressed = _parse(logfile, workers=workers)
+    assert decompressed.data.equals(parsed.data)
+    assert decompressed.episode_bounds == parsed.episode_bounds and decompressed.offtracks == parsed.offtracks
+    assert str(decompressed) == str(parsed)
+    assert format_summary(summarize_log(logfile, workers), True) == \
+           format_summary(summarize_log(str(plain)), True)
+
+
+def test_multi_frame_ranges(compressed):
+    name, logfile = compressed
+    if name == 'zstd_frames':
+        assert len(split_ranges(logfile, 4)) == 4  # decoded concurrently
+    else:
+        assert split_ranges(logfile, 4) == [(0, os.path.getsize(logfile))]
@@ -0,0 +1,138 @@
+import datetime
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fetch_logs import LogFetcher, split_windows
+from util.aws import Credentials, sign
+
+CREDENTIALS = Credentials('AKIDEXAMPLE', 'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY', None, 'us-east-1')
+GROUP = '/aws/robomaker/SimulationJobs'
+STREAM = 'sim-stub/SimulationApplicationLogs'
+START, END = 1590332225000, 1590332225000 + 600000  # 10 minutes, one event every 250ms
+PAGE_LIMIT = 37
+
+
+def _events():
+    events = []
+    for idx, timestamp in enumerate(range(START, END, 250)):
+        episode, step = divmod(idx, 100)
+        message = f'Reset agent (episode {episode})' if not step else f'SIM_TRACE_LOG:{episode},{step},{timestamp}'
+        events.append({'timestamp': timestamp, 'logStreamName': STREAM, 'message': message + '\n'})
+        if idx % 7 == 0:  # other simulator output, dropped by the fetcher
+            events.append({'timestamp': timestamp, 'logStreamName': STREAM, 'message': 'INFO - Pausing physics\n'})
+    return events
+
+
+class StubLogs:
+    """
+    Local FilterLogEvents server: checks the SigV4 signature of every request, pages through events with nextToken
+    and can fail the requests of the window starting at interrupt_at[0] for pages at or past its event interrupt_at[1]
+    (to interrupt a fetch in the middle of a window).
+    """
+
+    def __init__(self):
+        self.events = _events()
+        self.interrupt_at = None
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                status, answer = stub.answer(self.headers, body, f'http://{self.headers["Host"]}{self.path}')
+                data = json.dumps(answer).encode()
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.endpoint = f'http://127.0.0.1:{self.server.server_port}/'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def answer(self, headers, body, url):
+        moment = datetime.datetime.strptime(headers['X-Amz-Date'] + '+0000', '%Y%m%dT%H%M%SZ%z')
+        signed = {'Content-Type': headers['Content-Type'], 'X-Amz-Target': headers['X-Amz-Target']}
+        expected = sign('POST', url, signed, body, CREDENTIALS, 'logs', now=moment)
+        if headers['Authorization'] != expected['Authorization']:
+            return 403, {'__type': 'InvalidSignatureException', 'message': 'signature does not match'}
+        request = json.loads(body)
+        offset = int(request.get('nextToken') or 0)
+        if self.interrupt_at and request['startTime'] == self.interrupt_at[0] and offset >= self.interrupt_at[1]:
+            return 400, {'__type': 'InvalidParameterException', 'message': 'interrupted by test'}
+        events = [event for event in self.events if request['startTime'] <= event['timestamp'] <= request['endTime']]
+        answer = {'events': events[offset:offset + request['limit']]}
+        if offset + request['limit'] < len(events):
+            answer['nextToken'] = str(offset + request['limit'])
+        return 200, answer
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubLogs()
+    yield server
+    server.close()
+
+
+def _fetcher(stub, output, **kwargs):
+    return LogFetcher(str(output), [STREAM], START, END, group=GROUP, workers=3, windows=6, endpoint=stub.endpoint,
+                      credentials=CREDENTIALS, page_limit=PAGE_LIMIT, **kwargs)
+
+
+def test_sign_aws_test_suite():
+    # get-vanilla and post-vanilla of the AWS SigV4 test suite
+    now = datetime.datetime(2015, 8, 30, 12, 36, tzinfo=datetime.timezone.utc)
+    for method, signature in (('GET', '5fa00fa31553b73ebf1942676e86291e8372ff2a2260956d9b8aae1d763fbf31'),
+                              ('POST', '5da7c1a2acd57cee7505fc6676e4e544621c30862966e37dddb68e92efbe5d6b')):
+        headers = sign(method, 'https://example.amazonaws.com/', {}, b'', CREDENTIALS, 'service', now=now)
+        assert headers['Authorization'] == (f'AWS4-HMAC-SHA256 Credential=AKIDEXAMPLE/20150830/us-east-1/service/'
+                                            f'aws4_request, SignedHeaders=host;x-amz-date, Signature={signature}')
+
+
+def test_split_windows():
+    windows = split_windows(START, END, 7)
+    assert len(windows) == 7 and windows[0][0] == START and windows[-1][1] == END
+    assert all(end == next_start for (_, end), (next_start, _) in zip(windows[:-1], windows[1:]))
+    assert split_windows(0, 3, 8) == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_fetch(stub, tmp_path):
+    output = tmp_path / 'sim.log'
+    events = _fetcher(stub, output).run()
+    lines = output.read_text().splitlines()
+    expected = [f'{GROUP} {STREAM} {event["message"].rstrip()}' for event in stub.events
+                if 'Pausing' not in event['message']]
+    assert lines == expected and events == len(expected)
+    assert sorted(os.listdir(tmp_path)) == ['sim.log']  # no parts nor checkpoint left
+
+
+def test_resume(stub, tmp_path):
+    reference = tmp_path / 'reference.log'
+    _fetcher(stub, reference).run()
+    output = tmp_path / 'sim.log'
+    # last window (started once 3 windows are done and merged) stops after 5 pages
+    stub.interrupt_at = (split_windows(START, END, 6)[-1][0], 5 * PAGE_LIMIT)
+    with pytest.raises(RuntimeError, match='interrupted by test'):
+        _fetcher(stub, output).run()
+    checkpoint = json.loads((tmp_path / 'sim.log.fetch.json').read_text())
+    assert checkpoint['merged'] and checkpoint['windows'][-1]['token'] and not checkpoint['windows'][-1]['done']
+    # bytes written after the last checkpoint (process killed between a write and its checkpoint) are dropped
+    for path in [output] + sorted(tmp_path.glob('sim.log.part*')):
+        with open(path, 'ab') as f:
+            f.write(b'SIM_TRACE_LOG:written after checkpoint\n')
+    stub.interrupt_at = None
+    _fetcher(stub, output).run()
+    assert output.read_bytes() == reference.read_bytes()
+    lines = output.read_text().splitlines()
+    assert len(lines) == len(set(lines))
+    assert not (tmp_path / 'sim.log.fetch.json').exists()
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from data.registry import TRACKS, load_track
+from util.geometry import MARGIN, TrackGeometry
+
+
+def brute_force(geometry, xs, ys):
+    """
+    :return: [ndarray] Distance of every point to its nearest segment, measured against every segment.
+    """
+    px, py = xs[:, None] - geometry._x0, ys[:, None] - geometry._y0
+    t = np.clip((px * geometry._vx + py * geometry._vy) * geometry._inv_len2, 0.0, 1.0)
+    dist = np.hypot(px - t * geometry._vx, py - t * geometry._vy)
+    return dist.min(axis=1)
+
+
+def _points(track, count, rng):
+    """
+    Random points everywhere in and around the grid, near both track edges and outside the grid.
+    """
+    xy = track.xy
+    lo, hi = xy.min(axis=0) - MARGIN, xy.max(axis=0) + MARGIN
+    anywhere = rng.uniform(lo - 1.0, hi + 1.0, (count, 2))  # includes points outside the grid
+    outside = np.concatenate((rng.uniform(hi + 0.01, hi + 5.0, (count // 4, 2)),
+                              rng.uniform(lo - 5.0, lo - 0.01, (count // 4, 2))))
+    # around the edges: centerline points pushed sideways by about half the track width
+    idx = rng.integers(0, len(xy), count)
+    t = rng.uniform(0, 1, count)[:, None]
+    center = xy[idx] + t * (np.roll(xy, -1, axis=0)[idx] - xy[idx])
+    direction = rng.normal(size=(count, 2))
+    direction /= np.hypot(*direction.T)[:, None]
+    edges = center + direction * (track.track_width / 2 + rng.normal(0, 0.02, count))[:, None]
+    points = np.concatenate((anywhere, outside, edges))
+    return points[:, 0], points[:, 1]
+
+
+@pytest.mark.parametrize('track', TRACKS)
+def test_projection_matches_brute_force(track):
+    geometry = TrackGeometry.for_track(track)
+    xs, ys = _points(load_track(track), 20000, np.random.default_rng(7))
+    projection = geometry.project(xs, ys, chunk_size=7000)
+    np.testing.assert_allclose(projection.distance, brute_force(geometry, xs, ys), rtol=0, atol=1e-9)
+    np.testing.assert_allclose(np.hypot(xs - projection.x, ys - projection.y), projection.distance, atol=1e-9)
+    np.testing.assert_allclose(np.abs(projection.offset), projection.distance)
+    assert ((projection.progress >= 0) & (projection.progress < geometry.length)).all()
+    cx = np.floor((xs - geometry.origin[0]) / geometry.cell_size)
+    cy = np.floor((ys - geometry.origin[1]) / geometry.cell_size)
+    inside = (cx >= 0) & (cx < geometry.shape[0]) & (cy >= 0) & (cy < geometry.shape[1])
+    assert inside.any() and not inside.all()
+
+
+def test_projection_of_square():
+    # counterclockwise unit square: left of driving direction is inside
+    geometry = TrackGeometry([(0, 0), (1, 0), (1, 1), (0, 1)], cell_size=0.25, margin=0.5)
+    projection = geometry.project([0.5, 0.5, 1.2, -3.0], [0.1, -0.1, 0.5, -4.0])
+    np.testing.assert_array_equal(projection.segment, [0, 0, 1, 0])
+    np.testing.assert_allclose(projection.distance, [0.1, 0.1, 0.2, 5.0])
+    np.testing.assert_allclose(projection.offset, [0.1, -0.1, -0.2, -5.0])
+    np.testing.assert_allclose(projection.progress, [0.5, 0.5, 1.5, 0.0])
+    assert geometry.length == 4.0
+    np.testing.assert_allclose(geometry.progress_delta(3.9, 0.1), 0.2)
+    np.testing.assert_allclose(geometry.unwrap_progress([3.8, 3.95, 0.1, 0.3]), [3.8, 3.95, 4.1, 4.3])
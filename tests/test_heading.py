@@ -0,0 +1,66 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.registry import TRACKS, load_track
+from util.heading import HeadingEngine
+
+SQUARE = [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)]
+
+
+def _rows(x, y, heading, closest_waypoint_index):
+    return pd.DataFrame({'x_coord': np.asarray(x, dtype=np.float64), 'y_coord': np.asarray(y, dtype=np.float64),
+                         'heading': np.asarray(heading, dtype=np.float64),
+                         'closest_waypoint_index': np.asarray(closest_waypoint_index, dtype=np.int64)})
+
+
+def test_digest():
+    engines = [HeadingEngine.for_track(track) for track in TRACKS]
+    assert len({engine.digest for engine in engines}) == len(TRACKS) > 1
+    assert HeadingEngine.for_track(TRACKS[0]).digest == engines[0].digest  # same bundle, same cache key
+    track = load_track(TRACKS[0])
+    moved = np.asarray(track.target_points) + [0.0, 1e-6]
+    assert HeadingEngine(track.xy, moved).digest != engines[0].digest
+    assert HeadingEngine(track.xy).digest != engines[0].digest  # lookahead targets instead of the bundle's
+
+
+def test_modulus_from_waypoint_count():
+    for track in TRACKS:
+        engine = HeadingEngine.for_track(track)
+        assert engine.num_waypoints == len(load_track(track).xy)
+    engine = HeadingEngine(SQUARE, [(1.0, 0.0), (1.0, 1.0), (0.0, 1.0), (0.0, 0.0)])
+    df = _rows([0.1, 0.9, 0.1], [0.0, 0.1, 0.0], [0.0, 90.0, 0.0], [0, 1, 4])  # 4 is waypoint 0 after a lap
+    engine.apply(df)
+    assert df.closest_waypoint_index.tolist() == [0, 1, 0]
+    for idx in (5, -1):
+        with pytest.raises(ValueError, match='Was log recorded on another track'):
+            engine.apply(_rows([0.1], [0.0], [0.0], [idx]))
+    with pytest.raises(ValueError, match=r'4.24m \(median\)'):
+        engine.apply(_rows([3.0], [3.0], [0.0], [0]))
+
+
+def test_heading_wraparound():
+    # target straight behind (-x): best heading is +/-180, headings near -180 and +180 are both 1 degree off
+    engine = HeadingEngine(SQUARE, [(-10.0, 0.0)] * 4)
+    df = _rows([0.0] * 4, [-1e-9, 1e-9, 1e-9, 0.0], [-179.0, 179.0, -179.0, 90.0], [0, 1, 2, 3])
+    engine.apply(df)
+    assert abs(df.best_heading[0]) == pytest.approx(180.0)
+    np.testing.assert_allclose(df.direction_diff, [1.0, 1.0, 1.0, 90.0], atol=1e-6)
+    assert (df.direction_diff <= 180).all()
+
+
+def test_best_heading():
+    engine = HeadingEngine.for_track(TRACKS[0])
+    rng = np.random.default_rng(8)
+    idx = rng.integers(0, engine.num_waypoints, 100)
+    xy = engine.waypoints[idx] + rng.normal(0, 0.2, (100, 2))
+    heading = rng.uniform(-180, 180, 100)
+    df = _rows(xy[:, 0], xy[:, 1], heading, idx)
+    engine.apply(df)
+    for (x, y), i, h, best, diff in zip(xy, idx, heading, df.best_heading, df.direction_diff):
+        tx, ty = engine.targets[i]
+        expected = math.degrees(math.atan2(ty - y, tx - x))
+        assert best == pytest.approx(expected)
+        assert diff == pytest.approx(min(abs(expected - h), 360 - abs(expected - h)))
@@ -0,0 +1,28 @@
+import contextlib
+import io
+import pickle
+
+from data.registry import load_track
+from log_plotter import FrameRenderer, TrackView, _init_render_worker, _render_frame
+from simlogparser import SimLogParser
+from util.synthetic import generate_log
+
+
+def test_render_worker(tmp_path):
+    log = str(tmp_path / 'synthetic-sim.log')
+    generate_log(log, episodes=5, seed=5)
+    with contextlib.redirect_stdout(io.StringIO()):
+        parsed_log = SimLogParser(log, use_cache=False)
+    track = load_track(parsed_log.track)
+    view = TrackView(track.extent, track.xy, parsed_log.engine.targets, parsed_log.plot_pts, parsed_log.episode_data)
+    # render workers get a pickled copy: only the view's plain data goes along, no parsed log nor plotter
+    renderer = pickle.loads(pickle.dumps(FrameRenderer(view, track.name)))
+    _init_render_worker(renderer)
+    episode = next(iter(parsed_log.episode_index))
+    frames = [('lines', parsed_log.episode_rows(episode), tmp_path / 'episode.png'),
+              ('heatmap', ('speed', 0), tmp_path / 'speed_0.png'), ('heatmap', ('speed', 1), tmp_path / 'speed_1.png'),
+              ('heatmap', ('reward', 0), tmp_path / 'reward_0.png')]
+    for kind, what, path in frames:
+        _render_frame((kind, what, str(path)))
+        assert path.read_bytes().startswith(b'\x89PNG')
+    assert renderer.view.episode_text.get_text() == parsed_log.episode_data[episode]
@@ -0,0 +1,62 @@
+import contextlib
+import io
+import re
+
+import pytest
+
+from simlogparser import SimLogParser, parse_range
+from util.heading import HeadingEngine
+from util.logreader import split_ranges
+from util.summary import format_summary, summarize_log
+from util.synthetic import generate_log
+
+CLOSING = re.compile(rb'^.*SIM_TRACE_LOG:.*,(lap_complete|off_track)\n', re.MULTILINE)
+
+
+@pytest.fixture(scope='module')
+def logfile(tmp_path_factory):
+    """
+    Synthetic log where every third episode lost its closing row: it runs on into the next episode (whose "Reset agent"
+    line is ignored), so ranges cut at that next "Reset agent" line end inside an episode.
+    """
+    path = tmp_path_factory.mktemp('logreader') / 'synthetic-sim.log'
+    generate_log(str(path), episodes=40, offtrack_ratio=0.3, seed=2)
+    content = path.read_bytes()
+    closing = list(CLOSING.finditer(content))
+    for match in reversed(closing[1::3]):
+        content = content[:match.start()] + content[match.end():]
+    path.write_bytes(content)
+    return str(path)
+
+
+def _parse(logfile, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return SimLogParser(logfile, use_cache=False, **kwargs)
+
+
+def test_split_ranges(logfile):
+    content = open(logfile, 'rb').read()
+    for parts in (1, 2, 5, 16, 1000):
+        ranges = split_ranges(logfile, parts)
+        assert ranges[0][0] == 0 and ranges[-1][1] == len(content) and len(ranges) <= parts
+        assert all(stop == start for (_, stop), (start, _) in zip(ranges[:-1], ranges[1:]))
+        assert all(content[start:].startswith(b'Reset agent') or b'\nReset agent' not in content[start:stop]
+                   for start, stop in ranges[1:])
+
+
+@pytest.mark.parametrize('workers', [2, 3, 7, 16])
+def test_parallel_matches_serial(logfile, workers):
+    serial = _parse(logfile)
+    parallel = _parse(logfile, workers=workers, chunk_size=4096)
+    assert parallel.data.equals(serial.data)
+    assert parallel.episode_bounds == serial.episode_bounds and parallel.offtracks == serial.offtracks
+    assert str(parallel) == str(serial)
+    assert format_summary(summarize_log(logfile, workers), True) == format_summary(summarize_log(logfile), True)
+
+
+@pytest.mark.parametrize('workers', [7, 16])
+def test_episode_carried_over_range(logfile, workers):
+    # ranges of test_parallel_matches_serial do end inside an episode (next range is re-parsed with the carry)
+    engine = HeadingEngine.for_track('reinvent2018')
+    carries = [parse_range(logfile, engine, start, stop)[-1] for start, stop in split_ranges(logfile, workers)]
+    assert any(carry is not None for carry in carries[:-1])
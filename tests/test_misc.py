@@ -0,0 +1,47 @@
+import pytest
+
+from data import reinvent2018
+from util.misc import RangeTable
+
+
+def test_range_edges():
+    table = RangeTable({range(0, 3): 'a', range(3, 4): 'b', range(4, 10): 'c'})
+    assert [table[idx] for idx in range(10)] == ['a'] * 3 + ['b'] + ['c'] * 6
+    assert table[range(3, 4)] == 'b' and len(table) == 3
+    for idx in (-1, 10):
+        with pytest.raises(KeyError):
+            table[idx]
+
+
+def test_size():
+    # last range ends at size: last index is covered, lap wraps back to index 0 (not to size)
+    table = RangeTable({range(0, 5): 'a', range(5, 8): 'b'}, size=8)
+    assert table[7] == 'b' and table[(7 + 1) % 8] == 'a'
+    with pytest.raises(KeyError):
+        table[8]
+    with pytest.raises(ValueError, match=r'not covered by any range: \[8, 9\]'):
+        RangeTable({range(0, 5): 'a', range(5, 8): 'b'}, size=10)
+    with pytest.raises(ValueError, match='outside of 0..6'):
+        RangeTable({range(0, 5): 'a', range(5, 8): 'b'}, size=7)
+
+
+@pytest.mark.parametrize('ranges, message', [
+    ({range(0, 5): 'a', range(4, 8): 'b'}, 'overlaps another range at 4'),
+    ({range(0, 4): 'a', range(5, 8): 'b'}, r'not covered by any range: \[4\]'),
+    ({range(1, 8): 'a'}, r'not covered by any range: \[0\]'),
+    ({range(0, 8, 2): 'a'}, 'step 1'),
+    ({range(0, 8): 'a', range(8, 8): 'b'}, 'non empty'),
+    ({(0, 8): 'a'}, 'non empty ranges'),
+])
+def test_invalid_ranges(ranges, message):
+    with pytest.raises(ValueError, match=message):
+        RangeTable(ranges)
+
+
+def test_reinvent2018_refs():
+    refs, waypoints = reinvent2018.targets_refs, reinvent2018.waypoints
+    assert len(refs.values_by_index) == len(waypoints)
+    for idx in range(len(waypoints)):
+        # same as the linear search of the original RangeDict, previous waypoint of waypoint 0 is the last one
+        assert refs[idx] == next(value for key, value in refs.items() if idx in key)
+        assert refs[idx - 1 if idx else len(waypoints) - 1] == refs[(idx - 1) % len(waypoints)]
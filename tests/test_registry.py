@@ -0,0 +1,16 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from data.registry import DEFAULT_TRACK, load_track
+
+
+def _image_shape(name):
+    return load_track(name).image.shape
+
+
+def test_bundle_read_in_forked_workers():
+    track = load_track(DEFAULT_TRACK)
+    waypoints = track.xy  # bundle opened before the fork, every worker reads the (big) image from it
+    with ProcessPoolExecutor(4, mp_context=multiprocessing.get_context('fork')) as pool:
+        shapes = list(pool.map(_image_shape, [DEFAULT_TRACK] * 8))
+    assert len(waypoints) and shapes == [track.image.shape] * 8
@@ -0,0 +1,55 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from data.registry import load_track
+from reward_replay import RewardReplay
+from simlogparser import SimLogParser
+from util.synthetic import generate_log
+
+# every param of the AWS DeepRacer reward function input documentation
+DOCUMENTED_PARAMS = ('all_wheels_on_track', 'x', 'y', 'closest_objects', 'closest_waypoints', 'distance_from_center',
+                     'heading', 'is_crashed', 'is_left_of_center', 'is_offtrack', 'is_reversed', 'objects_distance',
+                     'objects_heading', 'objects_left_of_center', 'objects_location', 'objects_speed', 'progress',
+                     'speed', 'steering_angle', 'steps', 'track_length', 'track_width', 'waypoints')
+
+
+@pytest.fixture(scope='module')
+def replay(tmp_path_factory):
+    log = str(tmp_path_factory.mktemp('replay') / 'synthetic-sim.log')
+    generate_log(log, episodes=20, offtrack_ratio=0.3, seed=1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        parsed_log = SimLogParser(log, use_cache=False)
+    return RewardReplay(parsed_log)
+
+
+def test_every_documented_param(replay):
+    seen = []
+
+    def reward_function(params):
+        values = [params[name] for name in DOCUMENTED_PARAMS]
+        seen.append(params)
+        return float(len(values))
+
+    episodes = replay.run(reward_function)
+    assert len(seen) == replay.parsed_log.num_rows > 0
+    assert (episodes.new_reward == episodes.steps * len(DOCUMENTED_PARAMS)).all()
+    params = seen[0]
+    track = load_track(replay.parsed_log.track)
+    assert params['track_length'] == pytest.approx(track.length, abs=0.01)
+    assert params['track_width'] == track.track_width
+    assert len(params['closest_waypoints']) == 2
+    assert type(params['x']) is float and type(params['all_wheels_on_track']) is bool
+
+
+def test_batch_matches_scalar(replay):
+    def reward_function(params):
+        return params['speed'] * params['progress'] / params['track_length'] + params['distance_from_center']
+
+    scalar = replay.run(reward_function)
+    batch = replay.run(reward_function, batch=True)
+    assert set(DOCUMENTED_PARAMS) <= set(replay.params)
+    np.testing.assert_allclose(batch.new_reward, scalar.new_reward)
+    np.testing.assert_allclose(batch.old_reward, scalar.old_reward)
@@ -0,0 +1,45 @@
+import contextlib
+import io
+
+import pytest
+
+from run_catalog import RunCatalog, main
+from util import cache
+from util.synthetic import generate_log
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'CACHE_DIR', str(tmp_path / 'cache'))
+    path = str(tmp_path / 'catalog.sqlite')
+    with RunCatalog(path) as catalog, contextlib.redirect_stdout(io.StringIO()):
+        for name, track, seed in (('a', 'reinvent2018', 1), ('b', 'reinvent2018', 2), ('c', 'reinvent2019', 3)):
+            log = str(tmp_path / f'{name}-sim.log')
+            generate_log(log, track=track, episodes=10, offtrack_ratio=0.2, seed=seed)
+            catalog.ingest(log, name=name, track=track)
+        yield catalog
+
+
+def test_waypoint_speeds(catalog):
+    both = catalog.waypoint_speeds('reinvent2018')
+    assert both.runs.max() == 2
+    # a run of another track is left out, not averaged with the others
+    a = catalog.waypoint_speeds('reinvent2018', ['a'])
+    assert catalog.waypoint_speeds('reinvent2018', ['a', 'c']).equals(a)
+    assert a.runs.max() == 1 and a.steps.sum() < both.steps.sum()
+    assert catalog.waypoint_speeds('reinvent2019', ['c']).steps.sum() == \
+           catalog.query("SELECT steps FROM runs WHERE name = 'c'").steps[0]
+    with pytest.raises(ValueError, match="Unknown run 'missing'"):
+        catalog.waypoint_speeds('reinvent2018', ['a', 'missing'])
+
+
+def test_unknown_baseline(catalog):
+    with pytest.raises(ValueError, match="Unknown run 'missing'"):
+        catalog.improved(baseline='missing')
+    assert set(catalog.improved(quantile='best', baseline='a').name) <= {'b', 'c'}
+
+
+def test_cli_unknown_run(catalog, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(['-db', catalog.path, 'waypoints', '-runs', 'a', 'missing'])
+    assert exit_info.value.code == 2 and "Unknown run 'missing'" in capsys.readouterr().err
@@ -0,0 +1,31 @@
+import contextlib
+import io
+
+import numpy as np
+
+from simlogparser import SimLogParser
+from util.synthetic import generate_log
+
+
+def _parse(logfile, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return SimLogParser(str(logfile), use_cache=False, **kwargs)
+
+
+def test_follow_matches_full_parse(tmp_path):
+    full, growing = tmp_path / 'full-sim.log', tmp_path / 'growing-sim.log'
+    generate_log(str(full), episodes=60, offtrack_ratio=0.3, seed=3)
+    content = full.read_bytes()
+    growing.write_bytes(b'')
+    parsed = _parse(full)
+    followed = _parse(growing, follow=True)
+    for part in range(1, 8):  # appends cut lines and episodes anywhere
+        growing.write_bytes(content[:len(content) * part // 7])
+        followed.refresh()
+    assert followed.data.equals(parsed.data)
+    assert followed.episode_bounds == parsed.episode_bounds and followed.offtracks == parsed.offtracks
+    assert followed.lap_times == parsed.lap_times and str(followed) == str(parsed)
+    # episodes are views of the buffer, rows aren't kept twice
+    episode = followed.good_episodes[-1]
+    assert episode.equals(parsed.good_episodes[-1])
+    assert np.shares_memory(episode.x_coord.to_numpy(), followed._buffer.columns['x_coord'])
@@ -0,0 +1,113 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from simlogparser import SimLogParser
+from util.stats import LogSummary, QuantileSketch, RunningStats
+from util.summary import format_summary, summarize_log
+from util.synthetic import generate_log
+
+
+@pytest.fixture(scope='module')
+def parsed_log(tmp_path_factory):
+    log = str(tmp_path_factory.mktemp('stats') / 'synthetic-sim.log')
+    generate_log(log, episodes=150, offtrack_ratio=0.3, seed=6)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return SimLogParser(log, use_cache=False)
+
+
+def original_report(lap_times, steps, num_offtracks):
+    """
+    Report of the original SimLogParser.__str__ (before running stats), from the lists it kept.
+    """
+    out = f'\nAnalyzing {len(lap_times) + num_offtracks} episodes...\n'
+    out += f'\tNumber of "lap_complete" episodes = {len(lap_times)}\n'
+    out += f'\tNumber of "off_track" episodes = {num_offtracks} ... ignoring for analysis\n'
+    if len(lap_times):
+        min_time = min(lap_times)
+        min_time_idx = lap_times.index(min_time)
+        max_time = max(lap_times)
+        max_time_idx = lap_times.index(max_time)
+        min_step = min(steps)
+        min_step_idx = steps.index(min_step)
+        max_step = max(steps)
+        max_step_idx = steps.index(max_step)
+        out += f'\tAverage Lap Time = {np.mean(lap_times):.2f}s (StdDev: {np.std(lap_times):.4f})\n'
+        out += f'\tMin Lap Time(Steps) = {min_time:.2f}s({steps[min_time_idx]})\n'
+        out += f'\tMax Lap Time(Steps)= {max_time:.2f}s({steps[max_time_idx]})\n'
+        out += f'\tAverage # Steps = {np.mean(steps):.1f} (StdDev: {np.std(steps):.4f})\n'
+        out += f'\tMin Steps(Lap Time) = {min_step}({lap_times[min_step_idx]:.2f}s)\n'
+        out += f'\tMax Steps(Lap Time) = {max_step}({lap_times[max_step_idx]:.2f}s)\n'
+    else:
+        out += 'NO DATA COLLECTED !!!!\n'
+    return out
+
+
+def test_running_stats():
+    values = np.random.default_rng(0).gamma(2.0, 10.0, 5000) + 1e6  # large offset: naive sum of squares drifts
+    stats, merged, part = RunningStats(), RunningStats(), RunningStats()
+    for idx, value in enumerate(values):
+        stats.add(value, idx)
+        part.add(value, idx)
+        if idx % 700 == 699:
+            merged.merge(part)
+            part = RunningStats()
+    merged.merge(part)
+    for running in (stats, merged):
+        assert running.count == len(values)
+        assert running.mean == pytest.approx(np.mean(values), rel=1e-12)
+        assert running.std == pytest.approx(np.std(values), rel=1e-9)
+        assert (running.min, running.min_tag) == (values.min(), values.argmin())
+        assert (running.max, running.max_tag) == (values.max(), values.argmax())
+
+
+def test_quantile_sketch():
+    values = np.random.default_rng(1).lognormal(3.0, 1.0, 20000)
+    values[:50] = 0.0
+    sketch, merged = QuantileSketch(), QuantileSketch()
+    for value in values:
+        sketch.add(value)
+    for part in np.array_split(values, 7):
+        other = QuantileSketch()
+        for value in part:
+            other.add(value)
+        merged.merge(other)
+    for q in (0.0, 0.001, 0.1, 0.5, 0.9, 0.99, 1.0):
+        exact = np.quantile(values, q, method='lower')
+        for approx in (sketch.quantile(q), merged.quantile(q)):
+            assert approx == pytest.approx(exact, rel=sketch.relative_accuracy, abs=1e-9)
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_summary_matches_numpy(parsed_log):
+    lap_times, steps = np.array(parsed_log.lap_times), np.array(parsed_log.steps)
+    # stats run reads lap times from the raw text, full parse from decoded floats: same up to float parsing
+    for summary, rel in ((parsed_log.summary, 1e-12), (summarize_log(parsed_log.logfile), 1e-6)):
+        assert summary.num_laps == len(lap_times) > 0 and summary.num_offtracks == len(parsed_log.offtracks) > 0
+        for stats, values in ((summary.lap_times, lap_times), (summary.steps, steps)):
+            assert stats.mean == pytest.approx(values.mean(), rel=rel)
+            assert stats.std == pytest.approx(values.std(), rel=rel)
+        for sketch, values in ((summary.lap_time_quantiles, lap_times), (summary.steps_quantiles, steps)):
+            for q in (0.5, 0.9):
+                exact = np.quantile(values, q, method='lower')
+                assert sketch.quantile(q) == pytest.approx(exact, rel=sketch.relative_accuracy)
+        offtrack_steps = [step for _, step in parsed_log.offtracks]
+        assert summary.offtrack_steps.mean == pytest.approx(np.mean(offtrack_steps), rel=1e-12)
+
+
+def test_default_report_unchanged(parsed_log):
+    expected = original_report([float(t) for t in parsed_log.lap_times], [int(s) for s in parsed_log.steps],
+                               len(parsed_log.offtracks))
+    assert str(parsed_log) == expected
+    assert format_summary(summarize_log(parsed_log.logfile)) == expected
+    # detailed report (stats runs) only adds lines
+    detailed = format_summary(parsed_log.summary, detailed=True).splitlines()
+    extra = [line for line in detailed if line not in expected.splitlines()]
+    assert [line.split()[:2] for line in extra] == [['Median', 'Lap'], ['Median', '#'], ['Average', '#']]
+    assert [line for line in detailed if line not in extra] == expected.splitlines()
+    only_offtracks = LogSummary()
+    for episode in range(3):
+        only_offtracks.add_offtrack(episode, 10)
+    assert format_summary(only_offtracks) == original_report([], [], 3)
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from util.telemetry import TELEMETRY, derive_frame
+
+
+def _episode(number, start_time, start_xy, headings, steerings):
+    n = len(headings)
+    t = np.arange(n) * 0.1
+    return pd.DataFrame({'episode': number, 'time': start_time + t, 'x_coord': start_xy[0] + t ** 2,
+                         'y_coord': start_xy[1] + np.sin(t), 'heading': headings, 'steering': steerings})
+
+
+def _reference(df):
+    """
+    Telemetry of one episode, written step by step.
+    """
+    rows = []
+    for i in range(len(df)):
+        row = dict.fromkeys(TELEMETRY, np.nan)
+        if i:
+            dt = df.time[i] - df.time[i - 1]
+            dist = np.hypot(df.x_coord[i] - df.x_coord[i - 1], df.y_coord[i] - df.y_coord[i - 1])
+            turn = (df.heading[i] - df.heading[i - 1] + 180) % 360 - 180
+            row.update(dt=dt, ground_speed=dist / dt, heading_rate=turn / dt,
+                       steering_rate=(df.steering[i] - df.steering[i - 1]) / dt,
+                       heading_unwrapped=rows[-1]['heading_unwrapped'] + turn)
+            if i > 1:
+                row['accel'] = (row['ground_speed'] - rows[-1]['ground_speed']) / dt
+        else:
+            row['heading_unwrapped'] = df.heading[0]
+        if 0 < i < len(df) - 1:
+            a = np.array([df.x_coord[i - 1], df.y_coord[i - 1]])
+            b = np.array([df.x_coord[i], df.y_coord[i]])
+            c = np.array([df.x_coord[i + 1], df.y_coord[i + 1]])
+            (abx, aby), (bcx, bcy) = b - a, c - b
+            sides = np.hypot(abx, aby) * np.hypot(bcx, bcy) * np.hypot(*(c - a))
+            row['curvature'] = 2 * (abx * bcy - aby * bcx) / sides
+        rows.append(row)
+    return pd.DataFrame(rows, columns=list(TELEMETRY))
+
+
+@pytest.mark.parametrize('second_number', [8, 7])
+def test_no_difference_across_episodes(second_number):
+    # second episode starts far away, much later and turned around: any difference across the boundary would show.
+    # Same episode number twice (an episode without closing row merged into the next) is only split by starts.
+    first = _episode(7, 1000.0, (0.0, 0.0), [170.0, 175.0, 179.0, -179.0, -170.0], [0.0, 10.0, 20.0, 20.0, 30.0])
+    second = _episode(second_number, 5000.0, (50.0, -20.0), [-90.0, -95.0, -100.0, -120.0], [-30.0, 0.0, 0.0, 30.0])
+    df = pd.concat([first, second], ignore_index=True)
+    telemetry = derive_frame(df, [0, len(first)])
+    expected = pd.concat([_reference(first), _reference(second)], ignore_index=True)
+    pd.testing.assert_frame_equal(telemetry, expected, rtol=1e-9)
+    boundary = len(first)
+    assert telemetry.loc[[0, boundary], ['dt', 'ground_speed', 'heading_rate', 'steering_rate']].isna().all().all()
+    assert telemetry.accel[[0, 1, boundary, boundary + 1]].isna().all()
+    assert telemetry.curvature[[0, boundary - 1, boundary, len(df) - 1]].isna().all()
+    assert telemetry.heading_unwrapped[boundary] == -90.0
+    assert telemetry.heading_unwrapped[boundary - 1] == pytest.approx(190.0)  # no jump at +/-180
+    assert telemetry.notna().sum().sum() == expected.notna().sum().sum()
+
+
+def test_empty():
+    df = _episode(1, 0.0, (0.0, 0.0), [], [])
+    assert list(derive_frame(df).columns) == list(TELEMETRY) and not len(derive_frame(df))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Minimal AWS request signing (Signature Version 4) with the standard library only, so fetching logs doesn't need
+boto3 or the awslogs package. Credentials are read like the AWS CLI does: environment variables first, then the
+profile of ~/.aws/credentials (and its region from ~/.aws/config).
+"""
+import configparser
+import datetime
+import hashlib
+import hmac
+import os
+from collections import namedtuple
+from urllib.parse import quote, urlsplit
+
+DEFAULT_REGION = 'us-east-1'  # region of the AWS Deepracer console
+
+Credentials = namedtuple('Credentials', 'access_key, secret_key, token, region')
+
+
+def load_credentials(profile=None):
+    """
+    :param profile: [string] Profile of ~/.aws/credentials. If None, environment variables are tried first and then
+                    profile AWS_PROFILE (or 'default').
+    :return: [Credentials] None if no credentials were found (requests are then sent unsigned).
+    """
+    region = os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION')
+    if profile is None and os.environ.get('AWS_ACCESS_KEY_ID'):
+        return Credentials(os.environ['AWS_ACCESS_KEY_ID'], os.environ.get('AWS_SECRET_ACCESS_KEY', ''),
+                           os.environ.get('AWS_SESSION_TOKEN'), region or DEFAULT_REGION)
+    profile = profile or os.environ.get('AWS_PROFILE', 'default')
+    credentials, config = configparser.ConfigParser(), configparser.ConfigParser()
+    credentials.read(os.environ.get('AWS_SHARED_CREDENTIALS_FILE', os.path.expanduser('~/.aws/credentials')))
+    config.read(os.environ.get('AWS_CONFIG_FILE', os.path.expanduser('~/.aws/config')))
+    if not credentials.has_section(profile):
+        return None
+    section = credentials[profile]
+    config_section = 'default' if profile == 'default' else f'profile {profile}'
+    region = region or config.get(config_section, 'region', fallback=DEFAULT_REGION)
+    return Credentials(section.get('aws_access_key_id'), section.get('aws_secret_access_key'),
+                       section.get('aws_session_token'), region)
+
+
+def _hmac(key, msg):
+    return hmac.new(key, msg.encode(), hashlib.sha256).digest()
+
+
+def sign(method, url, headers, body, credentials, service, now=None):
+    """
+    Add SigV4 authorization headers to a request.
+    :param method: [string] HTTP method.
+    :param url: [string] Full request URL.
+    :param headers: [dict] Request headers (Host and X-Amz-* headers are added to it).
+    :param body: [bytes] Request payload.
+    :param credentials: [Credentials] Keys and region.
+    :param service: [string] Signing name of the service (e.g. 'logs').
+    :param now: [datetime] Signing time (default: current UTC time).
+    :return: [dict] headers, updated in place.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    amz_date, date = now.strftime('%Y%m%dT%H%M%SZ'), now.strftime('%Y%m%d')
+    parts = urlsplit(url)
+    headers['Host'] = parts.netloc
+    headers['X-Amz-Date'] = amz_date
+    if credentials.token:
+        headers['X-Amz-Security-Token'] = credentials.token
+    signed = {name.lower(): ' '.join(str(value).split()) for name, value in headers.items()}
+    signed_names = ';'.join(sorted(signed))
+    query = '&'.join(sorted(parts.query.split('&'))) if parts.query else ''
+    canonical = '\n'.join((method, quote(parts.path or '/'), query,
+                           ''.join(f'{name}:{signed[name]}\n' for name in sorted(signed)), signed_names,
+                           hashlib.sha256(body).hexdigest()))
+    scope = f'{date}/{credentials.region}/{service}/aws4_request'
+    to_sign = '\n'.join(('AWS4-HMAC-SHA256', amz_date, scope, hashlib.sha256(canonical.encode()).hexdigest()))
+    key = _hmac(_hmac(_hmac(_hmac(f'AWS4{credentials.secret_key}'.encode(), date), credentials.region), service),
+                'aws4_request')
+    signature = hmac.new(key, to_sign.encode(), hashlib.sha256).hexdigest()
+    headers['Authorization'] = f'AWS4-HMAC-SHA256 Credential={credentials.access_key}/{scope}, ' \
+                               f'SignedHeaders={signed_names}, Signature={signature}'
+    return headers
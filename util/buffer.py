@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Growing columnar buffer of DataFrame rows: one NumPy array per column whose capacity doubles when full, so appending
+k rows costs O(k) amortized however many rows came before, and the rows so far are a DataFrame of views (no copies).
+Categorical columns are kept as codes of categories merged over all appended frames.
+"""
+import numpy as np
+import pandas as pd
+
+MIN_CAPACITY = 1024  # rows allocated by the first append (at least)
+
+
+class ColumnBuffer:
+    def __init__(self):
+        self.size = 0
+        self.capacity = 0
+        self.columns = {}  # column name -> array of capacity rows (codes for categorical columns)
+        self.categories = {}  # categorical column name -> list of categories in code order
+        self._codes = {}  # categorical column name -> {category: code}
+        self._frame = None
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self, rows):
+        capacity = max(2 * self.capacity, self.size + rows, MIN_CAPACITY)
+        for name, column in self.columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+        self.capacity = capacity
+
+    def _category_codes(self, name, col):
+        """
+        :return: [ndarray] Codes of categorical col in the merged categories of column name (-1 stays missing).
+        """
+        codes = self._codes[name]
+        for category in col.cat.categories:
+            if category not in codes:
+                codes[category] = len(codes)
+                self.categories[name].append(category)
+        # code -1 (missing value) indexes the appended -1
+        remap = np.array([codes[category] for category in col.cat.categories] + [-1], dtype=np.int32)
+        return remap[col.cat.codes.to_numpy()]
+
+    def append(self, df):
+        """
+        Copy rows of df at the end of the buffer.
+        :param df: [DataFrame] Rows with the same columns (and dtypes) as every frame appended before.
+        """
+        if not self.columns:
+            for name, col in df.items():
+                if isinstance(col.dtype, pd.CategoricalDtype):
+                    self.columns[name] = np.empty(0, dtype=np.int32)
+                    self.categories[name], self._codes[name] = [], {}
+                else:
+                    self.columns[name] = np.empty(0, dtype=col.dtype)
+        rows = len(df)
+        if self.size + rows > self.capacity:
+            self._grow(rows)
+        for name, column in self.columns.items():
+            col = df[name]
+            values = self._category_codes(name, col) if name in self.categories else col.to_numpy()
+            column[self.size:self.size + rows] = values
+        self.size += rows
+        self._frame = None
+
+    def frame(self):
+        """
+        :return: [DataFrame] All rows appended so far, as views on the buffer (rebuilt only after an append).
+        """
+        if self._frame is None:
+            data = {}
+            for name, column in self.columns.items():
+                if name in self.categories:
+                    data[name] = pd.Categorical.from_codes(column[:self.size], categories=self.categories[name],
+                                                           validate=False)
+                else:
+                    data[name] = column[:self.size]
+            self._frame = pd.DataFrame(data, copy=False)
+        return self._frame
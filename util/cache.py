@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of parsed logs.
+Entries are keyed by a fingerprint of the log (size, mtime and a hash of sampled content blocks) and stored as
+uncompressed NumPy .npz files (one array per column), so loading them skips parsing entirely.
+Least recently used entries are evicted once the cache grows past CACHE_MAX_BYTES or CACHE_MAX_ENTRIES.
+"""
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = os.environ.get('DEEPRACER_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'deepracer'))
+CACHE_MAX_BYTES = 4 * 1024 ** 3
+CACHE_MAX_ENTRIES = 64
+CACHE_VERSION = 2  # bump whenever the parsed layout changes so stale entries are never loaded
+
+SAMPLE_SIZE = 1024 * 1024  # bytes hashed per sampled block
+SAMPLE_BLOCKS = 8
+
+_CAT_PREFIX = 'cat:'  # categorical column stored as codes, its categories stored under this prefix
+
+
+def fingerprint(logfile, extra=''):
+    """
+    Fingerprint a log without reading all of it.
+    :param logfile: [string] Log file to fingerprint.
+    :param extra: [string] Anything else the parsed result depends on (e.g. parser options).
+    :return: [string] Hex digest.
+    """
+    stat = os.stat(logfile)
+    digest = hashlib.blake2b(f'{CACHE_VERSION}:{stat.st_size}:{stat.st_mtime_ns}:{extra}'.encode(), digest_size=16)
+    with open(logfile, 'rb') as f:
+        if stat.st_size <= SAMPLE_SIZE * SAMPLE_BLOCKS:
+            digest.update(f.read())
+        else:
+            step = (stat.st_size - SAMPLE_SIZE) // (SAMPLE_BLOCKS - 1)
+            for block in range(SAMPLE_BLOCKS):
+                f.seek(block * step)
+                digest.update(f.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def frame_to_arrays(df):
+    """
+    Convert a DataFrame to a dict of NumPy arrays (categorical/string columns become codes + categories).
+    :param df: [DataFrame] Frame to convert.
+    :return: [dict] Column name -> array.
+    """
+    arrays = {}
+    for name, col in df.items():
+        if col.dtype.kind == 'O' or isinstance(col.dtype, pd.CategoricalDtype):
+            col = col.astype('category')
+            arrays[name] = col.cat.codes.to_numpy()
+            arrays[_CAT_PREFIX + name] = col.cat.categories.to_numpy(dtype=str)
+        else:
+            arrays[name] = col.to_numpy()
+    return arrays
+
+
+def arrays_to_frame(arrays, columns):
+    """
+    Rebuild a DataFrame written by frame_to_arrays.
+    :param arrays: [dict] Column name -> array (e.g. an opened .npz file).
+    :param columns: list[string] Column names in order.
+    :return: [DataFrame]
+    """
+    data = {}
+    for name in columns:
+        if _CAT_PREFIX + name in arrays:
+            data[name] = pd.Categorical.from_codes(arrays[name], categories=arrays[_CAT_PREFIX + name])
+        else:
+            data[name] = arrays[name]
+    return pd.DataFrame(data, copy=False)
+
+
+def _path(key):
+    return os.path.join(CACHE_DIR, f'{key}.npz')
+
+
+def load(key):
+    """
+    Load a cache entry.
+    :param key: [string] Fingerprint of the log.
+    :return: [tuple] (DataFrame, episode starts, offtracks) or None on a miss.
+    """
+    path = _path(key)
+    if not os.path.isfile(path):
+        return None
+    with np.load(path, allow_pickle=False) as arrays:
+        df = arrays_to_frame(arrays, [str(c) for c in arrays['columns']])
+        entry = df, arrays['starts'].tolist(), [tuple(offtrack) for offtrack in arrays['offtracks'].tolist()]
+    os.utime(path)  # mark as recently used for eviction
+    return entry
+
+
+def store(key, df, starts, offtracks):
+    """
+    Write a cache entry (atomically) and evict old entries.
+    :param key: [string] Fingerprint of the log.
+    :param df: [DataFrame] All parsed rows.
+    :param starts: list[int] Row index of the start of each episode in df.
+    :param offtracks: list[tuple] (episode, step) of every "off_track" episode.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _path(key)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, columns=np.array(df.columns, dtype=str), starts=np.array(starts, dtype=np.int64),
+                 offtracks=np.array(offtracks, dtype=np.int64).reshape(-1, 2), **frame_to_arrays(df))
+    os.replace(tmp, path)
+    evict()
+
+
+def evict(max_bytes=CACHE_MAX_BYTES, max_entries=CACHE_MAX_ENTRIES):
+    """
+    Remove least recently used entries until the cache fits max_bytes and max_entries.
+    """
+    if not os.path.isdir(CACHE_DIR):
+        return
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith('.npz'):
+            stat = os.stat(os.path.join(CACHE_DIR, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+    entries.sort(reverse=True)
+    total = 0
+    for count, (_, size, name) in enumerate(entries, 1):
+        total += size
+        # most recent entry is always kept, even if it is bigger than max_bytes on its own
+        if count > 1 and (count > max_entries or total > max_bytes):
+            os.remove(os.path.join(CACHE_DIR, name))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Compressed logs (gzip, bz2 and zstd, recognized by their magic bytes, not their name) are read by streaming through
+the decompressor, never inflated to disk. Frames of a multi-frame zstd log are independent, so they are found by
+walking frame and block headers (no decompression) and byte ranges starting at a frame can be decoded concurrently
+(see util.logreader.split_ranges). gzip and bz2 members can't be found without decompressing, so those logs are
+decoded in one stream. zstd needs the zstandard package, imported only when a zstd log is read.
+"""
+import io
+import mmap
+import os
+
+MAGIC = {b'\x1f\x8b': 'gzip', b'BZh': 'bz2', b'\x28\xb5\x2f\xfd': 'zstd'}
+ZSTD_MAGIC = 0xFD2FB528
+ZSTD_SKIPPABLE = 0x184D2A50  # skippable frames: 0x184D2A50 to 0x184D2A5F
+READ_SIZE = 1024 * 1024  # compressed bytes read per decoder call
+EXTENSIONS = ('.gz', '.bz2', '.zst')  # usual names of compressed logs (format itself is told by magic bytes)
+
+
+def compression(logfile):
+    """
+    :param logfile: [string] Log file.
+    :return: [string] 'gzip', 'bz2' or 'zstd', None if log isn't compressed.
+    """
+    with open(logfile, 'rb') as f:
+        head = f.read(4)
+    for magic, name in MAGIC.items():
+        if head.startswith(magic):
+            return name
+    return None
+
+
+class _RawSlice(io.RawIOBase):
+    """
+    Read-only view of bytes [start, stop) of an open binary file (closed with it).
+    """
+
+    def __init__(self, f, start=0, stop=None):
+        super().__init__()
+        f.seek(start)
+        self.f = f
+        self.remaining = None if stop is None else stop - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = len(buffer) if self.remaining is None else min(len(buffer), self.remaining)
+        data = self.f.read(size)
+        buffer[:len(data)] = data
+        if self.remaining is not None:
+            self.remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self.f.close()
+        super().close()
+
+
+class _Decoded(io.RawIOBase):
+    """
+    Decompressed bytes of a decoder, closing the decoder and the file it reads from together.
+    """
+
+    def __init__(self, stream, source):
+        super().__init__()
+        self.stream, self.source = stream, source
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self.stream.readinto(buffer)
+
+    def close(self):
+        self.stream.close()
+        self.source.close()
+        super().close()
+
+
+def decoder(fileobj, fmt):
+    """
+    :param fileobj: Binary file object positioned at the start of a gzip member, bz2 stream or zstd frame.
+    :param fmt: [string] 'gzip', 'bz2' or 'zstd' (see compression()).
+    :return: Binary file object of the decompressed bytes of all following members/streams/frames.
+    """
+    if fmt == 'gzip':
+        import gzip
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    if fmt == 'bz2':
+        import bz2
+        return bz2.BZ2File(fileobj)
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError('Reading zstd compressed logs needs the zstandard package (pip install zstandard)') from None
+    return zstandard.ZstdDecompressor().stream_reader(fileobj, read_size=READ_SIZE, read_across_frames=True,
+                                                      closefd=False)
+
+
+def open_log(logfile, start=0, stop=None):
+    """
+    :param logfile: [string] Log file, compressed or not.
+    :param start: [int] Byte offset in (compressed) file to read from: a frame start for compressed logs.
+    :param stop: [int] Byte offset in (compressed) file to stop at (a frame start), None for end of file.
+    :return: Buffered binary file object of the (decompressed) bytes, to be closed by caller.
+    """
+    fmt = compression(logfile)
+    source = _RawSlice(open(logfile, 'rb'), start, stop)
+    return io.BufferedReader(source if fmt is None else _Decoded(decoder(source, fmt), source), READ_SIZE)
+
+
+def contains_all(logfile, markers, chunk_size=READ_SIZE):
+    """
+    :param logfile: [string] Compressed log file.
+    :param markers: list[bytes] Byte strings searched for.
+    :return: [bool] True if all markers are in the decompressed log. Decompression stops as soon as all were seen.
+    """
+    missing = set(markers)
+    overlap = max(len(marker) for marker in markers) - 1
+    tail = b''
+    with open_log(logfile) as f:
+        while missing:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return False
+            buf = tail + chunk
+            missing = {marker for marker in missing if marker not in buf}
+            tail = buf[-overlap:] if overlap else b''
+    return True
+
+
+def zstd_frames(logfile):
+    """
+    Walk zstd frame and block headers (RFC 8878) without decompressing anything.
+    :param logfile: [string] zstd compressed log.
+    :return: list[int] Byte offset of every (non skippable) frame.
+    """
+    offsets = []
+    size = os.path.getsize(logfile)
+    with open(logfile, 'rb', 0) as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as s:
+        pos = 0
+        while pos + 4 <= size:
+            magic = int.from_bytes(s[pos:pos + 4], 'little')
+            if magic & 0xFFFFFFF0 == ZSTD_SKIPPABLE:
+                pos += 8 + int.from_bytes(s[pos + 4:pos + 8], 'little')
+                continue
+            if magic != ZSTD_MAGIC:
+                raise ValueError(f"'{logfile}' is not a valid zstd file (no frame at byte {pos})")
+            offsets.append(pos)
+            descriptor = s[pos + 4]
+            single_segment = descriptor >> 5 & 1
+            content_size_bytes = (single_segment, 2, 4, 8)[descriptor >> 6]
+            pos += 5 + (not single_segment) + (0, 1, 2, 4)[descriptor & 3] + content_size_bytes
+            last = False
+            while not last:
+                header = int.from_bytes(s[pos:pos + 3], 'little')
+                last, block_type, block_size = header & 1, header >> 1 & 3, header >> 3
+                pos += 3 + (1 if block_type == 1 else block_size)  # RLE block holds a single byte
+            pos += 4 * (descriptor >> 2 & 1)  # content checksum
+    return offsets
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Exporters for parsed log data.
+Output is written next to the log with the format's extension, e.g. 'awslog-sim.log' -> 'awslog-sim.parquet'.
+Parquet and Feather need pyarrow installed and Excel needs openpyxl.
+"""
+import os
+import threading
+import numpy as np
+
+from util.cache import frame_to_arrays
+from util.compression import EXTENSIONS
+from util.profiler import span
+
+
+def _to_xlsx(df, path):
+    df.to_excel(path, index=False)
+
+
+def _to_csv(df, path):
+    df.to_csv(path, index=False)
+
+
+def _to_parquet(df, path):
+    df.to_parquet(path, index=False)
+
+
+def _to_feather(df, path):
+    df.reset_index(drop=True).to_feather(path)
+
+
+def _to_npz(df, path):
+    np.savez(path, columns=np.array(df.columns, dtype=str), **frame_to_arrays(df))
+
+
+# format -> (file extension, writer)
+EXPORTERS = {
+    'xlsx': ('.xlsx', _to_xlsx),
+    'csv': ('.csv', _to_csv),
+    'parquet': ('.parquet', _to_parquet),
+    'feather': ('.feather', _to_feather),
+    'npz': ('.npz', _to_npz),
+}
+EXPORT_FORMATS = ('none',) + tuple(EXPORTERS)
+
+
+def export_path(logfile, fmt):
+    """
+    :param logfile: [string] Log file the data was parsed from.
+    :param fmt: [string] One of EXPORTERS.
+    :return: [string] Output file name (log file name with its extension replaced, e.g. 'sim.log.gz' -> 'sim.csv').
+    """
+    base, ext = os.path.splitext(logfile)
+    if ext in EXTENSIONS:
+        base = os.path.splitext(base)[0]
+    return base + EXPORTERS[fmt][0]
+
+
+def export(df, logfile, fmt, background=False):
+    """
+    Write parsed data to a file next to the log.
+    :param df: [DataFrame] Data to write.
+    :param logfile: [string] Log file the data was parsed from.
+    :param fmt: [string] One of EXPORT_FORMATS ('none' writes nothing).
+    :param background: [bool] If True, file is written by a (non daemon) thread so caller can go on, e.g. plotting.
+    :return: [Thread] Writer thread if background, else None.
+    """
+    if fmt == 'none':
+        return None
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Invalid export format '{fmt}'. Must be one of these: {EXPORT_FORMATS}")
+    path = export_path(logfile, fmt)
+    writer = EXPORTERS[fmt][1]
+
+    def write():
+        with span('export', format=fmt) as s:
+            s.add('rows', len(df))
+            writer(df, path)
+            s.add('bytes', os.path.getsize(path))
+        print(f'Exported {len(df)} rows to {path}')
+
+    if not background:
+        write()
+        return None
+    thread = threading.Thread(target=write, name=f'export-{fmt}')
+    thread.start()
+    return thread
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Track geometry: batched projection of (x, y) points onto the closed centerline polyline of a track.
+Segments are indexed by a uniform grid hash: every cell lists only the segments that can be nearest to some point in
+it (padded into one table), so a batch of points only measures the few segments near each point at once.
+"""
+from collections import namedtuple
+import numpy as np
+
+from data.registry import load_track
+
+CELL_SIZE = 0.1  # meters
+MARGIN = 2.0  # meters around waypoints covered by the grid. Farther points are measured against all segments
+CHUNK_SIZE = 250000  # points projected at once (bounds memory of candidate distances)
+
+# segment: index i of segment waypoints[i] -> waypoints[i + 1] (last one closes the lap)
+# distance: distance to centerline, offset: signed distance (> 0 left of driving direction)
+# progress: arc length (meters from waypoints[0]) of the projected point, x/y: projected point
+Projection = namedtuple('Projection', 'segment, distance, offset, progress, x, y')
+
+
+class TrackGeometry:
+    def __init__(self, waypoints, cell_size=CELL_SIZE, margin=MARGIN):
+        """
+        :param waypoints: list[tuple] Centerline waypoints of track (x, y) in driving order (lap is closed).
+        :param cell_size: [float] Size of grid hash cells (meters).
+        :param margin: [float] Distance around the waypoints covered by the grid (meters).
+        """
+        self.waypoints = np.asarray(waypoints, dtype=np.float64)
+        self.starts = self.waypoints
+        self.vectors = np.roll(self.waypoints, -1, axis=0) - self.waypoints
+        self.lengths = np.hypot(self.vectors[:, 0], self.vectors[:, 1])
+        self.progress_at = np.concatenate(([0.0], np.cumsum(self.lengths)[:-1]))  # arc length at segment starts
+        self.length = float(self.lengths.sum())
+        # one contiguous array per segment field: np.take on 1-D arrays is much faster than 2-D fancy indexing
+        self._x0, self._y0 = self.starts.T.copy()
+        self._vx, self._vy = self.vectors.T.copy()
+        self._inv_len2 = np.divide(1.0, self.lengths ** 2, out=np.zeros_like(self.lengths), where=self.lengths > 0)
+        self.cell_size = cell_size
+        self._build_index(margin)
+
+    @classmethod
+    def for_track(cls, track, **kwargs):
+        """
+        :param track: [string] Track name (e.g. 'reinvent2018', see data.registry).
+        :return: [TrackGeometry]
+        """
+        return cls(load_track(track).xy, **kwargs)
+
+    def _build_index(self, margin):
+        self.origin = self.waypoints.min(axis=0) - margin
+        size = self.waypoints.max(axis=0) + margin - self.origin
+        self.shape = tuple(int(n) for n in np.ceil(size / self.cell_size))
+        nx, ny = self.shape
+        all_segments = np.broadcast_to(np.arange(len(self.starts)), (nx * ny, len(self.starts)))
+        cx, cy = np.divmod(np.arange(nx * ny), ny)
+        corners = [self._distances(self.origin[0] + (cx + dx) * self.cell_size,
+                                   self.origin[1] + (cy + dy) * self.cell_size, all_segments)
+                   for dx in (0, 1) for dy in (0, 1)]
+        center = self._distances(self.origin[0] + (cx + 0.5) * self.cell_size,
+                                 self.origin[1] + (cy + 0.5) * self.cell_size, all_segments)
+        # distance to a segment is convex, so it is largest at a corner of the cell: no point of the cell is
+        # farther than `bound` from its nearest segment. Any segment nearer than that to some point of the cell is
+        # at most half a cell diagonal nearer to it than to the center.
+        bound = np.max(corners, axis=0).min(axis=1)
+        mask = center - self.cell_size / np.sqrt(2) <= bound[:, None] + 1e-9
+        self.widths = mask.sum(axis=1)
+        # padded with the first candidate of the cell, so padding never changes the nearest segment
+        order = np.argsort(~mask, axis=1, kind='stable')
+        self.candidates = order[:, :self.widths.max()].copy()
+        pad = np.arange(self.candidates.shape[1]) >= self.widths[:, None]
+        self.candidates[pad] = np.broadcast_to(self.candidates[:, :1], self.candidates.shape)[pad]
+        self._tables = {}  # width -> contiguous candidates[:, :width]
+
+    def _distances(self, xs, ys, segments):
+        return np.sqrt(self._nearest_all(xs, ys, segments)[1])
+
+    def _nearest_all(self, xs, ys, segments):
+        """
+        :param segments: [ndarray] (N, K) candidate segments of every point.
+        :return: [tuple] (t along, squared distance to) every candidate segment of every point.
+        """
+        px = xs[:, None] - np.take(self._x0, segments)
+        py = ys[:, None] - np.take(self._y0, segments)
+        vx, vy = np.take(self._vx, segments), np.take(self._vy, segments)
+        t = px * vx
+        t += py * vy
+        t *= np.take(self._inv_len2, segments)
+        np.clip(t, 0.0, 1.0, out=t)
+        px -= t * vx
+        py -= t * vy
+        px *= px
+        py *= py
+        px += py
+        return t, px
+
+    def _nearest(self, xs, ys, segments):
+        """
+        :param segments: [ndarray] (N, K) candidate segments of every point.
+        :return: [tuple] (best segment, t along it) of every point.
+        """
+        t, dist2 = self._nearest_all(xs, ys, segments)
+        best = np.argmin(dist2, axis=1)[:, None]
+        return np.take_along_axis(segments, best, 1)[:, 0], np.take_along_axis(t, best, 1)[:, 0]
+
+    def project(self, xs, ys, chunk_size=CHUNK_SIZE):
+        """
+        Project points onto the centerline.
+        :param xs: [ndarray] X coordinates.
+        :param ys: [ndarray] Y coordinates.
+        :param chunk_size: [int] Number of points projected at once.
+        :return: [Projection] One array per field, one entry per point.
+        """
+        xs, ys = np.asarray(xs, dtype=np.float64).ravel(), np.asarray(ys, dtype=np.float64).ravel()
+        segment, t = np.empty(len(xs), dtype=np.int64), np.empty(len(xs))
+        for start in range(0, len(xs), chunk_size):
+            part = slice(start, start + chunk_size)
+            segment[part], t[part] = self._project_chunk(xs[part], ys[part])
+        vx, vy = np.take(self._vx, segment), np.take(self._vy, segment)
+        px, py = np.take(self._x0, segment) + t * vx, np.take(self._y0, segment) + t * vy
+        dx, dy = xs - px, ys - py
+        distance = np.hypot(dx, dy)
+        # cross product sign: > 0 if point is left of driving direction
+        side = np.sign(vx * dy - vy * dx)
+        progress = (np.take(self.progress_at, segment) + t * np.take(self.lengths, segment)) % self.length
+        return Projection(segment, distance, side * distance, progress, px, py)
+
+    def _project_chunk(self, xs, ys):
+        cx = np.floor((xs - self.origin[0]) / self.cell_size).astype(np.int64)
+        cy = np.floor((ys - self.origin[1]) / self.cell_size).astype(np.int64)
+        inside = (cx >= 0) & (cx < self.shape[0]) & (cy >= 0) & (cy < self.shape[1])
+        cell = np.where(inside, cx * self.shape[1] + cy, 0)
+        # points are measured in groups of similar number of candidates (next power of 2), so the few cells with
+        # many candidates (e.g. middle of a curve) don't make every point measure as many segments
+        width = np.where(inside, 1 << np.ceil(np.log2(self.widths[cell])).astype(np.int64), 0)
+        segment, t = np.zeros(len(xs), dtype=np.int64), np.zeros(len(xs))
+        for w in np.unique(width):
+            idx = np.flatnonzero(width == w)
+            if w:
+                if w not in self._tables:
+                    self._tables[w] = np.ascontiguousarray(self.candidates[:, :w])
+                candidates = np.take(self._tables[w], cell[idx], axis=0)
+            else:  # outside grid
+                candidates = np.broadcast_to(np.arange(len(self.starts)), (len(idx), len(self.starts)))
+            segment[idx], t[idx] = self._nearest(xs[idx], ys[idx], candidates)
+        return segment, t
+
+    def progress_delta(self, progress_from, progress_to):
+        """
+        :return: [ndarray] Signed arc length from progress_from to progress_to the short way around the lap
+                 (e.g. crossing the start line forward is a small positive delta, not -length).
+        """
+        return (np.asarray(progress_to) - progress_from + self.length / 2) % self.length - self.length / 2
+
+    def unwrap_progress(self, progress):
+        """
+        :param progress: [ndarray] Consecutive progress values of one episode.
+        :return: [ndarray] Progress that keeps growing past the start line instead of wrapping to 0.
+        """
+        progress = np.asarray(progress, dtype=np.float64)
+        if not len(progress):
+            return progress
+        return progress[0] + np.concatenate(([0.0], np.cumsum(self.progress_delta(progress[:-1], progress[1:]))))
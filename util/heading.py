@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Track-generic heading engine.
+Target points of a track are turned into arrays once, then best_heading (angle from car to the target point of its
+closest waypoint) and direction_diff (absolute heading error) are computed for a whole batch of rows at once.
+"""
+import hashlib
+import numpy as np
+
+from data.registry import load_track
+
+DEFAULT_LOOKAHEAD = 1.0  # meters ahead on the centerline used as target point for tracks without target_points
+MAX_WAYPOINT_DISTANCE = 1.0  # max median distance (m) of car to its closest waypoint before the track is deemed wrong
+
+
+class HeadingEngine:
+    def __init__(self, waypoints, target_points=None, name='', lookahead=DEFAULT_LOOKAHEAD):
+        """
+        :param waypoints: list[tuple] Centerline waypoints of track (x, y).
+        :param target_points: list[tuple] Target point (x, y) of each waypoint. If None, the centerline point
+                              lookahead meters past each waypoint is used.
+        :param name: [string] Name of track (only used in error messages).
+        :param lookahead: [float] Meters ahead of waypoint used as target when target_points is None.
+        """
+        self.name = name
+        self.waypoints = np.asarray(waypoints, dtype=np.float64)
+        if target_points is None:
+            target_points = self._lookahead_points(self.waypoints, lookahead)
+        self.targets = np.asarray(target_points, dtype=np.float64)
+        if len(self.targets) != len(self.waypoints):
+            raise ValueError(f'Mismatch size: len(waypoints)={len(self.waypoints)}, '
+                             f'len(target_points)={len(self.targets)}')
+        # simulator's closest_waypoint_index wraps around at number of waypoints of the track
+        self.num_waypoints = len(self.waypoints)
+        # identifies the waypoints and targets best_heading/direction_diff were computed from (parse cache key)
+        self.digest = hashlib.blake2b(self.waypoints.tobytes() + self.targets.tobytes(), digest_size=8).hexdigest()
+
+    @classmethod
+    def for_track(cls, track):
+        """
+        :param track: [string] Track name (e.g. 'reinvent2018', see data.registry).
+        :return: [HeadingEngine] Engine using target_points of track if it has them.
+        """
+        bundle = load_track(track)
+        return cls(bundle.xy, bundle.target_points, name=track)
+
+    @staticmethod
+    def _lookahead_points(waypoints, lookahead):
+        seg_lengths = np.hypot(*np.diff(waypoints, axis=0, append=waypoints[:1]).T)
+        dist = np.concatenate(([0.0], np.cumsum(seg_lengths)))
+        total = dist[-1]
+        idx = np.searchsorted(dist, (dist[:-1] + lookahead) % total) % len(waypoints)
+        return waypoints[idx]
+
+    def check(self, df):
+        """
+        Make sure rows were logged on this track (instead of silently wrapping their waypoint indices).
+        :param df: [DataFrame] Decoded SIM_TRACE_LOG rows (closest_waypoint_index not wrapped yet).
+        """
+        if not len(df):
+            return
+        idx = df.closest_waypoint_index.to_numpy()
+        if idx.max() > self.num_waypoints or idx.min() < 0:
+            raise ValueError(f"closest_waypoint_index up to {idx.max()} found, but track '{self.name}' only has "
+                             f"{self.num_waypoints} waypoints. Was log recorded on another track?")
+        nearest = self.waypoints[idx % self.num_waypoints]
+        distance = np.median(np.hypot(df.x_coord.to_numpy() - nearest[:, 0], df.y_coord.to_numpy() - nearest[:, 1]))
+        if distance > MAX_WAYPOINT_DISTANCE:
+            raise ValueError(f"Car is {distance:.2f}m (median) from its closest waypoint of track '{self.name}'. "
+                             f"Was log recorded on another track?")
+
+    def apply(self, df):
+        """
+        Wrap closest_waypoint_index and add best_heading and direction_diff columns in place.
+        :param df: [DataFrame] Decoded SIM_TRACE_LOG rows.
+        """
+        self.check(df)
+        idx = df.closest_waypoint_index.to_numpy() % self.num_waypoints
+        df['closest_waypoint_index'] = idx
+        target = self.targets[idx]
+        best_heading = np.degrees(np.arctan2(target[:, 1] - df.y_coord.to_numpy(),
+                                             target[:, 0] - df.x_coord.to_numpy()))
+        df['best_heading'] = best_heading
+        df['direction_diff'] = np.abs((best_heading - df.heading.to_numpy() + 180) % 360 - 180)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Bounded-memory reader for AWS Deepracer SIM logs.
+The file is scanned in fixed-size byte chunks and episodes are yielded as soon as they close,
+so peak memory is proportional to one episode (plus one chunk) instead of the whole log.
+Compressed logs are streamed through their decompressor (see util.compression). Byte offsets of a compressed log are
+offsets in the compressed file (frame starts), see decoded_range().
+"""
+import os
+import re
+import mmap
+from collections import namedtuple
+
+from util.compression import compression, open_log, zstd_frames
+
+CHUNK_SIZE = 8 * 1024 * 1024  # bytes read from disk per scan step
+
+RESET = b'Reset agent'
+LAP_COMPLETE = b'lap_complete'
+OFF_TRACK = b'off_track'
+
+# payload is everything after the first 'SIM_TRACE_LOG:' up to end of line (same as the original regex)
+_PAYLOAD = re.compile(rb'SIM_TRACE_LOG:([^\r\n]+)')
+
+Episode = namedtuple('Episode', 'status, rows')
+
+
+class EpisodeScanner:
+    """
+    Incremental "Reset agent" / SIM_TRACE_LOG state machine working directly on bytes.
+    Feed it consecutive chunks of a log; it keeps the half-finished line and episode between calls.
+    Episode semantics match the original line-by-line parser:
+      * "Reset agent" opens an episode (ignored while an episode is already open).
+      * SIM_TRACE_LOG rows are collected while an episode is open.
+      * A row with status 'lap_complete' or 'off_track' closes the episode.
+    """
+
+    def __init__(self):
+        self.in_episode = False
+        self.rows = None
+        self.tail = b''  # partial line carried over to the next chunk
+
+    def feed(self, chunk):
+        """
+        Scan next chunk of raw log bytes.
+        :param chunk: [bytes] Next bytes of the log.
+        :return: generator of Episode(status, rows) for every episode closed inside this chunk.
+                 rows is a list of raw SIM_TRACE_LOG payloads (bytes), closing row included.
+        """
+        buf = self.tail + chunk if self.tail else chunk
+        cut = buf.rfind(b'\n') + 1
+        self.tail = buf[cut:]
+        if cut:
+            yield from self._scan(buf, cut)
+
+    def close(self):
+        """
+        Flush the last (unterminated) line.
+        :return: generator of Episode(status, rows) closed by that line.
+        """
+        buf, self.tail = self.tail, b''
+        if buf:
+            yield from self._scan(buf + b'\n', len(buf) + 1)
+
+    def _scan(self, buf, end):
+        pos = 0
+        # next known position of each closing status; only re-searched once passed
+        hits = {LAP_COMPLETE: -2, OFF_TRACK: -2}
+        while pos < end:
+            if not self.in_episode:
+                reset = buf.find(RESET, pos, end)
+                if reset == -1:
+                    return
+                self.in_episode = True
+                self.rows = []
+                pos = buf.find(b'\n', reset, end) + 1
+                continue
+            close = self._find_close(buf, pos, end, hits)
+            if close is None:
+                self.rows += _PAYLOAD.findall(buf, pos, end)
+                return
+            line_end, status = close
+            self.rows += _PAYLOAD.findall(buf, pos, line_end)
+            rows, self.rows, self.in_episode = self.rows, None, False
+            yield Episode(status.decode(), rows)
+            pos = line_end + 1
+
+    @staticmethod
+    def _find_close(buf, pos, end, hits):
+        """
+        Find first SIM_TRACE_LOG row at or after pos whose status closes an episode.
+        :param hits: [dict] Cache of next position of each closing status in buf (-1 if none left).
+        :return: [tuple] (index of end of that line, status) or None if no closing row before end.
+        """
+        while pos < end:
+            for marker, idx in hits.items():
+                if -1 < idx < pos or idx == -2:
+                    hits[marker] = buf.find(marker, pos, end)
+            found = [idx for idx in hits.values() if idx != -1]
+            if not found:
+                return None
+            hit = min(found)
+            line_start = buf.rfind(b'\n', pos, hit) + 1 or pos
+            line_end = buf.find(b'\n', hit, end)
+            match = _PAYLOAD.search(buf, line_start, line_end)
+            if match:
+                payload = match.group(1)
+                status = payload[payload.rfind(b',') + 1:]
+                if status in (LAP_COMPLETE, OFF_TRACK):
+                    return line_end, status
+            pos = line_end + 1
+        return None
+
+
+def iter_episodes(logfile, start=0, stop=None, chunk_size=CHUNK_SIZE, scanner=None, flush=True):
+    """
+    Stream closed episodes out of a log file without loading it into memory.
+    :param logfile: [string] AWS Log file containing 'SIM_TRACE_LOG' and 'Reset'.
+    :param start: [int] Byte offset to start reading from (should be the start of a line).
+    :param stop: [int] Byte offset to stop reading at. If None, reads to end of file.
+    :param chunk_size: [int] Number of bytes read per scan step.
+    :param scanner: [EpisodeScanner] Scanner to continue from (e.g. with an episode left open). New one if None.
+    :param flush: [bool] If True, an unterminated last line is scanned as well. Use False on a growing file,
+                  so a half-written line stays in the scanner until the rest of it is read.
+    :return: generator of Episode(status, rows).
+    """
+    scanner = EpisodeScanner() if scanner is None else scanner
+    if compression(logfile) is not None:
+        for chunk in decoded_range(logfile, start, stop, chunk_size):
+            yield from scanner.feed(chunk)
+    else:
+        with open(logfile, 'rb') as f:
+            f.seek(start)
+            remaining = None if stop is None else stop - start
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield from scanner.feed(chunk)
+    if flush:
+        yield from scanner.close()
+
+
+def _first_reset(lines):
+    """
+    :param lines: iterator[bytes] Decompressed lines starting right after a range boundary.
+    :return: [tuple] (first "Reset agent" line starting after the first newline, None if none, and then the start of
+             the line cut by the end of lines: b'' if last line ended with a newline, None if no newline was read).
+    """
+    newline = False
+    for line in lines:
+        if not line.endswith(b'\n'):
+            return None, line if newline else None
+        if newline and RESET in line:
+            return line, None
+        newline = True
+    return None, b'' if newline else None
+
+
+def decoded_range(logfile, start=0, stop=None, chunk_size=CHUNK_SIZE):
+    """
+    Decompressed bytes of a range of a compressed log. Ranges start at frames (see split_ranges()), which cut lines
+    anywhere, so the bytes of range [start, stop) are those from the first "Reset agent" line starting after the first
+    newline at or after start (or from 0 if start is 0) to the first such line after stop. Consecutive ranges cover
+    the decompressed log exactly once, all starting at an episode like the ranges of a plain log.
+    :param logfile: [string] Compressed log file.
+    :param start: [int] Byte offset of a frame in the compressed file.
+    :param stop: [int] Byte offset of a later frame, None for end of file.
+    :param chunk_size: [int] Number of decompressed bytes per chunk.
+    :return: generator of bytes chunks.
+    """
+    with open_log(logfile, start, stop) as head:
+        started, straddle = start == 0, None
+        if not started:
+            line, straddle = _first_reset(head)
+            if line is not None:
+                yield line
+                started = True
+            elif straddle is None:
+                return  # no newline in range: range is empty
+        if started:
+            while True:
+                chunk = head.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    if stop is None or stop >= os.path.getsize(logfile):
+        return
+    with open_log(logfile, stop) as tail:
+        first = tail.readline()
+        if not started:
+            # no reset line in range yet: only the line running over stop can still start it
+            if RESET not in straddle + first:
+                return
+            yield straddle
+        yield first
+        for line in tail:
+            if RESET in line:
+                return
+            yield line
+
+
+def split_ranges(logfile, parts):
+    """
+    Split a log into byte ranges that never cut an episode in two.
+    Every cut is moved forward to the start of the next "Reset agent" line.
+    A zstd log is cut at frames instead (its ranges are decoded concurrently, see decoded_range()), other compressed
+    logs are one range.
+    :param logfile: [string] AWS Log file containing 'SIM_TRACE_LOG' and 'Reset'.
+    :param parts: [int] Wanted number of ranges (fewer are returned if there are not enough episodes).
+    :return: list[tuple] (start, stop) byte offsets covering the whole file in order.
+    """
+    size = os.path.getsize(logfile)
+    cuts = [0]
+    fmt = compression(logfile) if size else None
+    if fmt is not None:
+        frames = zstd_frames(logfile) if fmt == 'zstd' else [0]
+        for part in range(1, parts):
+            later = [offset for offset in frames if offset >= max(size * part // parts, cuts[-1] + 1)]
+            if later:
+                cuts.append(later[0])
+    elif size:
+        with open(logfile, 'rb', 0) as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as s:
+            for part in range(1, parts):
+                reset = s.find(RESET, max(size * part // parts, cuts[-1]))
+                if reset == -1:
+                    break
+                line_start = s.rfind(b'\n', 0, reset) + 1
+                if line_start > cuts[-1]:
+                    cuts.append(line_start)
+    cuts.append(size)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def parse_parallel(logfile, parse, workers, **kwargs):
+    """
+    Parse byte ranges (split at "Reset agent" lines) in a process pool, yielding results in file order.
+    If a range ends inside an episode (no closing row), the next range is re-parsed here with that episode
+    still open, exactly like the serial path would, so output is identical to it.
+    :param logfile: [string] AWS Log file containing 'SIM_TRACE_LOG' and 'Reset'.
+    :param parse: Module level function parse(logfile, start, stop, carry, **kwargs) returning a tuple whose last
+                  item is the carry (rows of the episode still open at end of range, None if none).
+    :param workers: [int] Number of processes (and wanted number of ranges).
+    :param kwargs: Passed to every parse call (e.g. chunk_size).
+    """
+    from concurrent.futures import ProcessPoolExecutor  # not imported by serial (e.g. quick stats) runs
+    ranges = split_ranges(logfile, workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(parse, logfile, start=start, stop=stop, **kwargs) for start, stop in ranges]
+        carry = None
+        for (start, stop), future in zip(ranges, futures):
+            result = future.result()
+            if carry is not None:
+                result = parse(logfile, start=start, stop=stop, carry=carry, **kwargs)
+            carry = result[-1]
+            yield result
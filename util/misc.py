@@ -3,12 +3,58 @@ import os
 import mmap
 from argparse import ArgumentTypeError
 
+from util.compression import compression, contains_all
+
 
 def valid_aws_log_file(file):
-    if os.path.isfile(file):
+    if os.path.isfile(file) and compression(file):
+        # decompressed only until both key words were seen
+        if contains_all(file, (b'SIM_TRACE_LOG', b'Reset')):
+            return file
+    elif os.path.isfile(file) and os.path.getsize(file):
         # using mmap to check file in place without overloading buffer by reading into memory
         with open(file, 'rb', 0) as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as s:
             if s.find(b'SIM_TRACE_LOG') != -1 and s.find(b'Reset') != -1:
                 return file
     raise ArgumentTypeError(f"'{file}' is an invalid file. "
                             f"Should be an AWS Log file containing key words: 'SIM_TRACE_LOG' and 'Reset'")
+
+
+class RangeTable(dict):
+    """
+    Dict of ranges -> value, indexed by any int inside one of the ranges in constant time.
+    Ranges are checked up front (step 1, no overlaps, no gaps from 0 to the end of the last range) and expanded
+    into a dense tuple, so table[i] is a plain tuple index instead of a search through every range.
+    Indexing with a range key returns its value like a normal dict.
+    """
+
+    def __init__(self, ranges, size=None):
+        """
+        :param ranges: [dict] range -> value.
+        :param size: [int] Number of indices that must be covered (e.g. number of waypoints). If None, the end of
+                     the last range.
+        """
+        super().__init__(ranges)
+        for key in self:
+            if not isinstance(key, range) or key.step != 1 or not len(key):
+                raise ValueError(f'Invalid key {key!r}: keys must be non empty ranges with step 1')
+        dense = [None] * (max((r.stop for r in self), default=0) if size is None else size)
+        covered = [False] * len(dense)
+        for key, value in self.items():
+            if key.start < 0 or key.stop > len(dense):
+                raise ValueError(f'Range {key} is outside of 0..{len(dense) - 1}')
+            for idx in key:
+                if covered[idx]:
+                    raise ValueError(f'Range {key} overlaps another range at {idx}')
+                covered[idx] = True
+                dense[idx] = value
+        if not all(covered):
+            raise ValueError(f'Indices not covered by any range: {[i for i, c in enumerate(covered) if not c]}')
+        self.values_by_index = tuple(dense)
+
+    def __getitem__(self, item):
+        if isinstance(item, range):
+            return super().__getitem__(item)
+        if not 0 <= item < len(self.values_by_index):
+            raise KeyError(item)
+        return self.values_by_index[item]
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Stage level profiling: named timing spans with counters (rows, episodes, bytes, artists drawn...) around the
+parse -> aggregate -> export -> render stages, summarized as a table and written as a JSON trace (Chrome trace event
+format: open it in chrome://tracing or https://ui.perfetto.dev).
+Profiling is off unless a tool is run with -profile. While off, span() returns one shared do-nothing context
+manager after a single attribute check, so instrumented code runs at full speed. Spans of worker processes (parse
+workers, render workers) are not recorded: their time shows up in the span of the stage that started them.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+PROFILE_TRACE = 'profile-trace.json'  # default JSON trace file of -profile
+RATE_COUNTERS = ('rows', 'bytes', 'steps')  # counters also shown per second of their span in the summary
+
+
+def peak_rss(children=False):
+    """
+    :param children: [bool] If True, largest peak of all finished child processes (e.g. parse workers) instead.
+    :return: [int] Peak resident set size in bytes, None where unknown (Windows).
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024  # bytes on macOS, kilobytes elsewhere
+
+
+class _NullSpan:
+    """
+    Span handed out while profiling is off: ignores everything.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, name, value=1):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, profiler, name, labels):
+        self.profiler = profiler
+        self.name = name
+        self.labels = labels
+        self.counters = {}
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        self.depth = len(stack)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter() - self.start
+        self.profiler._stack().pop()
+        self.profiler._finish(self, duration)
+        return False
+
+    def add(self, name, value=1):
+        """
+        Add value to counter name of this span (and to the profiler's total of that counter).
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.spans = []  # finished spans: (name, start, duration, depth, thread id, labels, counters, peak RSS)
+        self.counters = {}  # counter name -> total over all spans
+        self.origin = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.reset()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def span(self, name, **labels):
+        """
+        :param name: [string] Stage name (spans of the same name are summed in the summary).
+        :param labels: Values only recorded in the trace (e.g. format='csv').
+        :return: Context manager timing its block, whose add(counter, value) counts things done in it.
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name, labels)
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _finish(self, span, duration):
+        rss = peak_rss()
+        with self._lock:
+            self.spans.append((span.name, span.start - self.origin, duration, span.depth, threading.get_ident(),
+                               span.labels, span.counters, rss))
+            for name, value in span.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def stages(self):
+        """
+        :return: [dict] span name -> {'calls', 'seconds', 'max', 'depth', 'counters'}, in order of first start.
+        """
+        stages = {}
+        for name, start, duration, depth, _, _, counters, _ in sorted(self.spans, key=lambda span: span[1]):
+            stage = stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'max': 0.0, 'depth': depth,
+                                             'counters': {}})
+            stage['calls'] += 1
+            stage['seconds'] += duration
+            stage['max'] = max(stage['max'], duration)
+            for key, value in counters.items():
+                stage['counters'][key] = stage['counters'].get(key, 0) + value
+        return stages
+
+    def summary(self):
+        """
+        :return: [string] Table of time and counters per stage, with wall time and peak RSS.
+        """
+        wall = time.perf_counter() - self.origin
+        rss, children_rss = peak_rss(), peak_rss(children=True)
+        header = f'Profile (wall {wall:.3f}s'
+        if rss is not None:
+            header += f', peak RSS {rss / 1024 ** 2:.1f} MB'
+            if children_rss:
+                header += f', child processes {children_rss / 1024 ** 2:.1f} MB'
+        lines = [header + '):', f'\t{"stage":<24}{"calls":>7}{"total s":>10}{"mean ms":>10}{"max ms":>10}  counters']
+        for name, stage in self.stages().items():
+            counters = []
+            for key, value in stage['counters'].items():
+                text = f'{key}={value:,.0f}' if float(value).is_integer() else f'{key}={value:,.3f}'
+                if key in RATE_COUNTERS and stage['seconds'] > 0:
+                    text += f' ({value / stage["seconds"]:,.0f}/s)'
+                elif stage['calls'] > 1:
+                    text += f' ({value / stage["calls"]:,.1f}/call)'
+                counters.append(text)
+            label = '  ' * stage['depth'] + name
+            lines.append(f'\t{label:<24}{stage["calls"]:>7}{stage["seconds"]:>10.3f}'
+                         f'{stage["seconds"] / stage["calls"] * 1000:>10.1f}{stage["max"] * 1000:>10.1f}  '
+                         f'{", ".join(counters)}')
+        return '\n'.join(lines)
+
+    def trace(self):
+        """
+        :return: [dict] Spans as complete ('X') events of the Chrome trace event format, totals under 'otherData'.
+        """
+        pid = os.getpid()
+        events = [{'name': name, 'cat': 'stage', 'ph': 'X', 'ts': start * 1e6, 'dur': duration * 1e6, 'pid': pid,
+                   'tid': tid, 'args': {**labels, **counters, 'peak_rss': rss}}
+                  for name, start, duration, _, tid, labels, counters, rss in self.spans]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms',
+                'otherData': {'wall': time.perf_counter() - self.origin, 'peak_rss': peak_rss(),
+                              'peak_rss_children': peak_rss(children=True), 'counters': self.counters,
+                              'stages': self.stages()}}
+
+    def write_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.trace(), f, indent=1)
+
+
+PROFILER = Profiler()  # process wide profiler used by all tools
+span = PROFILER.span
+
+
+@contextmanager
+def profiling(trace=None):
+    """
+    Profile a block: prints the summary (to stderr, so stdout stays machine readable) and writes the JSON trace
+    when it ends (even on Ctrl-C or an error).
+    :param trace: [string] JSON trace file. If None, nothing is profiled (block runs unchanged).
+    """
+    if trace is None:
+        yield PROFILER
+        return
+    PROFILER.enable()
+    try:
+        yield PROFILER
+    finally:
+        PROFILER.disable()
+        print(PROFILER.summary(), file=sys.stderr)
+        PROFILER.write_trace(trace)
+        print(f'Wrote profile trace to {trace}', file=sys.stderr)
+
+
+def add_profile_argument(parser):
+    """
+    Add the -profile [TRACE] argument of every tool to an ArgumentParser.
+    """
+    parser.add_argument('-profile', '--profile', nargs='?', const=PROFILE_TRACE, default=None, metavar='TRACE',
+                        help=f"If provided, times every stage (parse, aggregate, export, draw...), prints a summary "
+                             f"table and writes a JSON trace to TRACE (default: {PROFILE_TRACE}).")
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Racing line optimizer: minimum-curvature line within the track width plus a speed profile for it.
+The centerline is first resampled at a uniform spacing (waypoints can be millimeters or most of a meter apart), then
+every point is shifted along the centerline normal by an offset. Offsets minimize the sum of squared (discrete)
+curvature, a box-constrained quadratic program solved with an active set over dense NumPy linear algebra.
+Speeds are capped by lateral acceleration in curves, then limited by acceleration (forward pass) and braking
+(backward pass) around the closed lap, both sharing the grip left over by cornering (friction circle).
+"""
+from collections import namedtuple
+import numpy as np
+
+STEP = 0.1  # meters between racing line points
+MARGIN = 0.15  # meters kept between car center and track edge (about half a car width)
+MAX_SPEED = 4.0  # m/s, fastest speed of the action space (see log_plotter.SPEED1)
+MIN_SPEED = 1.0  # m/s, profile never asks for less
+MAX_LATERAL_ACCEL = 3.0  # m/s^2
+MAX_ACCEL = 2.0  # m/s^2
+MAX_BRAKE = 3.0  # m/s^2
+
+# x/y: racing line points, progress: centerline arc length (meters from waypoints[0]) each point was shifted from
+# offset: signed shift from centerline (> 0 left of driving direction), curvature: signed 1/radius (> 0 turning left)
+# speed: target speed at each point (m/s), distance: length of line from each point to the next one
+# lap_time: time to drive the whole line at those speeds
+RacingLine = namedtuple('RacingLine', 'x, y, progress, offset, curvature, speed, distance, lap_time')
+
+
+def resample(waypoints, step=STEP):
+    """
+    :param waypoints: [ndarray] (n, 2) centerline waypoints of a closed lap.
+    :param step: [float] Wanted spacing (meters), rounded so the lap is a whole number of steps.
+    :return: [tuple] ((m, 2) evenly spaced centerline points, centerline arc length of each point).
+    """
+    closed = np.vstack((waypoints, waypoints[:1]))
+    arc = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(closed, axis=0).T))))
+    progress = np.linspace(0.0, arc[-1], max(3, round(arc[-1] / step)), endpoint=False)
+    return np.column_stack((np.interp(progress, arc, closed[:, 0]), np.interp(progress, arc, closed[:, 1]))), progress
+
+
+def _normals(points):
+    """
+    :return: [ndarray] (n, 2) unit left normal of a closed line at each point (from its two neighbours).
+    """
+    tangent = np.roll(points, -1, axis=0) - np.roll(points, 1, axis=0)
+    tangent /= np.hypot(tangent[:, 0], tangent[:, 1])[:, None]
+    return np.column_stack((-tangent[:, 1], tangent[:, 0]))
+
+
+def curvature(xs, ys):
+    """
+    :return: [ndarray] Signed curvature of the circle through every point and its two neighbours (closed lap).
+    """
+    p = np.column_stack((xs, ys))
+    a, b = p - np.roll(p, 1, axis=0), np.roll(p, -1, axis=0) - p
+    c = a + b
+    cross = a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]
+    lengths = np.hypot(a[:, 0], a[:, 1]) * np.hypot(b[:, 0], b[:, 1]) * np.hypot(c[:, 0], c[:, 1])
+    return np.divide(2 * cross, lengths, out=np.zeros_like(cross), where=lengths > 0)
+
+
+def min_curvature_offsets(centerline, track_width, margin=MARGIN, max_iterations=None):
+    """
+    :param centerline: [ndarray] (n, 2) evenly spaced centerline points of a closed lap (see resample()).
+    :param track_width: [float] Track width (meters).
+    :param margin: [float] Distance kept from both edges (meters).
+    :param max_iterations: [int] Active set iterations (default: number of points).
+    :return: [ndarray] Offset of each point along its left normal (within +/- track_width / 2 - margin).
+    """
+    n = len(centerline)
+    normals = _normals(centerline)
+    # second difference of the closed polyline, scaled by 1 / ds^2 so each row approximates curvature
+    ds = np.mean(np.hypot(*(np.roll(centerline, -1, axis=0) - centerline).T))
+    d2 = (np.eye(n) * -2 + np.eye(n, k=1) + np.eye(n, k=-1) + np.eye(n, k=n - 1) + np.eye(n, k=1 - n)) / ds ** 2
+    # curvature of line c + diag(alpha) n is linear in alpha: A alpha + b, one block per coordinate
+    a = np.vstack((d2 * normals[:, 0], d2 * normals[:, 1]))
+    b = np.concatenate((d2 @ centerline[:, 0], d2 @ centerline[:, 1]))
+    hessian = a.T @ a + 1e-9 * np.eye(n)  # tiny ridge keeps it positive definite on straight tracks
+    gradient = a.T @ b
+    bound = max(0.0, track_width / 2 - margin)
+    alpha = np.zeros(n)
+    free = np.ones(n, dtype=bool)
+    for _ in range(max_iterations or n):
+        fixed = ~free
+        rhs = -(gradient[free] + hessian[np.ix_(free, fixed)] @ alpha[fixed])
+        alpha[free] = np.linalg.solve(hessian[np.ix_(free, free)], rhs)
+        outside = free & (np.abs(alpha) > bound)
+        if outside.any():
+            np.clip(alpha, -bound, bound, out=alpha)
+            free &= ~outside
+            continue
+        # release bounds that pull the wrong way (KKT multiplier has the wrong sign)
+        pull = hessian @ alpha + gradient
+        release = fixed & (((alpha >= bound) & (pull > 0)) | ((alpha <= -bound) & (pull < 0)))
+        if not release.any():
+            break
+        free |= release
+    return alpha
+
+
+def speed_profile(xs, ys, max_speed=MAX_SPEED, min_speed=MIN_SPEED, max_lateral_accel=MAX_LATERAL_ACCEL,
+                  max_accel=MAX_ACCEL, max_brake=MAX_BRAKE):
+    """
+    :param xs: [ndarray] X coordinates of a closed line.
+    :param ys: [ndarray] Y coordinates of a closed line.
+    :return: [tuple] (speed at each point, distance from each point to the next one).
+    """
+    kappa = np.abs(curvature(xs, ys))
+    distance = np.hypot(np.roll(xs, -1) - xs, np.roll(ys, -1) - ys)
+    limit = np.minimum(max_speed, np.sqrt(max_lateral_accel / np.maximum(kappa, 1e-9)))
+    limit = np.maximum(limit, min_speed)
+
+    def longitudinal(speed, accel, idx):
+        # grip left by cornering at this speed (friction circle)
+        lateral = speed ** 2 * kappa[idx] / max_lateral_accel
+        return accel * np.sqrt(max(0.0, 1 - min(1.0, lateral) ** 2))
+
+    n = len(limit)
+    speed = limit.copy()
+    # start both passes at the slowest point, whose speed is set by its curve only; two laps settle the wrap around
+    start = int(np.argmin(limit))
+    for step in range(1, 2 * n):
+        prev, idx = (start + step - 1) % n, (start + step) % n
+        reachable = np.sqrt(speed[prev] ** 2 + 2 * longitudinal(speed[prev], max_accel, prev) * distance[prev])
+        speed[idx] = min(speed[idx], reachable)
+    for step in range(1, 2 * n):
+        nxt, idx = (start - step + 1) % n, (start - step) % n
+        reachable = np.sqrt(speed[nxt] ** 2 + 2 * longitudinal(speed[nxt], max_brake, nxt) * distance[idx])
+        speed[idx] = min(speed[idx], reachable)
+    return np.maximum(speed, min_speed), distance
+
+
+def racing_line(waypoints, track_width, margin=MARGIN, step=STEP, **limits):
+    """
+    :param waypoints: list[tuple] Centerline waypoints (x, y) of a closed lap in driving order.
+    :param track_width: [float] Track width (meters).
+    :param margin: [float] Distance kept from both edges (meters).
+    :param step: [float] Spacing of racing line points (meters).
+    :param limits: Speed and acceleration limits passed to speed_profile().
+    :return: [RacingLine]
+    """
+    centerline, progress = resample(np.asarray(waypoints, dtype=np.float64), step)
+    offset = min_curvature_offsets(centerline, track_width, margin)
+    line = centerline + offset[:, None] * _normals(centerline)
+    xs, ys = line[:, 0].copy(), line[:, 1].copy()
+    speed, distance = speed_profile(xs, ys, **limits)
+    lap_time = float(np.sum(2 * distance / (speed + np.roll(speed, -1))))
+    return RacingLine(xs, ys, progress, offset, curvature(xs, ys), speed, distance, lap_time)
+
+
+def waypoint_points(line, waypoints):
+    """
+    :param line: [RacingLine] Racing line of the track of waypoints.
+    :param waypoints: list[tuple] Centerline waypoints (x, y) the line was made from.
+    :return: [ndarray] Index of the racing line point shifted from (nearest to) each waypoint, e.g.
+             line.speed[waypoint_points(line, waypoints)] is the target speed at every waypoint.
+    """
+    wp = np.asarray(waypoints, dtype=np.float64)
+    arc = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(wp, axis=0).T))))
+    step = line.progress[1] - line.progress[0]
+    return np.rint(arc / step).astype(np.int64) % len(line.x)
+
+
+def for_track(track, **kwargs):
+    """
+    :param track: [string] Track name (e.g. 'reinvent2018', see data.registry).
+    :return: [RacingLine] Racing line of that track (see racing_line()).
+    """
+    from data.registry import load_track  # registry builds bundles with curvature() of this module
+    bundle = load_track(track)
+    return racing_line(bundle.xy, bundle.track_width, **kwargs)
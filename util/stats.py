@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Constant-memory running statistics.
+Values are folded in one at a time (and accumulators of separately parsed parts can be merged), so summaries of
+arbitrarily large logs never need the values themselves.
+"""
+import math
+
+
+class RunningStats:
+    """
+    Count, mean and variance (Welford) plus min/max with a tag (e.g. episode) of where they were seen first.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0  # sum of squared differences from mean
+        self.min = self.max = None
+        self.min_tag = self.max_tag = None
+
+    def add(self, value, tag=None):
+        """
+        :param value: [float] Next value.
+        :param tag: Anything identifying value (kept for min and max).
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min, self.min_tag = value, tag
+        if self.max is None or value > self.max:
+            self.max, self.max_tag = value, tag
+
+    def merge(self, other):
+        """
+        Fold in stats of values seen after all values of self (ties of min/max keep the tag of self).
+        :param other: [RunningStats]
+        """
+        if not other.count:
+            return
+        if not self.count:
+            self.__dict__.update(other.__dict__)
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        if other.min < self.min:
+            self.min, self.min_tag = other.min, other.min_tag
+        if other.max > self.max:
+            self.max, self.max_tag = other.max, other.max_tag
+
+    @property
+    def std(self):
+        """
+        Population standard deviation (same as np.std).
+        """
+        return math.sqrt(self._m2 / self.count) if self.count else 0.0
+
+    def as_dict(self):
+        """
+        :return: [dict] count, mean, std, min and max (None if no value was added).
+        """
+        if not self.count:
+            return {'count': 0, 'mean': None, 'std': None, 'min': None, 'max': None}
+        return {'count': self.count, 'mean': self.mean, 'std': self.std, 'min': self.min, 'max': self.max}
+
+
+class QuantileSketch:
+    """
+    Log-bucket quantile sketch of non-negative values: values are counted in buckets whose bounds grow
+    geometrically, so any quantile is returned within relative_accuracy of the exact one and memory only grows
+    with log(max / min), not with the number of values.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}  # bucket key -> count. Bucket k holds values in (gamma^(k-1), gamma^k]
+        self.zeros = 0  # values too small for a bucket
+        self.count = 0
+
+    def add(self, value):
+        """
+        :param value: [float] Next value (>= 0).
+        """
+        self.count += 1
+        if value <= 1e-9:
+            self.zeros += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def merge(self, other):
+        """
+        :param other: [QuantileSketch] Sketch with the same relative_accuracy.
+        """
+        self.count += other.count
+        self.zeros += other.zeros
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def quantile(self, q):
+        """
+        :param q: [float] Quantile in [0, 1] (e.g. 0.5 for median).
+        :return: [float] Approximate quantile, None if no value was added.
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class LogSummary:
+    """
+    Everything the parser report needs, folded one episode at a time.
+    """
+
+    def __init__(self):
+        self.lap_times = RunningStats()  # tagged with (episode, steps)
+        self.steps = RunningStats()  # tagged with (episode, lap time)
+        self.lap_time_quantiles = QuantileSketch()
+        self.steps_quantiles = QuantileSketch()
+        self.offtrack_steps = RunningStats()  # tagged with episode
+
+    @property
+    def num_laps(self):
+        return self.lap_times.count
+
+    @property
+    def num_offtracks(self):
+        return self.offtrack_steps.count
+
+    def add_lap(self, episode, lap_time, steps):
+        """
+        :param episode: [int] Episode number of "lap_complete" episode.
+        :param lap_time: [float] Time from first to last row of episode (seconds).
+        :param steps: [int] Step of last row of episode.
+        """
+        self.lap_times.add(lap_time, (episode, steps))
+        self.steps.add(steps, (episode, lap_time))
+        self.lap_time_quantiles.add(lap_time)
+        self.steps_quantiles.add(steps)
+
+    def add_offtrack(self, episode, steps):
+        """
+        :param episode: [int] Episode number of "off_track" episode.
+        :param steps: [int] Step the car went off track at.
+        """
+        self.offtrack_steps.add(steps, episode)
+
+    def merge(self, other):
+        """
+        :param other: [LogSummary] Summary of episodes that came after all episodes of self.
+        """
+        for name, value in vars(self).items():
+            value.merge(getattr(other, name))
+
+    def as_dict(self):
+        """
+        :return: [dict] JSON serializable summary (same numbers as the parser report, median/p90 approximate).
+        """
+        lap_times, steps = self.lap_times.as_dict(), self.steps.as_dict()
+        for stats, tagged, quantiles in ((lap_times, self.lap_times, self.lap_time_quantiles),
+                                         (steps, self.steps, self.steps_quantiles)):
+            stats.update(median=quantiles.quantile(0.5), p90=quantiles.quantile(0.9),
+                         min_episode=tagged.min_tag and tagged.min_tag[0],
+                         max_episode=tagged.max_tag and tagged.max_tag[0])
+        return {'episodes': self.num_laps + self.num_offtracks, 'lap_complete': self.num_laps,
+                'off_track': self.num_offtracks, 'lap_time': lap_times, 'steps': steps,
+                'offtrack_steps': self.offtrack_steps.as_dict()}
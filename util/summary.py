@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Lightweight log summary: episodes are folded straight from the byte scanner into a LogSummary.
+Only the episode, step and time fields of the first and last row of every episode are read (plain int/float
+conversion), so this path needs neither numpy nor pandas and a stats run starts about as fast as the interpreter.
+"""
+from util.logreader import CHUNK_SIZE, EpisodeScanner, iter_episodes, parse_parallel
+from util.stats import LogSummary
+
+
+def episode_step(row):
+    """
+    :param row: [bytes] Raw SIM_TRACE_LOG payload.
+    :return: [tuple] (episode, step) of row (both are integer fields, read without decoding the whole row).
+    """
+    episode, step, _ = row.split(b',', 2)
+    return int(episode), int(step)
+
+
+def offtrack(episode):
+    """
+    :param episode: [Episode] Closed "off_track" episode.
+    :return: [tuple] (episode number, step the car went off track at).
+    """
+    return episode_step(episode.rows[0])[0], episode_step(episode.rows[-1])[1]
+
+
+def lap(episode):
+    """
+    :param episode: [Episode] Closed "lap_complete" episode.
+    :return: [tuple] (episode number, lap time, steps) from its first and last rows.
+    """
+    first, last = episode.rows[0].split(b','), episode.rows[-1].split(b',')
+    return int(first[0]), float(last[14]) - float(first[14]), int(last[1])  # time is the 15th field
+
+
+def summarize_episodes(episodes, summary):
+    """
+    Fold closed episodes into a summary without keeping them, so memory doesn't grow with the log.
+    :param episodes: iterable[Episode] Closed episodes (see util.logreader).
+    :param summary: [LogSummary] Summary updated in place.
+    """
+    for episode in episodes:
+        if episode.status == 'off_track':
+            summary.add_offtrack(*offtrack(episode))
+        else:
+            summary.add_lap(*lap(episode))
+
+
+def summarize_range(logfile, start=0, stop=None, chunk_size=CHUNK_SIZE, carry=None):
+    """
+    Fold one byte range of a log into a summary. Module level so it can run in a worker process.
+    :param carry: list[bytes] Rows of an episode left open by the previous range. None if no episode is open.
+    :return: [tuple] (LogSummary, carry) where carry is the rows of the episode still open at end of range.
+    """
+    scanner = EpisodeScanner()
+    if carry is not None:
+        scanner.in_episode, scanner.rows = True, carry
+    summary = LogSummary()
+    summarize_episodes(iter_episodes(logfile, start, stop, chunk_size, scanner), summary)
+    return summary, scanner.rows if scanner.in_episode else None
+
+
+def summarize_log(logfile, workers=1, chunk_size=CHUNK_SIZE):
+    """
+    :param logfile: [string] AWS Log file containing 'SIM_TRACE_LOG' and 'Reset'.
+    :param workers: [int] Number of processes (log is split at episode boundaries, result is identical).
+    :param chunk_size: [int] Number of bytes read from log per scan step.
+    :return: [LogSummary] Summary of whole log.
+    """
+    summary = LogSummary()
+    results = parse_parallel(logfile, summarize_range, workers, chunk_size=chunk_size) if workers > 1 else [
+        summarize_range(logfile, chunk_size=chunk_size)]
+    for part, _ in results:
+        summary.merge(part)
+    return summary
+
+
+def format_summary(summary, detailed=False):
+    """
+    :param summary: [LogSummary]
+    :param detailed: [bool] If True, median/90th percentile and "off_track" steps lines are added (stats runs:
+                     "cli.py stats" and -stats_only). If False, the report is the parser's original one, line for line.
+    :return: [string] Report printed by the parser.
+    """
+    out = f'\nAnalyzing {summary.num_laps + summary.num_offtracks} episodes...\n'
+    out += f'\tNumber of "lap_complete" episodes = {summary.num_laps}\n'
+    out += f'\tNumber of "off_track" episodes = {summary.num_offtracks} ... ignoring for analysis\n'
+    if summary.num_laps:
+        times, steps = summary.lap_times, summary.steps
+        time_pct, step_pct = summary.lap_time_quantiles.quantile, summary.steps_quantiles.quantile
+        out += f'\tAverage Lap Time = {times.mean:.2f}s (StdDev: {times.std:.4f})\n'
+        if detailed:
+            out += f'\tMedian Lap Time ~ {time_pct(0.5):.2f}s (90th Percentile: {time_pct(0.9):.2f}s)\n'
+        out += f'\tMin Lap Time(Steps) = {times.min:.2f}s({times.min_tag[1]})\n'
+        out += f'\tMax Lap Time(Steps)= {times.max:.2f}s({times.max_tag[1]})\n'
+        out += f'\tAverage # Steps = {steps.mean:.1f} (StdDev: {steps.std:.4f})\n'
+        if detailed:
+            out += f'\tMedian # Steps ~ {step_pct(0.5):.0f} (90th Percentile: {step_pct(0.9):.0f})\n'
+        out += f'\tMin Steps(Lap Time) = {steps.min}({steps.min_tag[1]:.2f}s)\n'
+        out += f'\tMax Steps(Lap Time) = {steps.max}({steps.max_tag[1]:.2f}s)\n'
+    else:
+        out += 'NO DATA COLLECTED !!!!\n'
+    if detailed and summary.num_offtracks:
+        offtrack_steps = summary.offtrack_steps
+        out += f'\tAverage # Steps before "off_track" = {offtrack_steps.mean:.1f} ' \
+               f'(Min: {offtrack_steps.min}, Max: {offtrack_steps.max})\n'
+    return out
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic SIM logs, so parsing and plotting can be measured (see benchmark.py) without a real log.
+A simulated car drives the optimized racing line (util.raceline) of a track at a random pace, wobbling around it.
+Episodes start at a random point of the lap, like training episodes do, and end with "lap_complete" or "off_track"
+(car drifts off the track). Rows are written like the simulator writes them: "Reset agent" then one SIM_TRACE_LOG
+row per step, with noise lines (other simulator output) in between. Same arguments and seed give the same bytes.
+Examples:
+    python -m util.synthetic synthetic-sim.log -steps 1000000
+    python -m util.synthetic synthetic-sim.log -episodes 500 -offtrack_ratio 0.2 -track reinvent2019
+"""
+import math
+import time
+from argparse import ArgumentParser, RawTextHelpFormatter
+import numpy as np
+
+from data.registry import DEFAULT_TRACK, TRACKS, load_track
+from util.raceline import racing_line
+
+STEP_RATE = 15.0  # SIM_TRACE_LOG rows per simulated second
+OFFTRACK_RATIO = 0.4  # fraction of episodes ending "off_track"
+NOISE_RATIO = 0.02  # noise lines per SIM_TRACE_LOG row
+DEFAULT_EPISODES = 100
+START_TIME = 1590332225.0  # time of first step (seconds since epoch)
+RESET_TIME = 0.5  # simulated seconds between the end of an episode and the first step of the next one
+PACE = (0.7, 1.0)  # range of the fraction of the racing line target speeds driven in an episode
+WOBBLE = 0.02  # meters, standard deviation of the per step change of the lateral offset from the racing line
+OFFTRACK_STEPS = 15  # steps the car takes to drift off the track at the end of an "off_track" episode
+CAR_HALF_WIDTH = 0.1  # meters, all wheels are on the track while the car center is this far inside the edge
+WHEELBASE = 0.165  # meters, turns curvature of the line into a steering angle
+STEERING = (-30.0, -20.0, -10.0, 0.0, 10.0, 20.0, 30.0)  # action space steering angles (degrees)
+SPEEDS = (1.33, 1.5, 3.0, 3.5, 4.0)  # action space speeds (m/s), same as log_plotter.SPEED1..SPEED5
+PREFIX = 'sim-synthetic/SimulationApplicationLogs '  # stream name CloudWatch exports put in front of every line
+NOISE = ('[INFO] Training> Name=main_level/agent, Worker=0, Episode={episode}, Total reward=0, Steps=0',
+         'INFO - Pausing physics',
+         'INFO - Unpausing physics',
+         'WARNING - Camera sensor queue full, dropping frame',
+         'INFO - Spawning model racecar at the start position',
+         'Checkpoint> Saving in path=[\'./checkpoint/agent/{episode}_Step-0.ckpt\']')
+ROW = 'SIM_TRACE_LOG:{episode},%d,%.4f,%.4f,%.4f,%.2f,%.2f,%d,%.4f,%s,%s,%.4f,%d,{track_length:.2f},%.7f,%s\n'
+
+
+def _nearest(values, choices):
+    """
+    :return: [ndarray] Index in (sorted) choices of the choice nearest to each value.
+    """
+    choices = np.asarray(choices)
+    idx = np.clip(np.searchsorted(choices, values), 1, len(choices) - 1)
+    return idx - (values - choices[idx - 1] < choices[idx] - values)
+
+
+class SyntheticLog:
+    def __init__(self, track=DEFAULT_TRACK, offtrack_ratio=OFFTRACK_RATIO, step_rate=STEP_RATE,
+                 noise_ratio=NOISE_RATIO, seed=0):
+        """
+        :param track: [string] Track driven (see data.registry.TRACKS).
+        :param offtrack_ratio: [float] Fraction of episodes ending "off_track" (the others are "lap_complete").
+        :param step_rate: [float] SIM_TRACE_LOG rows per simulated second.
+        :param noise_ratio: [float] Noise lines (not SIM_TRACE_LOG nor "Reset agent") per SIM_TRACE_LOG row.
+        :param seed: [int] Random seed: same seed and arguments give the same log.
+        """
+        self.track = load_track(track)
+        self.offtrack_ratio = offtrack_ratio
+        self.step_rate = step_rate
+        self.noise_ratio = noise_ratio
+        self.rng = np.random.default_rng(seed)
+        self.line = racing_line(self.track.xy, self.track.track_width)
+        line = self.line
+        # time to drive each segment of the line at its target speeds
+        self.segment_time = 2 * line.distance / (line.speed + np.roll(line.speed, -1))
+        tangent = np.roll(np.column_stack((line.x, line.y)), -1, axis=0) - np.column_stack((line.x, line.y))
+        tangent /= np.hypot(tangent[:, 0], tangent[:, 1])[:, None]
+        self.normals = np.column_stack((-tangent[:, 1], tangent[:, 0]))
+        self.centerline_length = self.track.length
+        self.wp_arc = self.track.arc_length
+        self.half_width = self.track.track_width / 2
+
+    def episode(self, number, start_time):
+        """
+        Drive one episode.
+        :param number: [int] Episode number.
+        :param start_time: [float] Time of the first step.
+        :return: [tuple] (list[string] lines from "Reset agent" on, number of steps, time of the last step).
+        """
+        rng, line = self.rng, self.line
+        n = len(line.x)
+        start = int(rng.integers(n))
+        pace = rng.uniform(*PACE)
+        offtrack = rng.random() < self.offtrack_ratio
+        # line rolled to start at the start point, closing point included
+        idx = (start + np.arange(n + 1)) % n
+        distance = np.concatenate(([0.0], np.cumsum(np.roll(line.distance, -start))))
+        times = np.concatenate(([0.0], np.cumsum(np.roll(self.segment_time, -start)))) / pace
+        lap = distance[-1]
+        end = lap * rng.uniform(0.05, 0.9) if offtrack else lap
+        steps = max(2, math.ceil(np.interp(end, distance, times) * self.step_rate))
+        t = np.arange(1, steps + 1) / self.step_rate
+        s = np.minimum(np.interp(t, times, distance), end)
+
+        # lateral offset from the racing line: random walk kept inside the track, drifting off it at the end
+        bound = self.half_width - CAR_HALF_WIDTH
+        line_offset = np.interp(s, distance, line.offset[idx])
+        wobble = np.clip(np.cumsum(rng.normal(0.0, WOBBLE, steps)), -bound - line_offset, bound - line_offset)
+        offset = line_offset + wobble
+        if offtrack:
+            drift = min(OFFTRACK_STEPS, steps)
+            side = 1.0 if offset[-drift] >= 0 else -1.0
+            offset[-drift:] += np.linspace(0.0, side * (self.half_width + CAR_HALF_WIDTH) - offset[-drift], drift)
+            wobble = offset - line_offset
+        normal = self.normals[idx]
+        # car position: point of the racing line shifted along its normal by the wobble
+        x = np.interp(s, distance, line.x[idx]) + wobble * np.interp(s, distance, normal[:, 0])
+        y = np.interp(s, distance, line.y[idx]) + wobble * np.interp(s, distance, normal[:, 1])
+        x0, y0 = line.x[start], line.y[start]
+        heading = np.degrees(np.arctan2(np.diff(y, prepend=y0), np.diff(x, prepend=x0)))
+        heading += rng.normal(0.0, 1.0, steps)
+        heading = (heading + 180.0) % 360.0 - 180.0
+
+        kappa = np.interp(s, distance, line.curvature[idx])
+        steering = _nearest(np.degrees(np.arctan(WHEELBASE * kappa)) + rng.normal(0.0, 5.0, steps), STEERING)
+        speed = _nearest(np.interp(s, distance, line.speed[idx]), SPEEDS)  # action asks for the target speed
+        action = steering * len(SPEEDS) + speed
+        on_track = np.abs(offset) <= bound
+        reward = 100 * np.maximum(1e-3, 1 - (offset / self.half_width) ** 2) * np.take(SPEEDS, speed) / SPEEDS[-1]
+
+        # progress along the centerline from the start point, closest waypoint from its absolute position
+        length = self.centerline_length
+        centerline = (line.progress[idx] - line.progress[start]) % length
+        centerline[-1] = length
+        along = np.interp(s, distance, centerline)
+        progress = along / length * 100
+        wp_count = len(self.wp_arc) - 1
+        closest = np.rint(np.interp((line.progress[start] + along) % length, self.wp_arc,
+                                    np.arange(wp_count + 1))).astype(np.int64) % wp_count
+        done = np.zeros(steps, dtype=bool)
+        done[-1] = True
+        status = ['in_progress'] * (steps - 1) + ['off_track' if offtrack else 'lap_complete']
+        if not offtrack:
+            progress[-1] = 100.0
+
+        row = PREFIX + ROW.format(episode=number, track_length=self.track.length)
+        bools = np.array(['False', 'True'])
+        rows = [row % values for values in zip(
+            range(1, steps + 1), x.tolist(), y.tolist(), heading.tolist(), np.take(STEERING, steering).tolist(),
+            np.take(SPEEDS, speed).tolist(), action.tolist(), reward.tolist(), bools[done.view(np.int8)].tolist(),
+            bools[on_track.view(np.int8)].tolist(), progress.tolist(), closest.tolist(),
+            (start_time + t - t[0]).tolist(), status)]
+        for pos in np.sort(rng.integers(0, steps + 1, rng.binomial(steps, self.noise_ratio)))[::-1].tolist():
+            noise = NOISE[rng.integers(len(NOISE))].format(episode=number)
+            rows.insert(pos, f'{PREFIX}{noise}\n')
+        return [f'{PREFIX}Reset agent\n'] + rows, steps, start_time + t[-1] - t[0]
+
+    def write(self, path, episodes=None, steps=None):
+        """
+        Write episodes to a log until episodes or steps are reached (whichever comes first).
+        :param path: [string] Output log file (overwritten).
+        :param episodes: [int] Number of episodes (default: DEFAULT_EPISODES if steps is None too).
+        :param steps: [int] Minimum number of SIM_TRACE_LOG rows: whole episodes are written until it's reached.
+        :return: [tuple] (number of episodes, number of steps) written.
+        """
+        if episodes is None and steps is None:
+            episodes = DEFAULT_EPISODES
+        total, number, now = 0, 0, START_TIME
+        with open(path, 'w', newline='\n') as out:
+            while (episodes is None or number < episodes) and (steps is None or total < steps):
+                lines, count, last = self.episode(number, now)
+                out.write(''.join(lines))
+                total += count
+                number += 1
+                now = last + RESET_TIME
+        return number, total
+
+
+def generate_log(path, track=DEFAULT_TRACK, episodes=None, steps=None, offtrack_ratio=OFFTRACK_RATIO,
+                 step_rate=STEP_RATE, noise_ratio=NOISE_RATIO, seed=0):
+    """
+    Write a synthetic log (see SyntheticLog).
+    :return: [tuple] (number of episodes, number of steps) written.
+    """
+    log = SyntheticLog(track, offtrack_ratio=offtrack_ratio, step_rate=step_rate, noise_ratio=noise_ratio, seed=seed)
+    return log.write(path, episodes=episodes, steps=steps)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description=__doc__, formatter_class=RawTextHelpFormatter)
+    parser.add_argument('log', help="Output log file (overwritten).")
+    parser.add_argument('-track', choices=TRACKS, default=DEFAULT_TRACK,
+                        help="Track driven (default: %(default)s).")
+    parser.add_argument('-episodes', type=int, default=None,
+                        help=f"Number of episodes (default: {DEFAULT_EPISODES} unless -steps is given).")
+    parser.add_argument('-steps', type=int, default=None,
+                        help="Minimum number of SIM_TRACE_LOG rows (whole episodes are written until reached).")
+    parser.add_argument('-offtrack_ratio', type=float, default=OFFTRACK_RATIO,
+                        help="Fraction of episodes ending 'off_track' (default: %(default)s).")
+    parser.add_argument('-step_rate', type=float, default=STEP_RATE,
+                        help="SIM_TRACE_LOG rows per simulated second (default: %(default)s).")
+    parser.add_argument('-noise_ratio', type=float, default=NOISE_RATIO,
+                        help="Noise lines per SIM_TRACE_LOG row (default: %(default)s).")
+    parser.add_argument('-seed', type=int, default=0, help="Random seed (default: %(default)s).")
+    args = parser.parse_args()
+    begin = time.perf_counter()
+    written = generate_log(args.log, args.track, args.episodes, args.steps, args.offtrack_ratio, args.step_rate,
+                           args.noise_ratio, args.seed)
+    print(f'Wrote {written[0]} episodes ({written[1]} steps) to {args.log} in {time.perf_counter() - begin:.2f}s')
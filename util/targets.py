@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Automatic search for targets_refs (angle type and number of points of every waypoint, see targets_creator.py).
+Target points of every candidate of every waypoint are generated at once with NumPy (same math as
+TargetCreator._generate_targets), scored by how well they agree with the headings actually driven in the fastest
+laps of a log (in a process pool), and the best sequence is picked with a Viterbi pass that also penalizes jumps of
+the target direction between consecutive waypoints.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+ANGLE_TYPES = ('end', 'avg', 'wtd_avg')
+NUM_POINTS = range(4, 21)  # weighted average needs at least 2 angles, so at least 4 points
+SMOOTHNESS = 0.5  # cost (degrees of heading disagreement) of every degree the target direction jumps
+
+
+def candidate_targets(waypoints, num_points=NUM_POINTS):
+    """
+    :param waypoints: list[tuple] Centerline waypoints (x, y).
+    :param num_points: [range] Candidate numbers of points.
+    :return: [ndarray] (len(waypoints), len(ANGLE_TYPES), len(num_points), 2) target point of every candidate,
+             using the waypoint before each waypoint as car position.
+    """
+    wp = np.asarray(waypoints, dtype=np.float64)
+    n, sizes = len(wp), np.asarray(num_points)
+    car = np.roll(wp, 1, axis=0)
+    ahead = wp[(np.arange(n)[:, None] + np.arange(sizes.max())) % n]  # (n, max points, 2)
+    # angles (0..360) from car to every point ahead but the first 2, as averaged by TargetCreator
+    angles = np.degrees(np.arctan2(ahead[:, 2:, 1] - car[:, None, 1], ahead[:, 2:, 0] - car[:, None, 0])) % 360.0
+    counts = sizes - 2
+    avg = np.cumsum(angles, axis=1)[:, counts - 1] / counts
+    powers = np.arange(angles.shape[1], dtype=np.float64) ** 2  # weighted_avg(): weight of n-th angle is n ** 2
+    wtd_avg = np.cumsum(angles * powers, axis=1)[:, counts - 1] / np.cumsum(powers)[counts - 1]
+    end = ahead[:, sizes - 1]  # (n, sizes, 2)
+    length = np.hypot(end[..., 0] - car[:, None, 0], end[..., 1] - car[:, None, 1])
+    targets = np.empty((n, len(ANGLE_TYPES), len(sizes), 2))
+    targets[:, 0] = end
+    for type_idx, heading in ((1, avg), (2, wtd_avg)):
+        targets[:, type_idx, :, 0] = car[:, None, 0] + length * np.cos(np.radians(heading))
+        targets[:, type_idx, :, 1] = car[:, None, 1] + length * np.sin(np.radians(heading))
+    return targets
+
+
+def _heading_diff(a, b):
+    return np.abs((a - b + 180) % 360 - 180)
+
+
+def agreement_costs(targets, rows):
+    """
+    :param targets: [ndarray] (num waypoints, num candidates, 2) candidate target points of some waypoints.
+    :param rows: [tuple] (waypoint, x, y, heading) arrays of logged steps, waypoint relative to targets.
+    :return: [ndarray] (num waypoints, num candidates) mean absolute difference (degrees) between heading driven and
+             heading to each candidate target of the closest waypoint of every step (0 for waypoints never seen).
+    """
+    waypoint, x, y, heading = rows
+    target = targets[waypoint]  # (rows, candidates, 2)
+    best_heading = np.degrees(np.arctan2(target[..., 1] - y[:, None], target[..., 0] - x[:, None]))
+    diff = _heading_diff(best_heading, heading[:, None])
+    costs = np.zeros(targets.shape[:2])
+    np.add.at(costs, waypoint, diff)
+    counts = np.bincount(waypoint, minlength=len(targets))
+    return costs / np.maximum(counts, 1)[:, None]
+
+
+def _agreement_chunk(args):
+    targets, rows, start = args
+    waypoint, x, y, heading = rows
+    return start, agreement_costs(targets, (waypoint - start, x, y, heading))
+
+
+class TargetSearch:
+    def __init__(self, waypoints, num_points=NUM_POINTS, smoothness=SMOOTHNESS):
+        """
+        :param waypoints: list[tuple] Centerline waypoints (x, y).
+        :param num_points: [range] Candidate numbers of points of each waypoint.
+        :param smoothness: [float] Weight of the target direction jumps between consecutive waypoints.
+        """
+        self.waypoints = np.asarray(waypoints, dtype=np.float64)
+        self.num_points = num_points
+        self.smoothness = smoothness
+        targets = candidate_targets(self.waypoints, num_points)
+        self.candidates = [(angle_type, int(size)) for angle_type in ANGLE_TYPES for size in num_points]
+        self.targets = targets.reshape(len(self.waypoints), len(self.candidates), 2)
+        car = np.roll(self.waypoints, 1, axis=0)
+        track_heading = np.degrees(np.arctan2(self.waypoints[:, 1] - car[:, 1], self.waypoints[:, 0] - car[:, 0]))
+        # direction of target relative to the track at the simulated car, compared between consecutive waypoints
+        self.lead = np.degrees(np.arctan2(self.targets[..., 1] - car[:, None, 1],
+                                          self.targets[..., 0] - car[:, None, 0])) - track_heading[:, None]
+
+    def costs(self, rows, workers=1):
+        """
+        :param rows: [tuple] (closest waypoint, x, y, heading) arrays of logged steps.
+        :param workers: [int] Number of processes (waypoints are split in contiguous chunks).
+        :return: [ndarray] (num waypoints, num candidates) heading agreement cost.
+        """
+        waypoint, x, y, heading = (np.asarray(a) for a in rows)
+        order = np.argsort(waypoint, kind='stable')
+        waypoint, x, y, heading = waypoint[order], x[order], y[order], heading[order]
+        bounds = np.linspace(0, len(self.waypoints), max(1, workers) + 1).astype(int)
+        tasks = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            lo, hi = np.searchsorted(waypoint, [start, stop])
+            tasks.append((self.targets[start:stop], (waypoint[lo:hi], x[lo:hi], y[lo:hi], heading[lo:hi]), start))
+        costs = np.zeros(self.targets.shape[:2])
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_agreement_chunk, tasks))
+        else:
+            results = [_agreement_chunk(task) for task in tasks]
+        for start, chunk in results:
+            costs[start:start + len(chunk)] = chunk
+        return costs
+
+    def best(self, costs):
+        """
+        Viterbi pass over the waypoints (lap start to end): minimizes sum of costs plus smoothness times the jumps of
+        the target direction between consecutive waypoints.
+        :param costs: [ndarray] (num waypoints, num candidates) cost of every candidate.
+        :return: list[tuple] (angle_type, num_points) of every waypoint.
+        """
+        total = costs[0].copy()
+        back = np.zeros(costs.shape, dtype=np.int64)
+        for idx in range(1, len(costs)):
+            jump = self.smoothness * _heading_diff(self.lead[idx][None, :], self.lead[idx - 1][:, None])
+            step = total[:, None] + jump  # (previous candidate, candidate)
+            back[idx] = np.argmin(step, axis=0)
+            total = step[back[idx], np.arange(step.shape[1])] + costs[idx]
+        choice = [int(np.argmin(total))]
+        for idx in range(len(costs) - 1, 0, -1):
+            choice.append(int(back[idx, choice[-1]]))
+        return [self.candidates[c] for c in reversed(choice)]
+
+
+def merge_refs(refs):
+    """
+    :param refs: list[tuple] (angle_type, num_points) of every waypoint.
+    :return: [dict] range -> (angle_type, num_points) with consecutive equal waypoints merged into one range.
+    """
+    ranges, start = {}, 0
+    for idx in range(1, len(refs) + 1):
+        if idx == len(refs) or refs[idx] != refs[start]:
+            ranges[range(start, idx)] = refs[start]
+            start = idx
+    return ranges
+
+
+def format_targets_refs(refs):
+    """
+    :param refs: list[tuple] (angle_type, num_points) of every waypoint.
+    :return: [string] targets_refs source, written like the one in data/reinvent2018.py.
+    """
+    lines = [f'    range({r.start}, {r.stop - 1}+1): {ref!r}' for r, ref in merge_refs(refs).items()]
+    return 'targets_refs = RangeTable({\n' + ',\n'.join(lines) + '\n}, size=len(waypoints))'
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Derived per step telemetry (step time, ground speed, acceleration, heading and steering rates, path curvature).
+Every value is a difference between consecutive steps, computed for all episodes of the log at once over the
+concatenated columns. Differences are never taken across an episode boundary: values needing a step before the
+first step of an episode (or after its last one, for curvature) are NaN.
+"""
+import numpy as np
+import pandas as pd
+
+# column -> (unit, meaning)
+TELEMETRY = {
+    'dt': ('s', 'time since previous step'),
+    'ground_speed': ('m/s', 'distance driven since previous step / dt (the car\'s real speed, not the action\'s)'),
+    'accel': ('m/s^2', 'change of ground_speed since previous step / dt'),
+    'heading_unwrapped': ('deg', 'heading without the jumps at +/-180 (continuous over the episode)'),
+    'heading_rate': ('deg/s', 'change of heading since previous step / dt (yaw rate)'),
+    'steering_rate': ('deg/s', 'change of steering angle since previous step / dt'),
+    'curvature': ('1/m', 'signed curvature (> 0 turning left) of the circle through previous, this and next position'),
+}
+
+
+def episode_starts(episode, starts=()):
+    """
+    :param episode: [ndarray] Episode number of each row.
+    :param starts: list[int] Rows known to start an episode (e.g. SimLogParser.episode_bounds starts).
+    :return: [ndarray] bool, True for the first row of every episode: given starts and every change of episode number
+             (an episode without a closing row is merged into the next one by the scanner).
+    """
+    first = np.ones(len(episode), dtype=bool)
+    if len(episode) > 1:
+        first[1:] = episode[1:] != episode[:-1]
+    first[np.asarray(starts, dtype=np.int64)] = True
+    return first
+
+
+def _diff(values, first):
+    """
+    :return: [ndarray] values[i] - values[i - 1], NaN for the first row of every episode.
+    """
+    diff = np.empty(len(values))
+    diff[0] = np.nan
+    np.subtract(values[1:], values[:-1], out=diff[1:])
+    diff[first] = np.nan
+    return diff
+
+
+def _rate(diff, dt):
+    """
+    :param diff: [ndarray] Differences between steps, overwritten.
+    :return: [ndarray] diff / dt, NaN where dt isn't > 0 (first rows, repeated time stamps).
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(diff, dt, out=diff)
+    diff[dt <= 0] = np.nan
+    return diff
+
+
+def _wrap(degrees):
+    """
+    Map angle differences to [-180, 180) in place.
+    """
+    degrees += 180.0
+    np.mod(degrees, 360.0, out=degrees)
+    degrees -= 180.0
+    return degrees
+
+
+def _next(values, last):
+    """
+    :return: [ndarray] values[i + 1], NaN for the last row of every episode.
+    """
+    shifted = np.empty(len(values))
+    shifted[:-1] = values[1:]
+    shifted[last] = np.nan
+    return shifted
+
+
+def derive(time, x, y, heading, steering, first):
+    """
+    Per step telemetry of consecutive rows of many episodes, without any loop over episodes.
+    :param time: [ndarray] Time stamp of each step (seconds).
+    :param x: [ndarray] X coordinate of each step (meters).
+    :param y: [ndarray] Y coordinate of each step (meters).
+    :param heading: [ndarray] Heading of each step (degrees).
+    :param steering: [ndarray] Steering angle of each step (degrees).
+    :param first: [ndarray] bool, True for the first row of every episode (see episode_starts()).
+    :return: [dict] TELEMETRY column -> ndarray (float64, one value per row).
+    """
+    n = len(time)
+    if not n:
+        return {name: np.empty(0) for name in TELEMETRY}
+    # temporaries are updated in place: at 10M steps every array is 80MB
+    dt = _diff(time, first)
+    dx, dy = _diff(x, first), _diff(y, first)
+    distance = np.hypot(dx, dy)
+    ground_speed = _rate(distance.copy(), dt)
+    # previous ground speed is NaN on the first row, so acceleration is NaN on the first two rows
+    accel = _rate(_diff(ground_speed, first), dt)
+
+    turn = _wrap(_diff(heading, first))
+    heading_rate = _rate(turn.copy(), dt)
+    # unwrapped heading: first heading of the episode plus the sum of every (wrapped) turn since, with the running sum
+    # of the whole log restarted at each episode by subtracting its value at the episode's first row
+    turn[first] = 0.0
+    heading_unwrapped = np.cumsum(turn, out=turn)
+    first_rows = np.flatnonzero(first)
+    offsets = heading[first_rows] - heading_unwrapped[first_rows]
+    heading_unwrapped += np.repeat(offsets, np.diff(np.append(first_rows, n)))
+
+    steering_rate = _rate(_diff(steering, first), dt)
+
+    # circle through positions i - 1, i and i + 1: segments a (i - 1 -> i) and b (i -> i + 1) of the same episode
+    last = np.empty(n, dtype=bool)
+    last[:-1] = first[1:]
+    last[-1] = True
+    bx, by = _next(dx, last), _next(dy, last)
+    cross = dx * by
+    cross -= dy * bx
+    cross *= 2
+    distance *= np.hypot(bx, by)
+    bx += dx
+    by += dy
+    distance *= np.hypot(bx, by)  # product of the three side lengths
+    curvature = _rate(cross, distance)
+    return {'dt': dt, 'ground_speed': ground_speed, 'accel': accel, 'heading_unwrapped': heading_unwrapped,
+            'heading_rate': heading_rate, 'steering_rate': steering_rate, 'curvature': curvature}
+
+
+def derive_frame(df, starts=()):
+    """
+    :param df: [DataFrame] Parsed SIM_TRACE_LOG rows of whole episodes in log order (e.g. SimLogParser.data).
+    :param starts: list[int] Row of df starting each episode, if known (changes of episode number are found anyway).
+    :return: [DataFrame] TELEMETRY columns, same index as df.
+    """
+    columns = (df[col].to_numpy(dtype=np.float64) for col in ('time', 'x_coord', 'y_coord', 'heading', 'steering'))
+    first = episode_starts(df.episode.to_numpy(), starts)
+    return pd.DataFrame(derive(*columns, first), index=df.index)